@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundJobs:
+    """Base of stores that compute results on a worker pool, one job per key at a time"""
+
+    def __init__(self, workers, thread_name_prefix):
+        """
+        Initialize the worker pool
+
+        Args:
+            workers (int): Number of jobs run in parallel
+            thread_name_prefix (str): Name prefix of the worker threads
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        # key -> Future of the job running for it
+        self._pending = {}
+        # file -> ((size, mtime_ns), error) of the last failed job, so a file
+        # that cannot be processed is not tried again until it changes
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def failure(self, video_path):
+        """
+        Get why the last job for a file failed, unless the file changed since
+
+        Args:
+            video_path (str): Path to the file
+
+        Returns:
+            str or None: The error, or None if no job failed for this version
+                         of the file
+        """
+        signature = _signature(video_path)
+        with self._lock:
+            failed = self._failures.get(_file_key(video_path))
+        if failed is None or signature is None or failed[0] != signature:
+            return None
+        return failed[1]
+
+    def _record_failure(self, video_path, error):
+        """Remember that a job failed for the current version of a file"""
+        signature = _signature(video_path)
+        if signature is not None:
+            with self._lock:
+                self._failures[_file_key(video_path)] = (signature, str(error))
+
+    def _clear_failure(self, video_path):
+        with self._lock:
+            self._failures.pop(_file_key(video_path), None)
+
+    def _submit(self, key, func, *args):
+        """
+        Run func(*args) in the background unless a job for the key is running
+
+        Returns:
+            concurrent.futures.Future: The new job, or the one already running
+        """
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._run, key, func, *args)
+                self._pending[key] = future
+            return future
+
+    def _run(self, key, func, *args):
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+
+class BackgroundStore(BackgroundJobs):
+    """
+    On-disk cache of one JSON result per video, built in the background
+
+    Subclasses give the path of a video's entry (a file or a directory)
+    and build it at a temporary path, which is swapped in when complete so
+    readers never see a partial entry. Results of another version than
+    ``version`` are treated as missing and built again. A failed build is
+    only retried once the video file changes.
+    """
+
+    version = 1
+    # Words naming the results in log messages, e.g. 'previews'
+    description = 'results'
+
+    def __init__(self, cache_dir, workers, thread_name_prefix):
+        """
+        Initialize the store
+
+        Args:
+            cache_dir (str): Directory holding one entry per video
+            workers (int): Number of videos processed in parallel
+            thread_name_prefix (str): Name prefix of the worker threads
+        """
+        super().__init__(workers, thread_name_prefix)
+        self.cache_dir = cache_dir
+        self._logger = logging.getLogger(type(self).__module__)
+
+    def entry_path(self, video_path):
+        """Get the file or directory holding a video's entry"""
+        raise NotImplementedError
+
+    def result_path(self, video_path):
+        """Get the JSON file describing a video's entry; the entry itself by default"""
+        return self.entry_path(video_path)
+
+    def build(self, video_path, tmp_path):
+        """
+        Build a video's entry
+
+        Args:
+            video_path (str): Path to the video file
+            tmp_path (str): Where to write the entry
+
+        Returns:
+            dict or None: The result, or None if the video cannot be processed
+        """
+        raise NotImplementedError
+
+    def summary(self, video_path, result):
+        """Describe a built result for the log"""
+        return f'Generated {self.description} for {video_path}'
+
+    def get(self, video_path):
+        """
+        Get the result for a video if it has been built
+
+        Returns:
+            dict or None: The result, or None if not available yet
+        """
+        try:
+            with open(self.result_path(video_path), 'r') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return result if result.get('version') == self.version else None
+
+    def ensure(self, video_path):
+        """
+        Schedule building a video's entry unless it is done or already running
+
+        Args:
+            video_path (str): Path to the video file
+
+        Returns:
+            concurrent.futures.Future or None: The pending job, or None if
+                                               the entry already exists or
+                                               could not be built
+        """
+        if (self.get(video_path) is not None or not os.path.isfile(video_path)
+                or self.failure(video_path) is not None):
+            return None
+        return self._submit(self.entry_path(video_path), self._generate, video_path)
+
+    def _generate(self, video_path):
+        """Build into a temporary path and swap it in when complete"""
+        final_path = self.entry_path(video_path)
+        tmp_path = f'{final_path}.tmp'
+        try:
+            _remove(tmp_path)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            result = self.build(video_path, tmp_path)
+            if result is None:
+                self._logger.warning(f'Could not generate {self.description} for {video_path}')
+                self._record_failure(video_path, f'Could not generate {self.description}')
+                _remove(tmp_path)
+                return None
+            if os.path.isdir(final_path):
+                shutil.rmtree(final_path, ignore_errors=True)
+            os.replace(tmp_path, final_path)
+            self._clear_failure(video_path)
+            self._logger.info(self.summary(video_path, result))
+            return result
+        except Exception as e:
+            self._logger.error(f'Error generating {self.description} for {video_path}: {e}')
+            self._record_failure(video_path, e)
+            _remove(tmp_path)
+            return None
+
+
+def _file_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _signature(path):
+    """Get the (size, mtime_ns) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _remove(path):
+    """Delete a file or directory tree if it exists"""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+
+# Headless: Qt must not need a display, so this is set before PyQt5 loads
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from log_setup import setup_logging
+from benchmarks import decode, display, serving
+from benchmarks.results import environment, save, compare
+from benchmarks.videos import CACHE_DIR, RESOLUTIONS, GOP_LENGTHS, ensure_videos
+
+SUITES = ('decode', 'seek', 'display', 'serve')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark decoding, seeking, display and range serving on synthetic videos'
+    )
+    parser.add_argument('--quick', action='store_true',
+                        help='Fewer frames, resolutions and clients for a fast smoke run')
+    parser.add_argument('--only', nargs='+', choices=SUITES, default=list(SUITES),
+                        help='Run only these benchmarks')
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS),
+                        help='Video resolutions to generate and test')
+    parser.add_argument('--clients', nargs='+', type=int,
+                        help='Concurrent client counts for the serving benchmark')
+    parser.add_argument('--repeat', type=int,
+                        help='Runs of each decode and display measurement; the median is kept')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='Results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=5.0,
+                        help='Percent change reported as a regression or improvement')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 if any metric regressed past the threshold')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Keep library logging out of the report and out of the application's log file
+    setup_logging(CACHE_DIR, name='benchmark', level='WARNING')
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    settings = {
+        'frames': 60 if args.quick else 300,
+        'resolutions': args.resolutions or (['480p', '720p'] if args.quick else list(RESOLUTIONS)),
+        'gops': list(GOP_LENGTHS),
+        'seeks': 20 if args.quick else 100,
+        'display_frames': 30 if args.quick else 120,
+        'clients': args.clients or ([1, 4] if args.quick else [1, 4, 16]),
+        'requests_per_client': 20 if args.quick else 100,
+        'repeat': args.repeat or (1 if args.quick else 3),
+        'suites': args.only
+    }
+    print(f'Generating videos in {os.path.relpath(os.path.dirname(__file__))}/.cache ...', flush=True)
+    videos = ensure_videos(settings['resolutions'], settings['gops'], settings['frames'])
+
+    benchmarks = {}
+
+    def median_of(measure, *measure_args):
+        """Run a measurement several times and keep the median of each metric"""
+        runs = [measure(*measure_args) for _ in range(settings['repeat'])]
+        return {key: dict(runs[0][key], value=statistics.median(run[key]['value'] for run in runs))
+                for key in runs[0]}
+
+    def record(prefix, measurements):
+        for key, value in measurements.items():
+            name = f'{prefix}.{key}'
+            benchmarks[name] = value
+            print(f'  {name:60s} {value["value"]:12.3f} {value["unit"]}', flush=True)
+
+    for video in videos:
+        print(f'{video["name"]} ({video["codec"]}, measured GOP {video["measured_gop"] or "?"})', flush=True)
+        if 'decode' in args.only:
+            record(video['name'], median_of(decode.sequential_decode, video))
+        if 'seek' in args.only:
+            record(video['name'], median_of(decode.random_seek, video, settings['seeks']))
+
+    # Display and serving depend on resolution and size, not on GOP length
+    first_gop = [video for video in videos if video['gop'] == settings['gops'][0]]
+    for video in first_gop:
+        if 'display' in args.only:
+            record(video['resolution'], median_of(display.display_path, video, settings['display_frames']))
+    if 'serve' in args.only:
+        largest = max(first_gop, key=lambda video: video['width'])
+        print(f'Serving {largest["name"]} to {settings["clients"]} concurrent clients', flush=True)
+        record(largest['resolution'], serving.range_serving(
+            largest, settings['clients'], settings['requests_per_client']))
+
+    app.processEvents()
+    results = {
+        'environment': environment(),
+        'settings': settings,
+        'videos': [{key: value for key, value in video.items() if key != 'path'} for video in videos],
+        'benchmarks': benchmarks
+    }
+    path = save(results, args.output)
+    print(f'Results written to {path}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import time
+import random
+
+from keyframe_index import KeyframeIndex
+from video_player import VideoPlayer
+from benchmarks.results import metric, percentile
+
+
+def sequential_decode(video):
+    """
+    Decode every frame of a video in order with VideoPlayer.get_frame
+
+    Returns:
+        dict: Decoded frames per second
+    """
+    player = VideoPlayer(video['path'])
+    try:
+        frames = 0
+        start = time.perf_counter()
+        while player.get_frame() is not None:
+            frames += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        player.release()
+    return {'sequential_decode_fps': metric(frames / elapsed, 'fps', 'higher')}
+
+
+def random_seek(video, seeks, seed=0):
+    """
+    Time VideoPlayer.get_frame_at for random targets, without a frame cache
+
+    Each seek repositions the capture using the keyframe index and decodes
+    the target frame, which is what scrubbing and stepping cost when the
+    frame has not been seen before.
+
+    Args:
+        video (dict): Benchmark video from ensure_videos
+        seeks (int): Number of random targets
+        seed (int): Seed of the target sequence, fixed so runs compare
+
+    Returns:
+        dict: Median and 95th percentile seek latency in milliseconds
+    """
+    index = KeyframeIndex.load_or_build(video['path'])
+    player = VideoPlayer(video['path'])
+    # Use the index right away rather than waiting for the background load
+    player.keyframe_index = index
+    targets = random.Random(seed).sample(range(player.frame_count), min(seeks, player.frame_count))
+    latencies = []
+    try:
+        for target in targets:
+            start = time.perf_counter()
+            frame = player.get_frame_at(target)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if frame is None:
+                raise RuntimeError(f'Could not decode frame {target} of {video["name"]}')
+    finally:
+        player.release()
+    return {
+        'seek_p50_ms': metric(percentile(latencies, 50), 'ms', 'lower'),
+        'seek_p95_ms': metric(percentile(latencies, 95), 'ms', 'lower')
+    }
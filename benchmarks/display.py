@@ -0,0 +1,56 @@
+import time
+import cv2
+
+from benchmarks.results import metric, percentile
+
+# Size of PlaybackScreen's video area at its default window size
+SURFACE_SIZE = (800, 450)
+
+
+def display_path(video, frames):
+    """
+    Time showing decoded frames on a VideoSurface, paint included
+
+    PlaybackScreen.display_frame hands frames straight to VideoSurface, so
+    this is the per-frame cost of the playback display path: the CPU
+    downscale for frames larger than the surface plus a synchronous repaint.
+    Requires a QApplication (the offscreen platform is enough).
+
+    Args:
+        video (dict): Benchmark video from ensure_videos
+        frames (int): Number of frames shown
+
+    Returns:
+        dict: Mean and 95th percentile cost per frame in milliseconds
+    """
+    from video_surface import VideoSurface
+
+    cap = cv2.VideoCapture(video['path'])
+    decoded = []
+    try:
+        while len(decoded) < frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded.append(frame)
+    finally:
+        cap.release()
+
+    surface = VideoSurface()
+    surface.resize(*SURFACE_SIZE)
+    surface.show()
+    # Warm up: the first frame sizes the buffers
+    surface.set_frame(decoded[0])
+    surface.repaint()
+    costs = []
+    for frame in decoded:
+        start = time.perf_counter()
+        surface.set_frame(frame)
+        surface.repaint()
+        costs.append((time.perf_counter() - start) * 1000)
+    surface.close()
+    surface.deleteLater()
+    return {
+        'display_mean_ms': metric(sum(costs) / len(costs), 'ms', 'lower'),
+        'display_p95_ms': metric(percentile(costs, 95), 'ms', 'lower')
+    }
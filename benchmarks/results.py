@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def metric(value, unit, better):
+    """
+    Describe one measured value
+
+    Args:
+        value (float): The measurement
+        unit (str): Unit shown in reports, e.g. 'fps' or 'ms'
+        better (str): 'higher' or 'lower', used when comparing runs
+
+    Returns:
+        dict: The metric as stored in the results file
+    """
+    return {'value': round(float(value), 4), 'unit': unit, 'better': better}
+
+
+def percentile(values, q):
+    """Get the q-th percentile (0-100) of a list by linear interpolation"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def git_revision():
+    """Get the current commit and whether the tree has local changes"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                    capture_output=True, text=True, timeout=10).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+    return commit or None, dirty
+
+
+def environment():
+    """Describe the machine and library versions a run was measured on"""
+    import cv2
+    from PyQt5.QtCore import QT_VERSION_STR
+    commit, dirty = git_revision()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'qt': QT_VERSION_STR,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def save(results, path=None):
+    """
+    Write a results file
+
+    Args:
+        results (dict): Environment, settings and benchmark metrics
+        path (str, optional): Output file; defaults to results/<time>-<commit>.json
+
+    Returns:
+        str: The path written
+    """
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        env = results['environment']
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(RESULTS_DIR, f'{stamp}-{env["commit"] or "nogit"}.json')
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare(baseline, current, threshold=5.0, out=sys.stdout):
+    """
+    Print how each metric changed against a baseline run
+
+    Args:
+        baseline (dict): Earlier results
+        current (dict): New results
+        threshold (float): Percent change that counts as a regression or an
+                           improvement rather than noise
+        out (file): Stream the report is written to
+
+    Returns:
+        list: Names of the metrics that regressed by more than the threshold
+    """
+    old_env, new_env = baseline['environment'], current['environment']
+    out.write(f'Comparing {new_env["commit"]} against baseline {old_env["commit"]}\n')
+    if old_env.get('platform') != new_env.get('platform') or old_env.get('cpu_count') != new_env.get('cpu_count'):
+        out.write('Warning: the runs were measured on different machines\n')
+    regressions = []
+    for name in sorted(current['benchmarks']):
+        old = baseline['benchmarks'].get(name)
+        new = current['benchmarks'][name]
+        if old is None or not old['value']:
+            out.write(f'  {name:60s} {new["value"]:12.3f} {new["unit"]:6s} (new)\n')
+            continue
+        change = (new['value'] - old['value']) / old['value'] * 100
+        worse = change < 0 if new['better'] == 'higher' else change > 0
+        if abs(change) < threshold:
+            verdict = ''
+        elif worse:
+            verdict = 'REGRESSION'
+            regressions.append(name)
+        else:
+            verdict = 'improved'
+        out.write(f'  {name:60s} {old["value"]:12.3f} -> {new["value"]:12.3f} {new["unit"]:6s} '
+                  f'{change:+7.1f}% {verdict}\n')
+    return regressions
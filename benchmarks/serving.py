@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import random
+import shutil
+import socket
+import subprocess
+import http.client
+from concurrent.futures import ProcessPoolExecutor
+
+from config_store import get_static_dir
+from benchmarks.results import metric, percentile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Size of each requested byte range, similar to a browser's media requests
+RANGE_SIZE = 256 * 1024
+
+
+def _free_port():
+    """Ask the OS for a port that is free right now"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30.0):
+    """Wait until the server subprocess accepts connections"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('Server did not start listening in time')
+
+
+def _client(port, url, file_size, requests, start_at, seed):
+    """
+    Fetch random byte ranges, one connection per request
+
+    The server closes the connection after each response, so the client
+    reconnects for every range the way a browser does against it.
+
+    Runs in its own process so clients do not share the server's or each
+    other's interpreter lock. Requests start at a common wall-clock time.
+
+    Returns:
+        tuple: (latencies in milliseconds, bytes received, finish time)
+    """
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    received = 0
+    time.sleep(max(start_at - time.time(), 0))
+    try:
+        for _ in range(requests):
+            start = rng.randrange(0, max(file_size - RANGE_SIZE, 1))
+            end = min(start + RANGE_SIZE, file_size) - 1
+            began = time.perf_counter()
+            connection.request('GET', url, headers={'Range': f'bytes={start}-{end}'})
+            response = connection.getresponse()
+            body = response.read()
+            latencies.append((time.perf_counter() - began) * 1000)
+            if response.status != 206 or len(body) != end - start + 1:
+                raise RuntimeError(f'Unexpected response {response.status} with {len(body)} bytes')
+            received += len(body)
+    finally:
+        connection.close()
+    return latencies, received, time.time()
+
+
+def range_serving(video, concurrency_levels, requests_per_client, server_mode='pool'):
+    """
+    Measure serve_upload under concurrent range requests from local clients
+
+    The web server runs as a separate process started from web_app.py, with
+    logging at WARNING so the access log does not dominate. The video is
+    copied into the upload folder for the run and removed afterwards.
+
+    Args:
+        video (dict): Benchmark video from ensure_videos
+        concurrency_levels (list): Numbers of simultaneous clients to test
+        requests_per_client (int): Range requests made by each client
+        server_mode (str): Serving mode passed to web_app.py --server
+
+    Returns:
+        dict: Throughput and latency percentiles per concurrency level
+    """
+    upload_dir = os.path.join(get_static_dir(), 'uploads')
+    created_upload_dir = not os.path.isdir(upload_dir)
+    os.makedirs(upload_dir, exist_ok=True)
+    name = f'benchmark-{video["name"]}.mp4'
+    upload_path = os.path.join(upload_dir, name)
+    shutil.copyfile(video['path'], upload_path)
+    file_size = os.path.getsize(upload_path)
+
+    port = _free_port()
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, 'web_app.py'), '--host', '127.0.0.1',
+         '--port', str(port), '--server', server_mode],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    results = {}
+    try:
+        _wait_for_port(port, server)
+        for clients in concurrency_levels:
+            with ProcessPoolExecutor(max_workers=clients) as pool:
+                # Leave time for the worker processes to start before the clock runs
+                start_at = time.time() + 1.0 + 0.05 * clients
+                futures = [
+                    pool.submit(_client, port, f'/uploads/{name}', file_size,
+                                requests_per_client, start_at, seed)
+                    for seed in range(clients)
+                ]
+                outcomes = [future.result() for future in futures]
+            latencies = [latency for outcome in outcomes for latency in outcome[0]]
+            received = sum(outcome[1] for outcome in outcomes)
+            elapsed = max(outcome[2] for outcome in outcomes) - start_at
+            prefix = f'serve_{clients}_clients'
+            results[f'{prefix}_throughput_mbps'] = metric(received / elapsed / 1e6, 'MB/s', 'higher')
+            results[f'{prefix}_p50_ms'] = metric(percentile(latencies, 50), 'ms', 'lower')
+            results[f'{prefix}_p95_ms'] = metric(percentile(latencies, 95), 'ms', 'lower')
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        os.remove(upload_path)
+        if created_upload_dir:
+            # Only the server's empty indexes are left in it
+            shutil.rmtree(upload_dir, ignore_errors=True)
+    return results
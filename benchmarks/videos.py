@@ -0,0 +1,139 @@
+import os
+import cv2
+import numpy as np
+
+from mp4_atoms import read_video_sync_samples
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+RESOLUTIONS = {
+    '480p': (854, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080)
+}
+# Requested distance between keyframes, in frames
+GOP_LENGTHS = (12, 60)
+FPS = 30.0
+
+
+def synthetic_frame(index, width, height):
+    """
+    Draw a deterministic test frame with motion everywhere in the picture
+
+    A scrolling gradient keeps every macroblock changing, a moving disc adds
+    sharp edges and the frame number makes misplaced frames visible.
+
+    Args:
+        index (int): Frame number
+        width (int): Frame width in pixels
+        height (int): Frame height in pixels
+
+    Returns:
+        numpy.ndarray: BGR frame
+    """
+    x = np.arange(width, dtype=np.uint16)
+    y = np.arange(height, dtype=np.uint16)[:, None]
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[..., 0] = (x + index * 4) & 0xFF
+    frame[..., 1] = (y + index * 2) & 0xFF
+    frame[..., 2] = ((x + y) // 2 + index) & 0xFF
+    radius = height // 8
+    center_x = radius + (index * 7) % max(width - 2 * radius, 1)
+    cv2.circle(frame, (center_x, height // 2), radius, (255, 255, 255), -1)
+    cv2.putText(frame, str(index), (20, height // 6), cv2.FONT_HERSHEY_SIMPLEX,
+                height / 240, (0, 0, 0), max(height // 120, 1))
+    return frame
+
+
+def generate_video(path, width, height, frame_count, gop, fps=FPS):
+    """
+    Encode a synthetic MP4 with OpenCV's VideoWriter
+
+    H.264 is used when the OpenCV build can write it, otherwise MPEG-4 Part 2.
+    The keyframe interval is requested from the encoder but not every backend
+    honours it, so callers should read the real one with measured_gop().
+
+    Args:
+        path (str): Output file
+        width (int): Frame width in pixels
+        height (int): Frame height in pixels
+        frame_count (int): Number of frames
+        gop (int): Requested keyframe interval in frames
+        fps (float): Frame rate
+
+    Returns:
+        str: FOURCC of the codec that was used
+    """
+    writer = None
+    for codec in ('avc1', 'mp4v'):
+        writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*codec), fps,
+                                 (width, height), [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+        if writer.isOpened():
+            break
+        writer.release()
+        writer = None
+    if writer is None:
+        raise RuntimeError('No MP4 encoder is available')
+    try:
+        for index in range(frame_count):
+            writer.write(synthetic_frame(index, width, height))
+    finally:
+        writer.release()
+    return codec
+
+
+def measured_gop(path):
+    """
+    Get the average keyframe interval actually written to a file
+
+    Returns:
+        float or None: Frames per keyframe, or None if the file cannot be parsed
+    """
+    table = read_video_sync_samples(path)
+    if not table or not table[0]:
+        return None
+    keyframes, frame_count = table
+    return frame_count / len(keyframes)
+
+
+def ensure_videos(resolutions, gops, frame_count):
+    """
+    Generate the benchmark videos that are not cached yet
+
+    Args:
+        resolutions (list): Keys of RESOLUTIONS
+        gops (list): Requested keyframe intervals
+        frame_count (int): Frames per video
+
+    Returns:
+        list: One dict per video with name, path, resolution, width, height,
+              frames, requested and measured GOP and codec
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    videos = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for gop in gops:
+            name = f'{resolution}-gop{gop}-{frame_count}f'
+            path = os.path.join(CACHE_DIR, f'{name}.mp4')
+            codec_path = f'{path}.codec'
+            if not os.path.exists(path) or not os.path.exists(codec_path):
+                tmp_path = os.path.join(CACHE_DIR, f'{name}.tmp.mp4')
+                codec = generate_video(tmp_path, width, height, frame_count, gop)
+                os.replace(tmp_path, path)
+                with open(codec_path, 'w') as f:
+                    f.write(codec)
+            with open(codec_path) as f:
+                codec = f.read().strip()
+            videos.append({
+                'name': name,
+                'path': path,
+                'resolution': resolution,
+                'width': width,
+                'height': height,
+                'frames': frame_count,
+                'gop': gop,
+                'measured_gop': measured_gop(path),
+                'codec': codec
+            })
+    return videos
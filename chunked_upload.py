@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import hashlib
+import logging
+import threading
+
+from upload_store import hash_file
+
+logger = logging.getLogger(__name__)
+
+# Chunk size suggested to clients, and the largest chunk accepted
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Largest upload accepted unless the manager is given another limit
+DEFAULT_MAX_UPLOAD_SIZE = 16 * 1024 ** 3
+# Unfinished uploads older than this are discarded
+SESSION_TTL = 24 * 3600
+# Bytes read from the request body per write
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(ValueError):
+    """Raised when an upload request is invalid for the session's state"""
+
+
+class UploadTooLarge(UploadError):
+    """Raised when an upload is larger than the manager accepts"""
+
+
+def merge_ranges(ranges):
+    """
+    Merge overlapping or adjacent [start, end) byte ranges
+
+    Args:
+        ranges (list): List of [start, end) pairs
+
+    Returns:
+        list: Sorted, non-overlapping [start, end) pairs
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def uncovered_ranges(start, end, ranges):
+    """
+    Get the parts of a [start, end) byte range that other ranges do not cover
+
+    Args:
+        start (int): First byte
+        end (int): Byte after the last one
+        ranges (list): Sorted, non-overlapping [start, end) pairs
+
+    Returns:
+        list: [start, end) pairs of the uncovered parts, in order
+    """
+    gaps = []
+    for covered_start, covered_end in ranges:
+        if covered_end <= start:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > start:
+            gaps.append([start, covered_start])
+        start = max(start, covered_end)
+    if start < end:
+        gaps.append([start, end])
+    return gaps
+
+
+def positional_write(fd, data, offset):
+    """Write all of a buffer at a file offset without moving a shared file position"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, view, offset)
+        else:
+            # Windows has no pwrite; the descriptor belongs to this request only
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+class ChunkedUploadManager:
+    """Resumable uploads written chunk by chunk into their final file"""
+
+    def __init__(self, upload_dir, chunk_size=DEFAULT_CHUNK_SIZE, max_size=DEFAULT_MAX_UPLOAD_SIZE):
+        """
+        Initialize the manager
+
+        Args:
+            upload_dir (str): Directory receiving the uploaded files
+            chunk_size (int): Chunk size suggested to clients
+            max_size (int): Largest upload accepted, in bytes
+        """
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self._sessions = {}
+        # upload ID -> [lock, SHA-256 of the contiguous prefix, prefix length]
+        self._hashers = {}
+        # upload ID -> [start, end) ranges of chunks being written right now
+        self._writing = {}
+        # IDs of uploads whose final hash is being computed
+        self._finalizing = set()
+        self._lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _session_path(self, upload_id):
+        return os.path.join(self.upload_dir, f'.{upload_id}.upload.json')
+
+    def _data_path(self, upload_id):
+        # Dotfiles are never served, so a partial file cannot be played
+        return os.path.join(self.upload_dir, f'.{upload_id}.mp4.part')
+
+    def _save(self, session):
+        """Persist a session atomically so uploads resume after a restart"""
+        path = self._session_path(session['id'])
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(session, f)
+        os.replace(f'{path}.tmp', path)
+
+    def _load(self, upload_id):
+        """Get a session from memory or disk, or raise KeyError"""
+        session = self._sessions.get(upload_id)
+        if session is None:
+            try:
+                uuid.UUID(upload_id)
+                with open(self._session_path(upload_id), 'r') as f:
+                    session = json.load(f)
+            except (ValueError, OSError):
+                raise KeyError(upload_id)
+            self._sessions[upload_id] = session
+        return session
+
+    def expire_sessions(self, max_age=SESSION_TTL):
+        """
+        Discard uploads that have received nothing for a while
+
+        The session file, the partial file and the in-memory state of each
+        abandoned upload are removed, as are partial files left without a
+        session. Uploads with a chunk being written or a hash being
+        finalized are kept.
+
+        Args:
+            max_age (float): Seconds since the last chunk after which an
+                             upload is abandoned
+
+        Returns:
+            int: Number of uploads discarded
+        """
+        cutoff = time.time() - max_age
+        expired = 0
+        for name in os.listdir(self.upload_dir):
+            if not name.startswith('.'):
+                continue
+            if name.endswith('.upload.json'):
+                upload_id = name[1:-len('.upload.json')]
+            elif name.endswith('.mp4.part'):
+                upload_id = name[1:-len('.mp4.part')]
+            else:
+                continue
+            with self._lock:
+                if upload_id in self._writing or upload_id in self._finalizing:
+                    continue
+                try:
+                    # The session file is rewritten after every chunk
+                    last_active = os.path.getmtime(self._session_path(upload_id))
+                except OSError:
+                    try:
+                        last_active = os.path.getmtime(self._data_path(upload_id))
+                    except OSError:
+                        # Both files were removed earlier in this pass
+                        continue
+                if last_active > cutoff:
+                    continue
+                self._sessions.pop(upload_id, None)
+                self._hashers.pop(upload_id, None)
+                try:
+                    for path in (self._session_path(upload_id), self._data_path(upload_id)):
+                        if os.path.exists(path):
+                            os.remove(path)
+                except OSError as e:
+                    logger.warning(f'Could not discard upload {upload_id}: {e}')
+                    continue
+            expired += 1
+            logger.info(f'Discarded expired upload {upload_id}')
+        return expired
+
+    def create(self, filename, size):
+        """
+        Start an upload and preallocate its file
+
+        Args:
+            filename (str): Original file name
+            size (int): Total size in bytes
+
+        Returns:
+            dict: Public status of the new session
+
+        Raises:
+            UploadTooLarge: If size exceeds the manager's limit
+            UploadError: If size is negative or the file cannot be allocated
+        """
+        if size < 0:
+            raise UploadError('size must not be negative')
+        if size > self.max_size:
+            raise UploadTooLarge(f'Uploads may not exceed {self.max_size} bytes')
+        upload_id = str(uuid.uuid4())
+        try:
+            with open(self._data_path(upload_id), 'wb') as f:
+                f.truncate(size)
+        except OSError as e:
+            try:
+                os.remove(self._data_path(upload_id))
+            except OSError:
+                pass
+            raise UploadError(f'Could not allocate {size} bytes: {e.strerror}')
+        session = {
+            'id': upload_id,
+            'filename': filename,
+            'size': size,
+            'chunk_size': self.chunk_size,
+            'received': [],
+            'created': time.time()
+        }
+        with self._lock:
+            self._sessions[upload_id] = session
+            self._save(session)
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """
+        Get the progress of an upload
+
+        Args:
+            upload_id (str): Upload session ID
+
+        Returns:
+            dict: Size, chunk size, received byte ranges and completion flag
+        """
+        with self._lock:
+            session = self._load(upload_id)
+            received = sum(end - start for start, end in session['received'])
+            return {
+                'upload_id': upload_id,
+                'filename': session['filename'],
+                'size': session['size'],
+                'chunk_size': session['chunk_size'],
+                'received': [list(r) for r in session['received']],
+                'received_bytes': received,
+                'complete': received == session['size']
+            }
+
+    def write_chunk(self, upload_id, offset, length, stream, crc32):
+        """
+        Stream one chunk from a request body into the upload's file
+
+        The chunk is only recorded as received if its CRC-32 matches, so a
+        corrupted or interrupted chunk is simply sent again. Bytes that were
+        already received may have been hashed, so only the parts of the chunk
+        outside them are written; a chunk overlapping one that is still being
+        written is rejected.
+
+        Args:
+            upload_id (str): Upload session ID
+            offset (int): Position of the chunk in the file
+            length (int): Number of bytes in the chunk
+            stream (file): Readable request body
+            crc32 (int): Expected CRC-32 of the chunk
+
+        Returns:
+            dict: Status of the upload after the chunk
+        """
+        with self._lock:
+            session = self._load(upload_id)
+        if offset < 0 or length <= 0 or offset + length > session['size']:
+            raise UploadError('Chunk lies outside the file')
+        if length > MAX_CHUNK_SIZE:
+            raise UploadError(f'Chunks may not exceed {MAX_CHUNK_SIZE} bytes')
+        with self._lock:
+            writing = self._writing.setdefault(upload_id, [])
+            if any(start < offset + length and offset < end for start, end in writing):
+                raise UploadError('Chunk overlaps one that is still being written')
+            gaps = uncovered_ranges(offset, offset + length, session['received'])
+            # Reserved until written, so no other request writes into them
+            writing.extend(gaps)
+        try:
+            if not gaps:
+                # A retry of a chunk that already arrived; keep the verified bytes
+                return self.status(upload_id)
+
+            checksum = 0
+            remaining = length
+            position = offset
+            fd = os.open(self._data_path(upload_id), os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+            try:
+                while remaining:
+                    data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+                    if not data:
+                        raise UploadError('Chunk body ended early')
+                    checksum = zlib.crc32(data, checksum)
+                    view = memoryview(data)
+                    for start, end in gaps:
+                        start, end = max(start, position), min(end, position + len(data))
+                        if start < end:
+                            positional_write(fd, view[start - position:end - position], start)
+                    position += len(data)
+                    remaining -= len(data)
+            finally:
+                os.close(fd)
+
+            if checksum != crc32:
+                raise UploadError('Chunk checksum mismatch')
+
+            with self._lock:
+                session['received'] = merge_ranges(session['received'] + gaps)
+                self._save(session)
+        finally:
+            with self._lock:
+                for gap in gaps:
+                    writing.remove(gap)
+                if not writing:
+                    self._writing.pop(upload_id, None)
+        self._advance_hash(upload_id)
+        return self.status(upload_id)
+
+    def _advance_hash(self, upload_id):
+        """
+        Hash the newly contiguous part of the file from the start
+
+        The bytes were just written, so they are normally read back from the
+        page cache. Returns the hash state, restarted from the beginning if
+        it was lost (e.g. after a server restart).
+        """
+        with self._lock:
+            session = self._load(upload_id)
+            hasher = self._hashers.setdefault(upload_id, [threading.Lock(), hashlib.sha256(), 0])
+            received = session['received']
+            contiguous = received[0][1] if received and received[0][0] == 0 else 0
+        with hasher[0]:
+            if contiguous > hasher[2]:
+                hash_file(self._data_path(upload_id), hasher[1], hasher[2], contiguous)
+                hasher[2] = contiguous
+        return hasher
+
+    def finalize(self, upload_id):
+        """
+        Close a complete upload and hand over its file
+
+        Args:
+            upload_id (str): Upload session ID
+
+        Returns:
+            tuple: (path of the written file, hex SHA-256 of its contents)
+        """
+        with self._lock:
+            session = self._load(upload_id)
+            if upload_id in self._finalizing:
+                raise UploadError('Upload is already being finalized')
+            if session['received'] != ([[0, session['size']]] if session['size'] else []):
+                raise UploadError('Upload is incomplete')
+            # Claimed here so a concurrent call cannot hand out the same file
+            self._finalizing.add(upload_id)
+        try:
+            hasher = self._advance_hash(upload_id)
+            with self._lock:
+                os.remove(self._session_path(upload_id))
+                self._sessions.pop(upload_id, None)
+                self._hashers.pop(upload_id, None)
+        finally:
+            with self._lock:
+                self._finalizing.discard(upload_id)
+        return self._data_path(upload_id), hasher[1].hexdigest()
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the config file's modification time
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+def get_static_dir():
+    """Get the static folder shared by the Flask and Qt front ends"""
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_path, 'static')
+
+
+def get_data_path(relative_path):
+    """Get absolute path for writable application data (next to the executable when frozen)"""
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(os.path.dirname(__file__))
+    return os.path.join(base_path, relative_path)
+
+
+def default_config_path():
+    """Get the path of the shared video_config.json"""
+    return os.path.join(get_static_dir(), 'video_config.json')
+
+
+def resolve_video_path(path):
+    """
+    Map a configured video path to a local file path
+
+    Paths saved by the web front end point at the /uploads/ route; those
+    are resolved to the upload folder so the Qt player can open them.
+
+    Args:
+        path (str): Path as stored in the configuration
+
+    Returns:
+        str: Local file path or the original path
+    """
+    if path and path.startswith('/uploads/'):
+        return os.path.join(get_static_dir(), 'uploads', path[len('/uploads/'):])
+    return path
+
+
+def _freeze(videos):
+    """Turn a list of video dictionaries into an immutable snapshot"""
+    return tuple(MappingProxyType(dict(video)) for video in videos if isinstance(video, dict))
+
+
+class ConfigStore:
+    """Parsed, immutable view of a video configuration file"""
+
+    def __init__(self, config_path, check_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        Initialize the store
+
+        Args:
+            config_path (str): Path to the JSON configuration file
+            check_interval (float): Minimum seconds between modification checks
+        """
+        self.config_path = config_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = ()
+        # Sentinel that never matches, so the first snapshot() loads the file
+        self._mtime_ns = -1
+        self._checked_at = float('-inf')
+
+    def _current_mtime(self):
+        """Get the modification time of the file, or None if it is missing"""
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reload(self, mtime_ns):
+        """Parse the file into a new snapshot"""
+        videos = []
+        if mtime_ns is not None:
+            try:
+                with open(self.config_path, 'r') as f:
+                    videos = json.load(f)
+                logger.info(f'Loaded {len(videos)} videos from {self.config_path}')
+            except (OSError, ValueError) as e:
+                logger.error(f'Error loading video config: {e}')
+                return
+        self._snapshot = _freeze(videos if isinstance(videos, list) else [])
+        self._mtime_ns = mtime_ns
+
+    def snapshot(self):
+        """
+        Get the current configuration
+
+        The file is only re-read when its modification time changed, and the
+        modification time is checked at most once per check interval.
+
+        Returns:
+            tuple: Read-only mappings with the video name and path
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    mtime_ns = self._current_mtime()
+                    if mtime_ns != self._mtime_ns:
+                        self._reload(mtime_ns)
+                    self._checked_at = now
+        return self._snapshot
+
+    def save(self, videos):
+        """
+        Atomically write the configuration and publish it as the new snapshot
+
+        Args:
+            videos (list): List of dictionaries containing video name and path
+        """
+        with self._lock:
+            directory = os.path.dirname(self.config_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f'{self.config_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(list(videos), f, indent=4)
+            os.replace(tmp_path, self.config_path)
+
+            self._snapshot = _freeze(videos)
+            self._mtime_ns = self._current_mtime()
+            self._checked_at = time.monotonic()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_config_store(config_path=None):
+    """
+    Get the shared store for a configuration file
+
+    Args:
+        config_path (str, optional): Path to the file; defaults to the shared
+                                     static/video_config.json
+
+    Returns:
+        ConfigStore: The single store instance for that file
+    """
+    key = os.path.normcase(os.path.abspath(config_path or default_config_path()))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ConfigStore(key)
+        return store
@@ -0,0 +1,318 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QApplication, QMainWindow, QMessageBox, QLabel
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from PyQt5.QtCore import Qt, QUrl, QTimer, QCoreApplication, pyqtSignal
+import sys
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+import traceback
+
+from log_setup import setup_logging
+from server import bind_socket, serve_app
+
+if getattr(sys, 'frozen', False):
+    base_dir = sys._MEIPASS
+    app_dir = os.path.dirname(sys.executable)
+else:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    app_dir = base_dir
+
+# Logged under the name of the entry script that starts the application
+logger = logging.getLogger('main')
+
+def debug_print(message):
+    """Log a diagnostic message to the console and the log file"""
+    logger.info(message)
+
+# Size in MB of the on-disk web engine HTTP cache; 0 disables caching
+HTTP_CACHE_MB = int(os.environ.get('VIDEO_PLAYER_HTTP_CACHE_MB', '0'))
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 5000
+# Name of the local socket that tells a second launch an instance is running
+INSTANCE_KEY = 'VideoPlayerDesktop'
+
+
+class StartupTimer:
+    """Records how long each phase of a cold start takes"""
+
+    def __init__(self, launch_time):
+        """
+        Initialize the timer
+
+        Args:
+            launch_time (float): time.perf_counter() value at process start
+        """
+        self.launch_time = launch_time
+        self.phases = []
+        self._lock = threading.Lock()
+        self._reported = False
+
+    def record(self, phase, started=None):
+        """
+        Record a phase that has just finished
+
+        Phases on the server thread overlap with those on the GUI thread,
+        so each one is logged with its own duration and the time since launch.
+
+        Args:
+            phase (str): Name of the phase
+            started (float, optional): perf_counter() value when the phase
+                                       began; omit for a point in time
+        """
+        now = time.perf_counter()
+        duration = None if started is None else (now - started) * 1000
+        elapsed = (now - self.launch_time) * 1000
+        with self._lock:
+            self.phases.append((phase, duration, elapsed))
+        if duration is None:
+            debug_print(f"Startup: {phase} at {elapsed:.0f} ms")
+        else:
+            debug_print(f"Startup: {phase} took {duration:.0f} ms (done at {elapsed:.0f} ms)")
+
+    def report(self):
+        """Log all phases once, when the first page has loaded"""
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+            phases = list(self.phases)
+        summary = ', '.join(
+            f"{phase} {elapsed:.0f} ms" if duration is None else f"{phase} {duration:.0f} ms"
+            for phase, duration, elapsed in phases
+        )
+        debug_print(f"Cold start took {phases[-1][2]:.0f} ms: {summary}")
+
+
+# Created by run() with the launch time of the entry script
+startup = None
+
+
+def acquire_instance_lock():
+    """
+    Make this the only running instance of the application
+
+    A second launch hands over to the running instance, which brings its
+    window to the front, instead of killing it.
+
+    Returns:
+        QLocalServer or None: Server holding the lock, or None if another
+                              instance is already running
+    """
+    probe = QLocalSocket()
+    probe.connectToServer(INSTANCE_KEY)
+    if probe.waitForConnected(500):
+        probe.write(b'activate')
+        probe.waitForBytesWritten(500)
+        probe.disconnectFromServer()
+        return None
+
+    server = QLocalServer()
+    # A crashed instance can leave its socket file behind on Unix
+    QLocalServer.removeServer(INSTANCE_KEY)
+    if not server.listen(INSTANCE_KEY):
+        debug_print(f"Could not take the single-instance lock: {server.errorString()}")
+    return server
+
+
+class ConfigScreen(QMainWindow):
+    server_failed = pyqtSignal(str)
+
+    def __init__(self, server_socket):
+        super().__init__()
+        try:
+            self.setWindowTitle("Video Player")
+            self.setGeometry(100, 100, 800, 600)
+            self.server = None
+            self.server_socket = server_socket
+            self.web_view = None
+            self.server_failed.connect(lambda message: self.show_error("Server Error", message))
+
+            # Start Flask first so the web app is imported while the window is built
+            debug_print("Starting Flask server thread...")
+            self.flask_thread = threading.Thread(target=self.run_flask, daemon=True)
+            self.flask_thread.start()
+
+            central_widget = QWidget()
+            self.setCentralWidget(central_widget)
+            self.central_layout = QVBoxLayout(central_widget)
+            self.placeholder = QLabel("Starting...")
+            self.placeholder.setAlignment(Qt.AlignCenter)
+            self.central_layout.addWidget(self.placeholder)
+
+            # The web engine takes a while to load, so it is created once
+            # the window is on screen
+            QTimer.singleShot(0, self.create_web_view)
+
+            debug_print("GUI initialized successfully")
+        except Exception as e:
+            debug_print(f"Error initializing GUI: {e}")
+            debug_print(f"Traceback: {traceback.format_exc()}")
+            self.show_error("Initialization Error", str(e))
+
+    def create_web_view(self):
+        """Load the web engine, create the view and open the web interface"""
+        try:
+            started = time.perf_counter()
+            from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineProfile
+
+            # Configure QWebEngineView
+            profile = QWebEngineProfile.defaultProfile()
+            profile.setPersistentCookiesPolicy(QWebEngineProfile.NoPersistentCookies)
+            if HTTP_CACHE_MB > 0:
+                # Bounded disk cache so immutable uploads are not downloaded again
+                profile.setCachePath(os.path.join(app_dir, 'web_cache'))
+                profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+                profile.setHttpCacheMaximumSize(HTTP_CACHE_MB * 1024 * 1024)
+                debug_print(f"HTTP disk cache enabled ({HTTP_CACHE_MB} MB)")
+            else:
+                profile.setHttpCacheType(QWebEngineProfile.NoCache)
+
+            self.web_view = QWebEngineView()
+            self.web_view.loadFinished.connect(self.page_loaded)
+            self.central_layout.replaceWidget(self.placeholder, self.web_view)
+            self.placeholder.deleteLater()
+            startup.record("web engine", started)
+
+            # The socket is already listening, so the request waits in its
+            # backlog until the server accepts it; no polling is needed
+            self.load_url()
+        except Exception as e:
+            debug_print(f"Error creating web view: {e}")
+            debug_print(f"Traceback: {traceback.format_exc()}")
+            self.show_error("Initialization Error", str(e))
+
+    def load_url(self):
+        try:
+            debug_print("Loading web interface...")
+            self.web_view.setUrl(QUrl(f"http://{SERVER_HOST}:{SERVER_PORT}"))
+            debug_print("URL loaded into web view")
+        except Exception as e:
+            debug_print(f"Error loading URL: {e}")
+            debug_print(f"Traceback: {traceback.format_exc()}")
+            self.show_error("Loading Error", str(e))
+
+    def page_loaded(self, ok):
+        """Finish the startup measurement when the first page is shown"""
+        if not ok:
+            debug_print("Web interface failed to load")
+            return
+        startup.record("first page loaded")
+        startup.report()
+
+    def run_flask(self):
+        try:
+            started = time.perf_counter()
+            debug_print("Starting Flask server...")
+            debug_print(f"Template directory: {os.path.join(base_dir, 'templates')}")
+            debug_print(f"Static directory: {os.path.join(base_dir, 'static')}")
+            debug_print(f"Current working directory: {os.getcwd()}")
+            # Imported here so the window does not wait for Flask and the stores
+            from web_app import app, init_app
+            startup.record("web app import", started)
+            init_app()
+            serve_app(app, host=SERVER_HOST, port=SERVER_PORT, on_ready=self.server_ready,
+                      fd=self.server_socket.fileno())
+        except Exception as e:
+            debug_print(f"Flask server error: {e}")
+            debug_print(f"Traceback: {traceback.format_exc()}")
+            # Refuse the connections waiting in the backlog instead of leaving them hanging
+            self.server_socket.close()
+            self.server_failed.emit(str(e))
+
+    def server_ready(self, server):
+        """Remember the running server so it can be shut down on close"""
+        self.server = server
+        startup.record("server ready")
+
+    def activate(self):
+        """Bring the window to the front when the application is launched again"""
+        debug_print("Another launch was requested, raising the window")
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def show_error(self, title, message):
+        debug_print(f"Error - {title}: {message}")
+        QMessageBox.critical(self, title, message)
+
+    def closeEvent(self, event):
+        try:
+            debug_print("Application closing...")
+            if self.web_view is not None:
+                self.web_view.setUrl(QUrl("about:blank"))
+            if self.server is not None:
+                # Stop accepting requests and let in-flight ones finish
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            event.accept()
+        except Exception as e:
+            debug_print(f"Error during cleanup: {e}")
+            debug_print(f"Traceback: {traceback.format_exc()}")
+
+def run(launch_time):
+    """
+    Start the desktop application and run its event loop
+
+    Args:
+        launch_time (float): time.perf_counter() value at process start
+
+    Returns:
+        int: Process exit code
+    """
+    global startup
+    # Set up before anything logs; web_app reuses this setup
+    setup_logging(app_dir)
+    startup = StartupTimer(launch_time)
+    debug_print(f"Starting application at {datetime.now()}")
+    debug_print(f"Python executable: {sys.executable}")
+    debug_print(f"Working directory: {os.getcwd()}")
+    debug_print("Running in PyInstaller bundle" if getattr(sys, 'frozen', False)
+                else "Running in Python environment")
+    debug_print(f"Base directory: {base_dir}")
+    debug_print(f"App directory: {app_dir}")
+
+    try:
+        startup.record("python imports", launch_time)
+
+        started = time.perf_counter()
+        # Lets QtWebEngine be imported after the application is created
+        QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+        qt_app = QApplication(sys.argv)
+        startup.record("qt application", started)
+
+        started = time.perf_counter()
+        instance_lock = acquire_instance_lock()
+        if instance_lock is None:
+            debug_print("Application is already running, handing over to it")
+            return 0
+        startup.record("instance lock", started)
+
+        started = time.perf_counter()
+        try:
+            server_socket = bind_socket(SERVER_HOST, SERVER_PORT)
+        except OSError as e:
+            debug_print(f"Could not listen on {SERVER_HOST}:{SERVER_PORT}: {e}")
+            QMessageBox.critical(None, "Server Error",
+                                 f"Port {SERVER_PORT} is in use by another program.\n{e}")
+            return 1
+        startup.record("server socket", started)
+
+        started = time.perf_counter()
+        window = ConfigScreen(server_socket)
+
+        def another_launch():
+            while instance_lock.hasPendingConnections():
+                instance_lock.nextPendingConnection().deleteLater()
+            window.activate()
+
+        instance_lock.newConnection.connect(another_launch)
+        window.show()
+        startup.record("main window", started)
+        debug_print("Application started successfully")
+        return qt_app.exec_()
+    except Exception as e:
+        debug_print(f"Application error: {e}")
+        debug_print(f"Traceback: {traceback.format_exc()}")
+        return 1
@@ -0,0 +1,88 @@
+import time
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage
+
+
+class DisplayBuffer:
+    """Reusable destination buffer that scales BGR frames for display"""
+
+    def __init__(self):
+        self.box_width = 0
+        self.box_height = 0
+        self.source_shape = None
+        self.buffer = None
+        self.image = None
+        self.rebuilds = 0
+        self.frames = 0
+        self.render_seconds = 0.0
+
+    def resize(self, width, height):
+        """
+        Set the area frames are fitted into
+
+        The buffer itself is rebuilt lazily on the next frame.
+
+        Args:
+            width (int): Width of the display area in pixels
+            height (int): Height of the display area in pixels
+        """
+        if (width, height) != (self.box_width, self.box_height):
+            self.box_width = width
+            self.box_height = height
+            self.source_shape = None
+
+    def _rebuild(self, shape):
+        """Fit a source frame shape into the display area, reallocating if needed"""
+        height, width = shape[:2]
+        scale = min(self.box_width / width, self.box_height / height)
+        new_w = max(int(width * scale), 1)
+        new_h = max(int(height * scale), 1)
+        # Sources of the same aspect ratio (e.g. cached frames) share a buffer
+        if self.buffer is None or self.buffer.shape[:2] != (new_h, new_w):
+            self.buffer = np.empty((new_h, new_w, 3), np.uint8)
+            # The image shares the buffer's memory, so it must not outlive it
+            self.image = QImage(self.buffer.data, new_w, new_h, new_w * 3, QImage.Format_BGR888)
+            self.rebuilds += 1
+        self.source_shape = shape
+
+    def render(self, frame):
+        """
+        Scale a BGR frame into the reused buffer
+
+        Args:
+            frame (numpy.ndarray): BGR frame
+
+        Returns:
+            QImage or None: Image over the buffer, valid until the next call,
+                            or None if the display area is empty
+        """
+        if self.box_width <= 0 or self.box_height <= 0:
+            return None
+        start = time.perf_counter()
+        if frame.shape != self.source_shape:
+            self._rebuild(frame.shape)
+
+        if frame.shape == self.buffer.shape:
+            np.copyto(self.buffer, frame)
+        else:
+            cv2.resize(frame, (self.buffer.shape[1], self.buffer.shape[0]), dst=self.buffer)
+
+        self.frames += 1
+        self.render_seconds += time.perf_counter() - start
+        return self.image
+
+    def stats(self):
+        """
+        Get per-frame display timings
+
+        Returns:
+            dict: Rendered frames, buffer rebuilds and average render time in
+                  milliseconds
+        """
+        frames = max(self.frames, 1)
+        return {
+            'frames': self.frames,
+            'rebuilds': self.rebuilds,
+            'render_ms': self.render_seconds * 1000 / frames
+        }
@@ -0,0 +1,275 @@
+import os
+import time
+import struct
+import hashlib
+import logging
+import threading
+
+from background_store import BackgroundJobs
+from mp4_atoms import CONTAINER_BOXES, iter_boxes, iter_buffer_boxes, make_box
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+# Largest chunk offset an stco table can hold; bigger files need co64
+MAX_STCO_OFFSET = 0xFFFFFFFF
+
+
+def rewrite_moov(payload, relocate, use_co64=False):
+    """
+    Rebuild the payload of a moov box with relocated chunk offsets
+
+    Args:
+        payload (bytes): Contents of the box without its header
+        relocate (callable): Maps an old file offset to its new one
+        use_co64 (bool): Store every chunk offset table as 64-bit co64
+
+    Returns:
+        bytes: The rebuilt payload
+    """
+    parts = []
+    for box_type, header_size, size, offset in iter_buffer_boxes(payload):
+        body = payload[offset + header_size:offset + size]
+        if box_type in CONTAINER_BOXES:
+            parts.append(make_box(box_type, rewrite_moov(body, relocate, use_co64)))
+        elif box_type in (b'stco', b'co64'):
+            # payload: version/flags (4), entry_count (4), then the offsets
+            count = struct.unpack_from('>I', body, 4)[0]
+            width = 'I' if box_type == b'stco' else 'Q'
+            offsets = [relocate(value) for value in struct.unpack_from(f'>{count}{width}', body, 8)]
+            if use_co64 or box_type == b'co64':
+                parts.append(make_box(b'co64', body[:8] + struct.pack(f'>{count}Q', *offsets)))
+            else:
+                if offsets and max(offsets) > MAX_STCO_OFFSET:
+                    raise OverflowError('Chunk offset does not fit in stco')
+                parts.append(make_box(b'stco', body[:8] + struct.pack(f'>{count}I', *offsets)))
+        else:
+            parts.append(payload[offset:offset + size])
+    return b''.join(parts)
+
+
+def read_layout(path):
+    """
+    List the top-level boxes of an MP4 file
+
+    Returns:
+        list: (box type, offset, header size, total size) in file order
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        return list(iter_boxes(f, 0, f.tell()))
+
+
+def needs_faststart(path):
+    """
+    Check whether a file's moov box comes after its media data
+
+    Fragmented files (with moof boxes) stream already and are left alone.
+
+    Args:
+        path (str): Path to the MP4 file
+
+    Returns:
+        bool: True if moving the moov box to the front would help
+    """
+    try:
+        layout = read_layout(path)
+    except OSError:
+        return False
+    types = [box[0] for box in layout]
+    if b'moov' not in types or b'mdat' not in types or b'moof' in types:
+        return False
+    return types.index(b'moov') > types.index(b'mdat')
+
+
+def startup_cost(path):
+    """
+    Estimate what a browser fetches before it can decode the first frame
+
+    With the moov box up front, one request covering the file start is
+    enough. Otherwise the browser reads up to the media data, fetches the
+    tail to get the moov box and then comes back for the first sample.
+
+    Args:
+        path (str): Path to the MP4 file
+
+    Returns:
+        dict: Number of range requests and bytes needed, or None if the
+              file has no moov and mdat box
+    """
+    boxes = {}
+    for box_type, offset, _, size in read_layout(path):
+        boxes.setdefault(box_type, (offset, size))
+    if b'moov' not in boxes or b'mdat' not in boxes:
+        return None
+    moov_offset, moov_size = boxes[b'moov']
+    mdat_offset = boxes[b'mdat'][0]
+    if moov_offset < mdat_offset:
+        return {'requests': 1, 'bytes': moov_offset + moov_size}
+    return {'requests': 3, 'bytes': mdat_offset + moov_size}
+
+
+def time_to_first_frame(source):
+    """
+    Time opening a video and decoding its first frame
+
+    Args:
+        source (str): Path or URL of the video
+
+    Returns:
+        float or None: Milliseconds, or None if no frame could be decoded
+    """
+    # Loaded on first use so the web server starts without OpenCV
+    import cv2
+    start = time.perf_counter()
+    cap = cv2.VideoCapture(source)
+    try:
+        ok = cap.isOpened() and cap.read()[0]
+    finally:
+        cap.release()
+    return (time.perf_counter() - start) * 1000 if ok else None
+
+
+def _copy_range(src, dst, start, length, digest):
+    """Copy part of one file to another, feeding the bytes into a hash"""
+    src.seek(start)
+    while length > 0:
+        data = src.read(min(COPY_BUFFER_SIZE, length))
+        if not data:
+            raise ValueError('File ended inside a box')
+        digest.update(data)
+        dst.write(data)
+        length -= len(data)
+
+
+def remux_faststart(src_path, dst_path):
+    """
+    Write a copy of an MP4 file with its moov box in front of the media data
+
+    The media data is copied unchanged and only the chunk offset tables are
+    patched, so nothing is re-encoded. Offsets are promoted to co64 if the
+    larger shift pushes them past 4 GiB.
+
+    Args:
+        src_path (str): MP4 file with the moov box after the media data
+        dst_path (str): Path the rewritten file is written to
+
+    Returns:
+        str: Hex SHA-256 of the written file
+    """
+    layout = read_layout(src_path)
+    types = [box[0] for box in layout]
+    moov_index = types.index(b'moov')
+    insert_index = types.index(b'mdat')
+    _, moov_offset, moov_header, moov_size = layout[moov_index]
+    insert_at = layout[insert_index][1]
+
+    with open(src_path, 'rb') as src:
+        src.seek(moov_offset + moov_header)
+        moov_payload = src.read(moov_size - moov_header)
+
+        # The rebuilt size does not depend on the offset values, only on
+        # whether the tables are 32 or 64 bits wide
+        for use_co64 in (False, True):
+            new_size = len(make_box(b'moov', rewrite_moov(moov_payload, lambda value: 0, use_co64)))
+
+            def relocate(value):
+                if insert_at <= value < moov_offset:
+                    return value + new_size
+                if value >= moov_offset + moov_size:
+                    return value + new_size - moov_size
+                return value
+
+            try:
+                moov = make_box(b'moov', rewrite_moov(moov_payload, relocate, use_co64))
+                break
+            except OverflowError:
+                continue
+
+        digest = hashlib.sha256()
+        with open(dst_path, 'wb') as dst:
+            for index, (box_type, offset, _, size) in enumerate(layout):
+                if index == insert_index:
+                    digest.update(moov)
+                    dst.write(moov)
+                if index != moov_index:
+                    _copy_range(src, dst, offset, size, digest)
+            dst.flush()
+            os.fsync(dst.fileno())
+    return digest.hexdigest()
+
+
+class FaststartQueue(BackgroundJobs):
+    """Worker that remuxes videos for fast start and publishes the result"""
+
+    def __init__(self, workers=1):
+        """
+        Initialize the queue
+
+        Args:
+            workers (int): Number of videos remuxed in parallel
+        """
+        super().__init__(workers, 'faststart')
+
+    def ensure(self, video_path, publish):
+        """
+        Schedule a remux unless the file starts fast or is already queued
+
+        Args:
+            video_path (str): Path to the MP4 file
+            publish (callable): Called with (video path, remuxed file path,
+                                hex SHA-256 of the remuxed file) to swap the
+                                new file in; the remuxed file is deleted
+                                afterwards if it is still there
+
+        Returns:
+            concurrent.futures.Future or None: The pending job, or None if
+                                               no remux is needed
+        """
+        if not needs_faststart(video_path):
+            return None
+        key = os.path.normcase(os.path.abspath(video_path))
+        return self._submit(key, self._remux, video_path, publish)
+
+    def _remux(self, video_path, publish):
+        """Remux into a hidden file next to the video and publish it when complete"""
+        directory, name = os.path.split(video_path)
+        tmp_path = os.path.join(directory, f'.{name}.faststart.part')
+        try:
+            before = startup_cost(video_path)
+            before_ms = time_to_first_frame(video_path)
+            start = time.perf_counter()
+            digest = remux_faststart(video_path, tmp_path)
+            remux_seconds = time.perf_counter() - start
+            after = startup_cost(tmp_path)
+            after_ms = time_to_first_frame(tmp_path)
+            if after_ms is None:
+                logger.warning(f'Faststart copy of {video_path} does not decode; keeping the original')
+                return None
+            new_path = publish(video_path, tmp_path, digest)
+            logger.info(
+                f'Moved moov to the front of {name} in {remux_seconds:.2f}s: first frame needs '
+                f'{before["requests"]} requests/{before["bytes"]} bytes before, '
+                f'{after["requests"]}/{after["bytes"]} after; local open+decode '
+                f'{before_ms or 0:.1f} ms -> {after_ms:.1f} ms'
+            )
+            return new_path
+        except Exception as e:
+            logger.error(f'Error remuxing {video_path} for fast start: {e}')
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_faststart_queue():
+    """Get the faststart remux queue shared by the application"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = FaststartQueue()
+        return _queue
@@ -0,0 +1,230 @@
+import os
+import bisect
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from keyframe_index import KeyframeIndex, fast_seek
+
+DEFAULT_BATCH_SIZE = 32
+# Shards per worker process, so that a slow shard does not leave cores idle
+SHARDS_PER_WORKER = 4
+# Frames skipped with grab() before a seek is used, when the GOP length is unknown
+MAX_GRAB_DISTANCE = 30
+
+
+def output_size(roi, scale):
+    """
+    Get the size of frames cropped to a region and scaled
+
+    Args:
+        roi (tuple): (x, y, width, height) region in source pixels
+        scale (float): Scale factor applied after cropping
+
+    Returns:
+        tuple: (width, height) of the output frames
+    """
+    return max(int(round(roi[2] * scale)), 1), max(int(round(roi[3] * scale)), 1)
+
+
+def clamp_roi(roi, width, height):
+    """
+    Clip a region of interest to the frame, or cover the whole frame if None
+
+    Args:
+        roi (tuple or None): (x, y, width, height) in pixels
+        width (int): Frame width
+        height (int): Frame height
+
+    Returns:
+        tuple: The clipped (x, y, width, height)
+
+    Raises:
+        ValueError: If the region does not overlap the frame
+    """
+    if roi is None:
+        return 0, 0, width, height
+    x, y, roi_width, roi_height = (int(value) for value in roi)
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + roi_width, width), min(y + roi_height, height)
+    if right <= left or bottom <= top:
+        raise ValueError(f'Region {roi} is outside the {width}x{height} frame')
+    return left, top, right - left, bottom - top
+
+
+def iter_batches(video_path, start, stop, stride=1, batch_size=DEFAULT_BATCH_SIZE,
+                 roi=None, size=None, index=None, threads=None):
+    """
+    Decode a frame range into stacked batches
+
+    Skipped frames are stepped over with grab(). A container seek costs
+    far more than decoding a frame, so one is only used to skip more than
+    the longest GOP. Each frame is cropped and resized straight into its
+    slot of the batch array.
+
+    Args:
+        video_path (str): File to decode
+        start (int): First frame
+        stop (int): Frame after the last one
+        stride (int): Distance between returned frames
+        batch_size (int): Frames per batch
+        roi (tuple, optional): (x, y, width, height) crop in this file's pixels
+        size (tuple, optional): (width, height) of the returned frames;
+                                defaults to the size of the crop
+        index (KeyframeIndex, optional): Keyframe index used to plan skips
+        threads (int, optional): Decoder threads, or None for the default
+
+    Yields:
+        tuple: (frame numbers as an int64 array, uint8 array of shape
+               (n, height, width, 3)), with n < batch_size only at the end
+    """
+    params = [] if threads is None else [cv2.CAP_PROP_N_THREADS, threads]
+    cap = cv2.VideoCapture(video_path, cv2.CAP_ANY, params)
+    if not cap.isOpened():
+        raise IOError(f'Could not open {video_path}')
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        x, y, roi_width, roi_height = clamp_roi(roi, width, height)
+        if size is None:
+            size = (roi_width, roi_height)
+        resize = size != (roi_width, roi_height)
+        max_grab = index.max_gop if index is not None else MAX_GRAB_DISTANCE
+
+        position = 0
+        target = start
+        while target < stop:
+            count = min(batch_size, -(-(stop - target) // stride))
+            indices = np.empty(count, np.int64)
+            batch = np.empty((count, size[1], size[0], 3), np.uint8)
+            filled = 0
+            while filled < count:
+                if 0 < target - position <= max_grab:
+                    for _ in range(target - position):
+                        cap.grab()
+                else:
+                    fast_seek(cap, position, target, index)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                position = target + 1
+                crop = frame[y:y + roi_height, x:x + roi_width]
+                if resize:
+                    cv2.resize(crop, size, dst=batch[filled], interpolation=cv2.INTER_AREA)
+                else:
+                    batch[filled] = crop
+                indices[filled] = target
+                filled += 1
+                target += stride
+            if filled:
+                yield indices[:filled], batch[:filled]
+            if filled < count:
+                # The container reported more frames than could be decoded
+                break
+    finally:
+        cap.release()
+
+
+def shard_ranges(keyframes, start, stop, stride, shards):
+    """
+    Split a frame range into contiguous shards that begin near keyframes
+
+    Each shard starts at the first frame on the stride grid at or after a
+    keyframe, so a worker seeking there decodes only a few frames it does
+    not return. Shards are chosen to be of roughly equal length.
+
+    Args:
+        keyframes (list): Sorted keyframe indices
+        start (int): First frame
+        stop (int): Frame after the last one
+        stride (int): Distance between returned frames
+        shards (int): Desired number of shards
+
+    Returns:
+        list: (start, stop) pairs covering the range in order
+    """
+    cuts = sorted({start + -(-(keyframe - start) // stride) * stride
+                   for keyframe in keyframes if start < keyframe < stop})
+    cuts = [cut for cut in cuts if cut < stop]
+    bounds = [start]
+    length = (stop - start) / max(shards, 1)
+    for shard in range(1, shards):
+        wanted = start + shard * length
+        position = bisect.bisect_left(cuts, wanted)
+        nearest = min(cuts[max(position - 1, 0):position + 1], key=lambda cut: abs(cut - wanted),
+                      default=None)
+        if nearest is not None and nearest > bounds[-1]:
+            bounds.append(nearest)
+    bounds.append(stop)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _decode_shard(video_path, start, stop, stride, batch_size, roi, size, func, threads):
+    """Worker process task: decode one shard and apply func to each batch"""
+    index = KeyframeIndex.load(video_path)
+    results = []
+    for frame_numbers, batch in iter_batches(video_path, start, stop, stride, batch_size,
+                                             roi, size, index, threads):
+        results.append((frame_numbers, batch) if func is None else func(frame_numbers, batch))
+    return results
+
+
+def map_batches(video_path, func, start, stop, stride=1, batch_size=DEFAULT_BATCH_SIZE,
+                roi=None, size=None, index=None, workers=None):
+    """
+    Decode a frame range on a pool of processes and apply func to each batch
+
+    The range is split at keyframes into shards decoded independently by
+    worker processes, each with its own capture. Results come back in frame
+    order. func runs in the workers, so it must be a module-level function,
+    and returning reductions rather than frames avoids copying the frames
+    between processes. Batches never span two shards, so some batches in
+    the middle of the range can be shorter than batch_size.
+
+    Args:
+        video_path (str): File to decode
+        func (callable or None): Called as func(frame_numbers, batch) in the
+                                 worker; None returns the batches themselves
+        start (int): First frame
+        stop (int): Frame after the last one
+        stride (int): Distance between returned frames
+        batch_size (int): Frames per batch
+        roi (tuple, optional): (x, y, width, height) crop in this file's pixels
+        size (tuple, optional): (width, height) of the frames passed to func
+        index (KeyframeIndex, optional): Keyframe index of the file
+        workers (int, optional): Worker processes; defaults to the CPU count
+
+    Yields:
+        The result of func for each batch, in frame order
+    """
+    workers = workers or os.cpu_count() or 1
+    if index is None:
+        index = KeyframeIndex.load_or_build(video_path)
+    keyframes = index.keyframes if index is not None else []
+    shards = shard_ranges(keyframes, start, stop, stride, workers * SHARDS_PER_WORKER)
+    # Share the cores between the workers' decoders instead of oversubscribing them
+    threads = max((os.cpu_count() or 1) // workers, 1)
+
+    # Spawned workers do not inherit Qt's or the decoder's threads from a fork
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        shard_iter = iter(shards)
+        try:
+            while True:
+                # Keep a bounded number of shards ahead so finished results do not pile up
+                while len(pending) < workers * 2:
+                    shard = next(shard_iter, None)
+                    if shard is None:
+                        break
+                    pending.append(pool.submit(_decode_shard, video_path, shard[0], shard[1], stride,
+                                               batch_size, roi, size, func, threads))
+                if not pending:
+                    break
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,174 @@
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+from keyframe_index import fast_seek
+
+# Memory budget of the decoded-frame cache in megabytes
+DEFAULT_BUDGET_MB = int(os.environ.get('FRAME_CACHE_MB', '256'))
+
+
+class FrameCache:
+    """LRU cache of decoded frames stored at display resolution in one preallocated array"""
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        """
+        Initialize the cache
+
+        Args:
+            budget_mb (int): Maximum memory used by cached frames, in megabytes
+        """
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.frame_shape = None
+        self.capacity = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._slots = None
+        self._index = OrderedDict()
+        self._free = []
+        self._lock = threading.Lock()
+
+    def configure(self, width, height):
+        """
+        Set the resolution frames are stored at, discarding cached frames
+
+        The slot array is (re)allocated only when the resolution changes.
+
+        Args:
+            width (int): Frame width in pixels
+            height (int): Frame height in pixels
+        """
+        shape = (max(int(height), 1), max(int(width), 1), 3)
+        with self._lock:
+            if shape != self.frame_shape:
+                frame_bytes = shape[0] * shape[1] * shape[2]
+                self.capacity = max(self.budget_bytes // frame_bytes, 1)
+                self._slots = np.empty((self.capacity,) + shape, np.uint8)
+                self.frame_shape = shape
+            self._index.clear()
+            self._free = list(range(self.capacity - 1, -1, -1))
+
+    def get(self, key):
+        """
+        Get a cached frame and mark it as recently used
+
+        Args:
+            key (tuple): (video path, frame index)
+
+        Returns:
+            numpy.ndarray or None: View of the cached BGR frame
+        """
+        with self._lock:
+            slot = self._index.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return self._slots[slot]
+
+    def put(self, key, frame):
+        """
+        Store a frame, scaling it to the cache resolution
+
+        Args:
+            key (tuple): (video path, frame index)
+            frame (numpy.ndarray): Decoded BGR frame
+
+        Returns:
+            numpy.ndarray or None: View of the stored frame, or None if the
+                                   cache is not configured
+        """
+        with self._lock:
+            if self._slots is None:
+                return None
+            slot = self._index.get(key)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    # Reuse the slot of the least recently used frame
+                    _, slot = self._index.popitem(last=False)
+                    self.evictions += 1
+                self._index[key] = slot
+            else:
+                self._index.move_to_end(key)
+
+            target = self._slots[slot]
+            if frame.shape == target.shape:
+                np.copyto(target, frame)
+            else:
+                cv2.resize(frame, (target.shape[1], target.shape[0]), dst=target,
+                           interpolation=cv2.INTER_AREA)
+            return target
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._index
+
+    def clear(self):
+        """Discard every cached frame, keeping the allocated slots"""
+        with self._lock:
+            self._index.clear()
+            self._free = list(range(self.capacity - 1, -1, -1))
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: Capacity, cached frames, hits, misses and evictions
+        """
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'cached': len(self._index),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+def read_frame_cached(cap, position, target, video_path, cache, index=None):
+    """
+    Get a frame through the cache, decoding it with the capture on a miss
+
+    On a miss with a keyframe index, decoding starts at the target's keyframe
+    (or the current position when it lies within the same GOP) and every
+    frame read on the way is cached, so stepping back through that GOP is
+    served from memory.
+
+    Args:
+        cap (cv2.VideoCapture): Open capture of the video
+        position (int): Frame the next cap.read() would return
+        target (int): Frame to get
+        video_path (str): Path of the video, used in cache keys
+        cache (FrameCache): Decoded-frame cache
+        index (KeyframeIndex, optional): Keyframe index of the video
+
+    Returns:
+        tuple: (cached display-resolution frame or None, frame the next
+               cap.read() will return)
+    """
+    frame = cache.get((video_path, target))
+    if frame is not None:
+        return frame, position
+
+    start = target
+    if index is not None:
+        keyframe = index.keyframe_before(target)
+        start = position if keyframe <= position <= target else keyframe
+    fast_seek(cap, position, start, index)
+
+    position = start
+    while position <= target:
+        ret, decoded = cap.read()
+        if not ret:
+            return None, position
+        stored = cache.put((video_path, position), decoded)
+        frame = decoded if stored is None else stored
+        position += 1
+    return frame, position
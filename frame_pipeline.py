@@ -0,0 +1,438 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QThread
+import cv2
+
+import metrics
+from keyframe_index import fast_seek
+
+# Number of decoded frames kept ready ahead of the playhead
+DEFAULT_BUFFER_SIZE = 8
+
+decode_seconds = metrics.Histogram('player_decode_seconds', 'Time to read and decode one frame')
+convert_seconds = metrics.Histogram('player_convert_seconds', 'Time to resize or convert one frame for display')
+
+
+class FrameRingBuffer:
+    """Bounded, thread-safe queue of decoded frames tagged with a seek generation"""
+
+    def __init__(self, capacity=DEFAULT_BUFFER_SIZE):
+        """
+        Initialize the buffer
+
+        Args:
+            capacity (int): Maximum number of frames held at once
+        """
+        self.capacity = capacity
+        self.generation = 0
+        self.dropped_frames = 0
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, generation, index, frame, timeout=0.1):
+        """
+        Add a frame, waiting while the buffer is full
+
+        Args:
+            generation (int): Seek generation the frame was decoded for
+            index (int): Frame number within the video
+            frame (numpy.ndarray): Decoded BGR frame
+            timeout (float): Seconds to wait for free space
+
+        Returns:
+            bool: True if stored, False if stale, closed or still full
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (len(self._frames) < self.capacity or self._closed
+                         or generation != self.generation),
+                timeout
+            )
+            if self._closed or generation != self.generation:
+                self.dropped_frames += 1
+                return False
+            if len(self._frames) >= self.capacity:
+                return False
+            self._frames.append((index, frame))
+            return True
+
+    def peek(self):
+        """
+        Look at the oldest frame without removing it
+
+        Returns:
+            tuple or None: (frame index, frame) or None if the buffer is empty
+        """
+        with self._cond:
+            return self._frames[0] if self._frames else None
+
+    def get(self):
+        """
+        Take the oldest frame without waiting
+
+        Returns:
+            tuple or None: (frame index, frame) or None if the buffer is empty
+        """
+        with self._cond:
+            if not self._frames:
+                return None
+            item = self._frames.popleft()
+            self._cond.notify_all()
+            return item
+
+    def clear(self):
+        """
+        Discard all buffered frames and start a new generation
+
+        Returns:
+            int: The new generation
+        """
+        with self._cond:
+            self.dropped_frames += len(self._frames)
+            self._frames.clear()
+            self.generation += 1
+            self._cond.notify_all()
+            return self.generation
+
+    def close(self):
+        """Wake up and refuse any waiting producer"""
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._frames)
+
+
+class DecodeWorker(QThread):
+    """Decodes frames ahead of the playhead into a FrameRingBuffer"""
+
+    def __init__(self, video_path, buffer_size=DEFAULT_BUFFER_SIZE, parent=None):
+        """
+        Initialize the worker
+
+        Args:
+            video_path (str): Path to the video file
+            buffer_size (int): Number of frames decoded ahead
+            parent (QObject, optional): Qt parent object
+        """
+        super().__init__(parent)
+        self.video_path = video_path
+        self.buffer = FrameRingBuffer(buffer_size)
+        self.decoded_frames = 0
+        self.stride = 1
+        self.keyframe_index = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending_seek = None
+        self._at_end = False
+        self._stopping = False
+
+    def seek(self, frame_index):
+        """
+        Restart decoding from a frame, discarding everything buffered
+
+        Args:
+            frame_index (int): Frame number to decode next
+        """
+        with self._lock:
+            generation = self.buffer.clear()
+            self._pending_seek = (frame_index, generation)
+            self._at_end = False
+        self._wake.set()
+
+    def set_stride(self, stride):
+        """
+        Decode only every n-th frame, skipping the others without decoding them
+
+        Args:
+            stride (int): Distance between decoded frames (1 decodes all)
+        """
+        self.stride = max(int(stride), 1)
+
+    def at_end(self):
+        """
+        Check whether every frame up to the end of the video has been consumed
+
+        Returns:
+            bool: True if decoding hit the end and the buffer is empty
+        """
+        with self._lock:
+            return self._at_end and len(self.buffer) == 0
+
+    def stats(self):
+        """
+        Get decoding counters
+
+        Returns:
+            dict: Decoded, dropped and currently buffered frame counts
+        """
+        return {
+            'decoded': self.decoded_frames,
+            'dropped': self.buffer.dropped_frames,
+            'buffered': len(self.buffer)
+        }
+
+    def stop(self):
+        """Stop decoding and wait for the thread to finish"""
+        self._stopping = True
+        self.buffer.close()
+        self._wake.set()
+        self.wait()
+
+    def run(self):
+        """Decode loop running on the worker thread"""
+        cap = cv2.VideoCapture(self.video_path)
+        generation = None
+        next_index = 0
+        # Frame the capture will return next, or None when unknown
+        cap_position = 0
+        try:
+            while not self._stopping:
+                with self._lock:
+                    pending, self._pending_seek = self._pending_seek, None
+                    at_end = self._at_end
+                if pending is not None:
+                    next_index, generation = pending
+                    if cap_position is None:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, next_index)
+                    else:
+                        fast_seek(cap, cap_position, next_index, self.keyframe_index)
+                    cap_position = next_index
+                elif generation is None or at_end:
+                    # Nothing to decode until the next seek
+                    self._wake.wait(0.1)
+                    self._wake.clear()
+                    continue
+
+                started = time.perf_counter()
+                ret, frame = cap.read()
+                decode_seconds.observe(time.perf_counter() - started)
+                if not ret:
+                    cap_position = None
+                    with self._lock:
+                        if self._pending_seek is None:
+                            self._at_end = True
+                    continue
+
+                cap_position += 1
+                self.decoded_frames += 1
+                while not self._stopping:
+                    if self.buffer.put(generation, next_index, frame):
+                        break
+                    if generation != self.buffer.generation:
+                        break
+                next_index += 1
+
+                # Fast playback: step over frames that will never be shown with
+                # grab(), which skips retrieving and converting the image
+                for _ in range(self.stride - 1):
+                    if not cap.grab():
+                        break
+                    next_index += 1
+                    cap_position += 1
+        finally:
+            cap.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_decode_pool():
+    """Get the thread pool shared by pooled decoders"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # OpenCV releases the GIL while decoding, so threads scale across cores
+            _pool = ThreadPoolExecutor(max_workers=min(os.cpu_count() or 4, 12),
+                                       thread_name_prefix='decode')
+        return _pool
+
+
+class PooledDecoder:
+    """Decodes one stream ahead of the playhead using tasks on a shared pool
+
+    Unlike DecodeWorker it owns no thread: whenever its buffer has room a
+    task is queued that decodes until the buffer is full, so many streams
+    share a pool sized to the machine.
+    """
+
+    def __init__(self, video_path, pool=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Initialize the decoder
+
+        Args:
+            video_path (str): Path to the video file
+            pool (concurrent.futures.Executor, optional): Pool running decode
+                                                          tasks, shared by default
+            buffer_size (int): Number of frames decoded ahead
+        """
+        self.video_path = video_path
+        self.pool = pool or get_decode_pool()
+        self.buffer = FrameRingBuffer(buffer_size)
+        self.decoded_frames = 0
+        self.stride = 1
+        self.target_size = None
+        self.keyframe_index = None
+        self._cap = None
+        self._cap_position = 0
+        self._generation = None
+        self._next_index = 0
+        self._lock = threading.Lock()
+        self._pending_seek = None
+        self._scheduled = False
+        self._at_end = False
+        self._stopping = False
+
+    def seek(self, frame_index):
+        """
+        Restart decoding from a frame, discarding everything buffered
+
+        Args:
+            frame_index (int): Frame number to decode next
+        """
+        with self._lock:
+            generation = self.buffer.clear()
+            self._pending_seek = (frame_index, generation)
+            self._at_end = False
+        self.schedule()
+
+    def set_stride(self, stride):
+        """
+        Decode only every n-th frame, skipping the others without decoding them
+
+        Args:
+            stride (int): Distance between decoded frames (1 decodes all)
+        """
+        self.stride = max(int(stride), 1)
+
+    def set_target_size(self, width, height):
+        """
+        Downscale frames to fit a size right after decoding
+
+        Args:
+            width (int): Maximum width in pixels
+            height (int): Maximum height in pixels
+        """
+        self.target_size = (max(int(width), 1), max(int(height), 1))
+
+    def at_end(self):
+        """
+        Check whether every frame up to the end of the video has been consumed
+
+        Returns:
+            bool: True if decoding hit the end and the buffer is empty
+        """
+        with self._lock:
+            return self._at_end and len(self.buffer) == 0
+
+    def stats(self):
+        """
+        Get decoding counters
+
+        Returns:
+            dict: Decoded, dropped and currently buffered frame counts
+        """
+        return {
+            'decoded': self.decoded_frames,
+            'dropped': self.buffer.dropped_frames,
+            'buffered': len(self.buffer)
+        }
+
+    def schedule(self):
+        """Queue a decode task unless one is queued or there is nothing to do"""
+        with self._lock:
+            if (self._scheduled or self._stopping or self._generation is None
+                    and self._pending_seek is None):
+                return
+            if self._pending_seek is None and (self._at_end
+                                               or len(self.buffer) >= self.buffer.capacity):
+                return
+            self._scheduled = True
+        self.pool.submit(self._fill)
+
+    def stop(self):
+        """Stop decoding and release the capture once no task is running"""
+        with self._lock:
+            self._stopping = True
+            release = not self._scheduled
+        self.buffer.close()
+        if release:
+            self._release()
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _scale(self, frame):
+        """Fit a frame into the target size, never upscaling"""
+        if self.target_size is None:
+            return frame
+        height, width = frame.shape[:2]
+        scale = min(self.target_size[0] / width, self.target_size[1] / height)
+        if scale >= 1.0:
+            return frame
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        started = time.perf_counter()
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        convert_seconds.observe(time.perf_counter() - started)
+        return frame
+
+    def _fill(self):
+        """Decode task: fill the buffer, then return the thread to the pool"""
+        try:
+            if self._cap is None:
+                self._cap = cv2.VideoCapture(self.video_path)
+            cap = self._cap
+            while not self._stopping:
+                with self._lock:
+                    pending, self._pending_seek = self._pending_seek, None
+                if pending is not None:
+                    self._next_index, self._generation = pending
+                    if self._cap_position is None:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, self._next_index)
+                    else:
+                        fast_seek(cap, self._cap_position, self._next_index, self.keyframe_index)
+                    self._cap_position = self._next_index
+                elif len(self.buffer) >= self.buffer.capacity:
+                    break
+
+                started = time.perf_counter()
+                ret, frame = cap.read()
+                decode_seconds.observe(time.perf_counter() - started)
+                if not ret:
+                    self._cap_position = None
+                    with self._lock:
+                        if self._pending_seek is None:
+                            self._at_end = True
+                            break
+                    continue
+
+                self._cap_position += 1
+                self.decoded_frames += 1
+                # This task is the only producer, so the free slot is still free
+                self.buffer.put(self._generation, self._next_index, self._scale(frame), timeout=0)
+                self._next_index += 1
+
+                for _ in range(self.stride - 1):
+                    if not cap.grab():
+                        break
+                    self._next_index += 1
+                    self._cap_position += 1
+        finally:
+            with self._lock:
+                self._scheduled = False
+                stopping = self._stopping
+            if stopping:
+                self._release()
+            else:
+                # A seek may have arrived after the loop decided to finish
+                self.schedule()
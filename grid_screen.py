@@ -0,0 +1,497 @@
+from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                           QLabel, QPushButton, QSlider, QCheckBox, QGridLayout, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer, QEvent
+from PyQt5.QtGui import QFont
+import cv2
+import math
+
+from video_config import VideoConfig
+from config_store import resolve_video_path
+from frame_pipeline import PooledDecoder, get_decode_pool
+from presentation_clock import PresentationClock
+from keyframe_index import load_index_async
+from video_surface import VideoSurface
+from proxies import get_proxy_store
+
+# Number of clips that can be shown together
+MIN_GRID_VIDEOS = 2
+MAX_GRID_VIDEOS = 12
+
+
+def grid_shape(count):
+    """
+    Get the number of columns and rows of a grid holding some cells
+
+    Args:
+        count (int): Number of cells
+
+    Returns:
+        tuple: (columns, rows)
+    """
+    columns = math.ceil(math.sqrt(count))
+    return columns, math.ceil(count / columns)
+
+
+class GridPlaybackScreen(QMainWindow):
+    """Screen playing several configured videos side by side in sync"""
+
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowTitle("Video Player - Multi-Angle Playback")
+        self.setGeometry(100, 100, 1200, 800)
+
+        # Grid playback variables
+        self.streams = []
+        self.clock = None
+        self.master_fps = 30.0
+        self.master_frames = 0
+        self.playback_speed = 1.0
+        self.is_playing = False
+        self.pending_seek = None
+        self.presented_frames = 0
+        self.late_frames = 0
+        self.skipped_frames = 0
+        self.resyncs = 0
+        # Cells are small, so clips are decoded from proxies when available
+        self.proxy_store = get_proxy_store()
+        self.timer = QTimer()
+        # Ticks are scheduled from the shared presentation clock
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.update_frames)
+        self.seek_timer = QTimer()
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.timeout.connect(self.apply_pending_seek)
+
+        self.init_ui()
+        self.load_videos()
+
+    def init_ui(self):
+        """Initialize the user interface"""
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+
+        main_layout = QVBoxLayout(central_widget)
+
+        # Title
+        title_label = QLabel("Multi-Angle Playback")
+        title_label.setFont(QFont("Arial", 16, QFont.Bold))
+        title_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(title_label)
+
+        # Clip selection
+        selection_layout = QHBoxLayout()
+        self.selection_grid = QGridLayout()
+        self.video_checkboxes = []
+
+        self.load_grid_button = QPushButton("Load Grid")
+        self.load_grid_button.clicked.connect(self.load_grid)
+        self.load_grid_button.setEnabled(False)
+
+        selection_layout.addLayout(self.selection_grid)
+        selection_layout.addStretch()
+        selection_layout.addWidget(self.load_grid_button)
+
+        main_layout.addLayout(selection_layout)
+
+        # Video cells
+        self.grid_widget = QWidget()
+        self.grid_widget.setMinimumSize(800, 450)
+        self.grid_widget.setStyleSheet("background-color: black;")
+        self.grid_layout = QGridLayout(self.grid_widget)
+        self.grid_layout.setSpacing(2)
+        self.grid_layout.setContentsMargins(0, 0, 0, 0)
+
+        main_layout.addWidget(self.grid_widget, 1)
+
+        # Playback controls
+        controls_layout = QHBoxLayout()
+
+        self.play_button = QPushButton("Play")
+        self.play_button.clicked.connect(self.toggle_play)
+        self.play_button.setEnabled(False)
+
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.clicked.connect(self.stop_video)
+        self.stop_button.setEnabled(False)
+
+        speed_label = QLabel("Playback Speed:")
+
+        self.speed_slider = QSlider(Qt.Horizontal)
+        self.speed_slider.setMinimum(10)  # 0.1x speed
+        self.speed_slider.setMaximum(200)  # 2.0x speed
+        self.speed_slider.setValue(100)  # Default to normal speed
+        self.speed_slider.setTickPosition(QSlider.TicksBelow)
+        self.speed_slider.setTickInterval(10)
+        self.speed_slider.valueChanged.connect(self.speed_changed)
+
+        self.speed_value_label = QLabel("1.0x")
+
+        controls_layout.addWidget(self.play_button)
+        controls_layout.addWidget(self.stop_button)
+        controls_layout.addWidget(speed_label)
+        controls_layout.addWidget(self.speed_slider)
+        controls_layout.addWidget(self.speed_value_label)
+
+        main_layout.addLayout(controls_layout)
+
+        # Progress bar/slider
+        progress_layout = QHBoxLayout()
+
+        self.progress_slider = QSlider(Qt.Horizontal)
+        self.progress_slider.setEnabled(False)
+        self.progress_slider.sliderMoved.connect(self.set_position)
+
+        self.time_label = QLabel("00:00 / 00:00")
+
+        self.frame_stats_label = QLabel("")
+
+        progress_layout.addWidget(self.progress_slider)
+        progress_layout.addWidget(self.time_label)
+        progress_layout.addWidget(self.frame_stats_label)
+
+        main_layout.addLayout(progress_layout)
+
+        # Navigation buttons
+        button_layout = QHBoxLayout()
+
+        single_button = QPushButton("Single View")
+        single_button.clicked.connect(self.go_to_single_view)
+
+        back_button = QPushButton("Back to Configuration")
+        back_button.clicked.connect(self.go_back_to_config)
+
+        button_layout.addStretch()
+        button_layout.addWidget(single_button)
+        button_layout.addWidget(back_button)
+
+        main_layout.addLayout(button_layout)
+
+    def load_videos(self):
+        """Offer the configured videos for the grid"""
+        videos = VideoConfig.load_videos()
+
+        # Filter out videos with empty names or paths
+        valid_videos = [video for video in videos if video["name"] and video["path"]]
+
+        if len(valid_videos) < MIN_GRID_VIDEOS:
+            self.selection_grid.addWidget(QLabel(
+                f"Configure at least {MIN_GRID_VIDEOS} videos to use the grid"), 0, 0)
+            return
+
+        for i, video in enumerate(valid_videos[:MAX_GRID_VIDEOS]):
+            checkbox = QCheckBox(video["name"])
+            checkbox.setProperty("video_path", video["path"])
+            checkbox.setChecked(True)
+            checkbox.toggled.connect(self.selection_changed)
+            self.selection_grid.addWidget(checkbox, i // 6, i % 6)
+            self.video_checkboxes.append(checkbox)
+        self.selection_changed()
+
+    def selection_changed(self):
+        """Allow loading the grid when enough clips are selected"""
+        selected = sum(checkbox.isChecked() for checkbox in self.video_checkboxes)
+        self.load_grid_button.setEnabled(MIN_GRID_VIDEOS <= selected <= MAX_GRID_VIDEOS)
+
+    def load_grid(self):
+        """Open the selected clips and lay them out in a grid"""
+        self.stop_video()
+        self.release_streams()
+
+        selected = [checkbox for checkbox in self.video_checkboxes if checkbox.isChecked()]
+        columns, rows = grid_shape(len(selected))
+        pool = get_decode_pool()
+        cell_height = self.grid_widget.height() * self.grid_widget.devicePixelRatioF() / rows
+
+        for i, checkbox in enumerate(selected):
+            video_path = resolve_video_path(checkbox.property("video_path"))
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                QMessageBox.warning(
+                    self,
+                    "Video Error",
+                    f"Could not open video file: {video_path}"
+                )
+                continue
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+
+            # Proxies have the same frames as the original at a lower resolution
+            self.proxy_store.ensure(video_path)
+            decode_path = self.proxy_store.select(video_path, cell_height)
+
+            surface = VideoSurface()
+            surface.setText(checkbox.text())
+            surface.installEventFilter(self)
+            self.grid_layout.addWidget(surface, i // columns, i % columns)
+
+            stream = {
+                "name": checkbox.text(),
+                "path": video_path,
+                "fps": fps,
+                "frame_count": frame_count,
+                "surface": surface,
+                "decoder": PooledDecoder(decode_path, pool),
+                "current_frame": -1,
+                "resyncing": False
+            }
+            self.streams.append(stream)
+            load_index_async(decode_path, lambda index, stream=stream: self.keyframe_index_loaded(stream, index))
+
+        if not self.streams:
+            return
+
+        # The clock runs at the highest frame rate so every clip can be matched
+        self.master_fps = max(stream["fps"] for stream in self.streams)
+        duration = max(stream["frame_count"] / stream["fps"] for stream in self.streams)
+        self.master_frames = max(int(duration * self.master_fps), 1)
+        self.clock = PresentationClock(self.master_fps, self.playback_speed)
+
+        self.progress_slider.setMinimum(0)
+        self.progress_slider.setMaximum(self.master_frames - 1)
+        self.progress_slider.setValue(0)
+        self.progress_slider.setEnabled(True)
+        self.play_button.setEnabled(True)
+        self.stop_button.setEnabled(True)
+        self.presented_frames = 0
+        self.late_frames = 0
+        self.skipped_frames = 0
+        self.resyncs = 0
+
+        for stream in self.streams:
+            stream["decoder"].set_stride(math.ceil(self.playback_speed))
+        self.seek_all(0)
+
+    def keyframe_index_loaded(self, stream, index):
+        """Store a stream's keyframe index built in the background (any thread)"""
+        stream["decoder"].keyframe_index = index
+
+    def eventFilter(self, obj, event):
+        """Decode each stream at the size of its grid cell"""
+        if event.type() == QEvent.Resize:
+            for stream in self.streams:
+                if stream["surface"] is obj:
+                    stream["decoder"].set_target_size(event.size().width(), event.size().height())
+        return super().eventFilter(obj, event)
+
+    def stream_target(self, stream, master_frame):
+        """Get the frame of a stream that matches a frame of the shared clock"""
+        seconds = master_frame / self.master_fps
+        return min(int(seconds * stream["fps"]), max(stream["frame_count"] - 1, 0))
+
+    def seek_all(self, master_frame):
+        """
+        Move every stream to the same point in time
+
+        Args:
+            master_frame (int): Frame of the shared clock
+        """
+        for stream in self.streams:
+            stream["decoder"].seek(self.stream_target(stream, master_frame))
+            stream["current_frame"] = -1
+            stream["resyncing"] = False
+        self.clock.start(master_frame)
+        if not self.is_playing:
+            # Hold the clock; update_frames shows the frames as they arrive
+            self.clock.stop()
+        self.timer.start(0)
+
+    def toggle_play(self):
+        """Toggle between play and pause"""
+        if not self.streams:
+            return
+
+        if self.is_playing:
+            self.timer.stop()
+            self.clock.stop()
+            self.play_button.setText("Play")
+            self.is_playing = False
+        else:
+            self.clock.start(self.clock.frame_at())
+            self.play_button.setText("Pause")
+            self.is_playing = True
+            self.timer.start(0)
+
+    def stop_video(self):
+        """Stop playback and return every clip to the beginning"""
+        self.timer.stop()
+        self.is_playing = False
+        self.play_button.setText("Play")
+        if self.streams:
+            self.seek_all(0)
+            self.progress_slider.setValue(0)
+            self.update_time_label(0)
+
+    def update_frames(self):
+        """Present the frame of every clip that is due on the shared clock"""
+        if not self.streams:
+            return
+
+        master_frame = self.clock.frame_at()
+        if master_frame >= self.master_frames:
+            # End of the longest clip
+            self.toggle_play()
+            self.seek_all(0)
+            return
+
+        settled = True
+        presented = False
+        for stream in self.streams:
+            decoder = stream["decoder"]
+            target = self.stream_target(stream, master_frame)
+
+            # Take the newest buffered frame that is already due
+            item = None
+            while True:
+                head = decoder.buffer.peek()
+                if head is None or head[0] > target:
+                    break
+                if item is not None:
+                    self.skipped_frames += 1
+                item = decoder.buffer.get()
+
+            if item is not None:
+                stream["current_frame"] = item[0]
+                stream["resyncing"] = False
+                stream["surface"].set_frame(item[1])
+                self.presented_frames += 1
+                presented = True
+                decoder.schedule()
+            elif head is None and not decoder.at_end() and stream["current_frame"] < target:
+                self.late_frames += 1
+
+            # Drift correction: a clip that fell too far behind is moved to the
+            # clock instead of catching up frame by frame
+            tolerance = max(2, 2 * decoder.stride)
+            if (self.is_playing and not stream["resyncing"]
+                    and target - stream["current_frame"] > tolerance
+                    and (head is None or head[0] < target - tolerance) and not decoder.at_end()):
+                decoder.seek(target + decoder.stride)
+                stream["resyncing"] = True
+                self.resyncs += 1
+
+            if stream["current_frame"] < target and not decoder.at_end():
+                settled = False
+
+        if presented:
+            self.clock.frame_presented()
+            self.update_frame_stats()
+
+        if self.is_playing:
+            self.progress_slider.setValue(master_frame)
+            self.update_time_label(master_frame)
+            delay = self.clock.seconds_until(master_frame + 1)
+            # Wake at least every 50 ms so stalled decoders are noticed
+            self.timer.start(math.ceil(min(delay, 0.05) * 1000))
+        elif not settled:
+            # Paused after a seek: keep polling until every clip shows its frame
+            self.timer.start(20)
+
+    def frame_stats(self):
+        """
+        Get grid playback counters
+
+        Returns:
+            dict: Presented, late, skipped and resynchronised frame counts,
+                  the target and achieved tick rates and the largest offset
+                  between clips in milliseconds
+        """
+        times = [stream["current_frame"] / stream["fps"]
+                 for stream in self.streams if stream["current_frame"] >= 0]
+        return {
+            'presented': self.presented_frames,
+            'late': self.late_frames,
+            'skipped': self.skipped_frames,
+            'resyncs': self.resyncs,
+            'target_fps': self.clock.target_fps if self.clock else 0.0,
+            'achieved_fps': self.clock.achieved_fps if self.clock else 0.0,
+            'spread_ms': (max(times) - min(times)) * 1000 if times else 0.0
+        }
+
+    def update_frame_stats(self):
+        """Show the grid counters next to the progress bar"""
+        stats = self.frame_stats()
+        self.frame_stats_label.setText(
+            f"FPS: {stats['achieved_fps']:.1f}/{stats['target_fps']:.1f}  "
+            f"Late: {stats['late']}  Skipped: {stats['skipped']}  "
+            f"Resyncs: {stats['resyncs']}  Spread: {stats['spread_ms']:.0f} ms"
+        )
+
+    def update_time_label(self, master_frame):
+        """Show the shared playback time"""
+        current_time = master_frame / self.master_fps
+        total_time = self.master_frames / self.master_fps
+        self.time_label.setText(f"{self.format_time(current_time)} / {self.format_time(total_time)}")
+
+    def speed_changed(self, value):
+        """Handle playback speed slider change"""
+        self.playback_speed = value / 100.0
+        self.speed_value_label.setText(f"{self.playback_speed:.1f}x")
+
+        if self.clock:
+            self.clock.set_speed(self.playback_speed)
+        for stream in self.streams:
+            stream["decoder"].set_stride(math.ceil(self.playback_speed))
+        if self.is_playing:
+            self.timer.start(0)
+
+    def set_position(self, position):
+        """Set the shared position when the user moves the progress slider"""
+        if self.streams:
+            self.update_time_label(position)
+            # Seek only to the latest target once pending slider events are handled
+            self.pending_seek = position
+            if not self.seek_timer.isActive():
+                self.seek_timer.start(0)
+
+    def apply_pending_seek(self):
+        """Move every clip to the most recent slider position"""
+        position, self.pending_seek = self.pending_seek, None
+        if position is not None and self.streams:
+            self.seek_all(position)
+
+    def release_streams(self):
+        """Stop the decoders and remove the grid cells"""
+        for stream in self.streams:
+            stream["decoder"].stop()
+            self.grid_layout.removeWidget(stream["surface"])
+            stream["surface"].deleteLater()
+        self.streams = []
+
+    def format_time(self, seconds):
+        """Format seconds as MM:SS"""
+        minutes = int(seconds // 60)
+        seconds = int(seconds % 60)
+        return f"{minutes:02d}:{seconds:02d}"
+
+    def go_to_single_view(self):
+        """Return to the single video playback screen"""
+        self.timer.stop()
+        self.release_streams()
+
+        # Import here to avoid circular imports
+        from playback_screen import PlaybackScreen
+
+        self.playback_screen = PlaybackScreen()
+        self.playback_screen.show()
+        self.close()
+
+    def go_back_to_config(self):
+        """Return to the configuration screen"""
+        self.timer.stop()
+        self.release_streams()
+
+        # Import here to avoid circular imports
+        from config_screen import ConfigScreen
+
+        self.config_screen = ConfigScreen()
+        self.config_screen.show()
+        self.close()
+
+    def closeEvent(self, event):
+        """Handle window close event"""
+        self.timer.stop()
+        self.release_streams()
+        event.accept()
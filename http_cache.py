@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from werkzeug.http import http_date, parse_date
+
+from background_store import BackgroundJobs
+
+logger = logging.getLogger(__name__)
+
+# Upload names whose contents never change: a UUID4 (older uploads) or the
+# SHA-256 of the contents, and the .mp4 extension
+IMMUTABLE_NAME = re.compile(
+    r'^(?:[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}'
+    r'|[0-9a-f]{64})\.mp4$'
+)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_etag(path):
+    """
+    Compute a strong entity tag from the contents of a file
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def weak_etag(stat):
+    """
+    Build a weak entity tag from the size and modification time of a file
+
+    Args:
+        stat (os.stat_result): Result of os.stat for the file
+
+    Returns:
+        str: Entity tag without quotes or the W/ prefix
+    """
+    return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+
+class ETagIndex(BackgroundJobs):
+    """Small persistent index of strong ETags for uploaded files"""
+
+    def __init__(self, index_path, max_entries=1024):
+        """
+        Initialize the index
+
+        Args:
+            index_path (str): JSON file the index is persisted to
+            max_entries (int): Maximum number of files remembered
+        """
+        super().__init__(1, 'etag')
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self._entries = self._load()
+
+    def _load(self):
+        """Read the persisted index, ignoring a missing or corrupt file"""
+        try:
+            with open(self.index_path, 'r') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Atomically write the index to disk"""
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, path, stat=None):
+        """
+        Get the ETag of a file, hashing it in the background if needed
+
+        Entries are keyed by file name and invalidated when the size or
+        modification time of the file changes. Until the contents have been
+        hashed a weak ETag built from the size and modification time is
+        returned, so no request waits for a whole file to be read.
+
+        Args:
+            path (str): Path to the file
+            stat (os.stat_result, optional): Result of os.stat for the file
+
+        Returns:
+            tuple: (ETag without quotes, True if it is a weak ETag)
+        """
+        stat = stat or os.stat(path)
+        key = os.path.basename(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['etag'], False
+        self._submit(key, self._hash, path, stat)
+        return weak_etag(stat), True
+
+    def _hash(self, path, stat):
+        """Hash a file and record the ETag unless the file changed meanwhile"""
+        try:
+            etag = compute_etag(path)
+            current = os.stat(path)
+            if (current.st_size, current.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                self.put(path, current, etag)
+        except OSError as e:
+            logger.warning(f'Could not hash {path}: {e}')
+
+    def put(self, path, stat=None, etag=None):
+        """
+        Record the ETag of a file
+
+        Args:
+            path (str): Path to the file
+            stat (os.stat_result, optional): Result of os.stat for the file
+            etag (str, optional): Already known ETag; computed if omitted
+
+        Returns:
+            str: Strong ETag without quotes
+        """
+        stat = stat or os.stat(path)
+        etag = etag or compute_etag(path)
+        key = os.path.basename(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'etag': etag
+            }
+            # Entries are kept in insertion order, so the oldest go first
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            try:
+                self._save()
+            except OSError:
+                pass
+        return etag
+
+
+def cache_control_for(filename):
+    """
+    Choose the Cache-Control policy for an uploaded file
+
+    Args:
+        filename (str): Name of the uploaded file
+
+    Returns:
+        str: Cache-Control header value
+    """
+    if IMMUTABLE_NAME.match(os.path.basename(filename)):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def is_not_modified(req, etag, last_modified):
+    """
+    Evaluate If-None-Match and If-Modified-Since for a GET or HEAD request
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    the request carries no entity tags.
+
+    Args:
+        req (flask.Request): The current request
+        etag (str): Current ETag, without quotes; compared weakly
+        last_modified (float): Modification time as a UNIX timestamp
+
+    Returns:
+        bool: True if a 304 Not Modified response should be sent
+    """
+    if req.method not in ('GET', 'HEAD'):
+        return False
+
+    if_none_match = req.headers.get('If-None-Match')
+    if if_none_match:
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == f'"{etag}"':
+                return True
+        return False
+
+    if_modified_since = parse_date(req.headers.get('If-Modified-Since'))
+    if if_modified_since is None:
+        return False
+    return int(last_modified) <= int(if_modified_since.timestamp())
+
+
+def format_etag(etag, weak=False):
+    """Quote an entity tag for the ETag header, marking weak ones with W/"""
+    return f'W/"{etag}"' if weak else f'"{etag}"'
+
+
+def not_modified_headers(etag, last_modified, cache_control, weak=False):
+    """
+    Build the headers sent with a 304 Not Modified response
+
+    Args:
+        etag (str): ETag, without quotes
+        last_modified (float): Modification time as a UNIX timestamp
+        cache_control (str): Cache-Control header value
+        weak (bool): Whether the ETag is a weak validator
+
+    Returns:
+        dict: Response headers
+    """
+    return {
+        'ETag': format_etag(etag, weak),
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control
+    }
@@ -0,0 +1,214 @@
+import os
+import json
+import bisect
+import logging
+import threading
+
+from mp4_atoms import read_video_sync_samples
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+
+def index_path_for(video_path):
+    """Get the path of the hidden keyframe index stored next to a video"""
+    directory, name = os.path.split(video_path)
+    return os.path.join(directory, f'.{name}.keyframes.json')
+
+
+def scan_keyframes(video_path):
+    """
+    Find keyframes by reading packets without decoding them
+
+    Used for files whose container tables cannot be parsed. Requires the
+    FFmpeg backend's raw packet mode.
+
+    Args:
+        video_path (str): Path to the video file
+
+    Returns:
+        tuple or None: (list of keyframe indices, frame count) or None
+    """
+    # Loaded on first use so the web server starts without OpenCV
+    import cv2
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    if not cap.isOpened():
+        return None
+    keyframes = []
+    frame_count = 0
+    try:
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(frame_count)
+            frame_count += 1
+    finally:
+        cap.release()
+    return keyframes, frame_count
+
+
+class KeyframeIndex:
+    """Sorted keyframe positions of a video, used to plan cheap seeks"""
+
+    def __init__(self, keyframes, frame_count):
+        """
+        Initialize the index
+
+        Args:
+            keyframes (list): Sorted frame indices of keyframes
+            frame_count (int): Total number of frames
+        """
+        self.keyframes = keyframes or [0]
+        self.frame_count = frame_count
+
+    def keyframe_before(self, frame_index):
+        """
+        Get the closest keyframe at or before a frame
+
+        Args:
+            frame_index (int): Target frame
+
+        Returns:
+            int: Frame index of the keyframe
+        """
+        position = bisect.bisect_right(self.keyframes, frame_index) - 1
+        return self.keyframes[max(position, 0)]
+
+    @property
+    def max_gop(self):
+        """Longest distance between two consecutive keyframes"""
+        ends = self.keyframes[1:] + [self.frame_count]
+        return max((end - start for start, end in zip(self.keyframes, ends)), default=0)
+
+    @classmethod
+    def build(cls, video_path):
+        """
+        Build the index from the container tables or a packet scan
+
+        Args:
+            video_path (str): Path to the video file
+
+        Returns:
+            KeyframeIndex or None: The index, or None if it cannot be built
+        """
+        result = None
+        try:
+            result = read_video_sync_samples(video_path)
+        except (OSError, ValueError, IndexError) as e:
+            logger.warning(f'Could not parse sample tables of {video_path}: {e}')
+        if result is None:
+            result = scan_keyframes(video_path)
+        if result is None:
+            return None
+        return cls(*result)
+
+    @classmethod
+    def load(cls, video_path):
+        """
+        Load a persisted index if it is still valid for the video
+
+        Returns:
+            KeyframeIndex or None: The index, or None if missing or stale
+        """
+        try:
+            stat = os.stat(video_path)
+            with open(index_path_for(video_path), 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (data.get('version') != INDEX_VERSION or data.get('size') != stat.st_size
+                or data.get('mtime_ns') != stat.st_mtime_ns):
+            return None
+        return cls(data['keyframes'], data['frame_count'])
+
+    def save(self, video_path):
+        """Persist the index next to the video, ignoring read-only locations"""
+        stat = os.stat(video_path)
+        data = {
+            'version': INDEX_VERSION,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'frame_count': self.frame_count,
+            'keyframes': self.keyframes
+        }
+        path = index_path_for(video_path)
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.warning(f'Could not save keyframe index for {video_path}: {e}')
+
+    @classmethod
+    def load_or_build(cls, video_path):
+        """
+        Load the persisted index or build and persist a new one
+
+        Returns:
+            KeyframeIndex or None: The index, or None if it cannot be built
+        """
+        index = cls.load(video_path)
+        if index is None:
+            index = cls.build(video_path)
+            if index is not None:
+                index.save(video_path)
+                logger.info(f'Built keyframe index for {video_path}: '
+                            f'{len(index.keyframes)} keyframes, max GOP {index.max_gop}')
+        return index
+
+
+def load_index_async(video_path, callback):
+    """
+    Load or build the keyframe index of a video on a background thread
+
+    Args:
+        video_path (str): Path to the video file
+        callback (callable): Called with the KeyframeIndex (or None) when done
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    def worker():
+        try:
+            index = KeyframeIndex.load_or_build(video_path)
+        except Exception as e:
+            logger.error(f'Error building keyframe index for {video_path}: {e}')
+            index = None
+        callback(index)
+
+    thread = threading.Thread(target=worker, name='keyframe-index', daemon=True)
+    thread.start()
+    return thread
+
+
+def fast_seek(cap, current_frame, target_frame, index=None):
+    """
+    Position a capture so that the next read() returns the target frame
+
+    When the target lies ahead of the current position within the same GOP,
+    decoding forward with grab() is cheaper than a container seek (which
+    always decodes again from the previous keyframe). Otherwise the capture
+    is repositioned with a seek.
+
+    Args:
+        cap (cv2.VideoCapture): Open capture
+        current_frame (int): Frame the next read() would return
+        target_frame (int): Frame the next read() should return
+        index (KeyframeIndex, optional): Keyframe index of the video
+
+    Returns:
+        str: 'none', 'forward' or 'seek' describing what was done
+    """
+    import cv2
+    if target_frame == current_frame:
+        return 'none'
+
+    if (index is not None and current_frame < target_frame
+            and index.keyframe_before(target_frame) <= current_frame):
+        for _ in range(target_frame - current_frame):
+            if not cap.grab():
+                break
+        return 'forward'
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+    return 'seek'
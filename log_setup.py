@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(log_dir, name='flask_app', level=None, json_lines=None,
+                  max_bytes=None, backup_count=None):
+    """
+    Route all logging through a queue to a console and a rotating file
+
+    Loggers only put records on an in-memory queue; a single listener
+    thread formats them and does the console and file I/O, so request
+    threads never wait on the disk. The setup runs once per process and
+    later calls return the existing listener, whichever module calls first.
+
+    The defaults can be overridden with the LOG_LEVEL, LOG_FORMAT ('text'
+    or 'json'), LOG_MAX_BYTES and LOG_BACKUP_COUNT environment variables.
+
+    Args:
+        log_dir (str): Directory receiving the log file
+        name (str): Log file name without extension
+        level (str, optional): Minimum level, e.g. 'DEBUG' or 'INFO'
+        json_lines (bool, optional): Write the file as JSON lines (.jsonl)
+        max_bytes (int, optional): Size at which the file is rotated
+        backup_count (int, optional): Number of rotated files kept
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        if level is None:
+            level = os.environ.get('LOG_LEVEL', DEFAULT_LEVEL)
+        if json_lines is None:
+            json_lines = os.environ.get('LOG_FORMAT', 'text').lower() == 'json'
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('LOG_MAX_BYTES', DEFAULT_MAX_BYTES))
+        if backup_count is None:
+            backup_count = int(os.environ.get('LOG_BACKUP_COUNT', DEFAULT_BACKUP_COUNT))
+
+        handlers = []
+        # Windowed executables have no console to write to
+        if sys.stdout is not None:
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(logging.Formatter(TEXT_FORMAT))
+            handlers.append(console)
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            log_path = os.path.join(log_dir, f'{name}.jsonl' if json_lines else f'{name}.log')
+            file_handler = RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                               backupCount=backup_count, encoding='utf-8')
+            file_handler.setFormatter(JsonFormatter() if json_lines else logging.Formatter(TEXT_FORMAT))
+            handlers.append(file_handler)
+        except OSError as e:
+            log_path = None
+            print(f'Could not open log file in {log_dir}: {e}', file=sys.stderr)
+
+        root = logging.getLogger()
+        # Drop handlers installed earlier (e.g. by basicConfig) so that
+        # nothing is written twice
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(QueueHandler(queue.SimpleQueue()))
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        # Werkzeug raises its own logger to INFO when it has no level, which
+        # would let the per-request access log through any configured level
+        logging.getLogger('werkzeug').setLevel(root.level)
+
+        _listener = QueueListener(root.handlers[0].queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+    logging.getLogger(__name__).info(
+        f'Logging at {logging.getLevelName(root.level)} to {log_path or "the console only"}'
+    )
+    return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
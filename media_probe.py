@@ -0,0 +1,200 @@
+import os
+import json
+import struct
+import logging
+import threading
+
+from background_store import BackgroundJobs
+from config_store import get_data_path
+from keyframe_index import KeyframeIndex
+from mp4_atoms import read_top_level_boxes, read_video_codec
+
+logger = logging.getLogger(__name__)
+
+PROBE_VERSION = 1
+
+
+def fourcc_to_str(value):
+    """Convert an OpenCV FOURCC number to its four characters"""
+    value = int(value)
+    if not value:
+        return None
+    return ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00') or None
+
+
+def probe_video(video_path):
+    """
+    Extract the metadata of a video file
+
+    The container layout and codec are read from the MP4 boxes; stream
+    properties come from OpenCV, and decoding the first frame tells whether
+    the file is playable at all.
+
+    Args:
+        video_path (str): Path to the video file
+
+    Returns:
+        dict: Codec, fps, frame count, duration, resolution, keyframe
+              positions, moov/mdat offsets and whether the file decodes
+    """
+    # Loaded on first use so the web server starts without OpenCV
+    import cv2
+    stat = os.stat(video_path)
+    info = {
+        'version': PROBE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'codec': None,
+        'fps': 0.0,
+        'frame_count': 0,
+        'duration': 0.0,
+        'width': 0,
+        'height': 0,
+        'keyframes': None,
+        'moov_offset': None,
+        'mdat_offset': None,
+        'faststart': None,
+        'decodable': False,
+        'error': None
+    }
+
+    try:
+        boxes = {box_type: offset for box_type, offset, _ in reversed(read_top_level_boxes(video_path))}
+        info['moov_offset'] = boxes.get('moov')
+        info['mdat_offset'] = boxes.get('mdat')
+        if info['moov_offset'] is not None and info['mdat_offset'] is not None:
+            info['faststart'] = info['moov_offset'] < info['mdat_offset']
+        info['codec'] = read_video_codec(video_path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f'Could not parse the container of {video_path}: {e}')
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if cap.isOpened():
+            info['fps'] = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            info['frame_count'] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            info['width'] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            info['height'] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            info['codec'] = info['codec'] or fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC))
+            info['decodable'], _ = cap.read()
+    finally:
+        cap.release()
+
+    if not info['decodable']:
+        info['error'] = 'The file contains no decodable video'
+        return info
+
+    index = KeyframeIndex.load_or_build(video_path)
+    if index is not None:
+        info['keyframes'] = index.keyframes
+        info['frame_count'] = info['frame_count'] or index.frame_count
+    if info['fps']:
+        info['duration'] = info['frame_count'] / info['fps']
+    return info
+
+
+class MediaIndex(BackgroundJobs):
+    """Persistent index of probed video metadata, filled by a worker pool"""
+
+    def __init__(self, index_path, workers=2):
+        """
+        Initialize the index
+
+        Args:
+            index_path (str): JSON file the index is persisted to
+            workers (int): Number of videos probed in parallel
+        """
+        super().__init__(workers, 'probe')
+        self.index_path = index_path
+        self._entries = self._load()
+
+    def _load(self):
+        """Read the persisted index, ignoring a missing or corrupt file"""
+        try:
+            with open(self.index_path, 'r') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """Atomically write the index to disk"""
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _key(video_path):
+        return os.path.normcase(os.path.abspath(video_path))
+
+    def get(self, video_path):
+        """
+        Get the metadata of a video if it has been probed
+
+        Args:
+            video_path (str): Path to the video file
+
+        Returns:
+            dict or None: The metadata, or None if missing or stale
+        """
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(self._key(video_path))
+        if (entry is None or entry.get('version') != PROBE_VERSION
+                or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns):
+            return None
+        return entry
+
+    def ensure(self, video_path):
+        """
+        Schedule probing unless the metadata is current or already being probed
+
+        Args:
+            video_path (str): Path to the video file
+
+        Returns:
+            concurrent.futures.Future or None: The pending job, or None if
+                                               the metadata is up to date
+        """
+        if (self.get(video_path) is not None or not os.path.isfile(video_path)
+                or self.failure(video_path) is not None):
+            return None
+        return self._submit(self._key(video_path), self._probe, video_path)
+
+    def _probe(self, video_path):
+        try:
+            info = probe_video(video_path)
+            with self._lock:
+                self._entries[self._key(video_path)] = info
+                self._save()
+            logger.info(f'Probed {video_path}: {info["codec"]} {info["width"]}x{info["height"]} '
+                        f'{info["duration"]:.1f}s, decodable={info["decodable"]}')
+            return info
+        except Exception as e:
+            logger.error(f'Error probing {video_path}: {e}')
+            self._record_failure(video_path, e)
+            return None
+
+    def remove(self, video_path):
+        """Forget the metadata of a deleted video"""
+        with self._lock:
+            if self._entries.pop(self._key(video_path), None) is not None:
+                self._save()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_media_index():
+    """Get the media index shared by the Flask and Qt front ends"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MediaIndex(get_data_path('media_index.json'))
+        return _index
@@ -0,0 +1,286 @@
+import os
+import math
+import bisect
+import threading
+
+# Upper bounds in seconds, from sub-millisecond frame work to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Collection is on unless METRICS=0; every update checks this flag first
+_enabled = os.environ.get('METRICS', '1') != '0'
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def enabled():
+    """Check whether metrics are being collected"""
+    return _enabled
+
+
+def set_enabled(flag):
+    """
+    Turn metric collection on or off for the whole process
+
+    While off, every update returns before taking a lock, so instrumented
+    code pays for one flag check only.
+
+    Args:
+        flag (bool): True to collect metrics
+    """
+    global _enabled
+    _enabled = bool(flag)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Value:
+    """A single counter or gauge value"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not _enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        if not _enabled:
+            return
+        self.value = value
+
+
+class _HistogramValue:
+    """Bucketed observations of one histogram label set"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if not _enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def mean(self):
+        """Get the average observation, or 0 if there are none"""
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by interpolating within its bucket
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: The estimate, or 0 if there are no observations
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    # Beyond the last bound only the bound itself is known
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Metric:
+    """A metric family with optional labels, registered for export"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        Create and register the metric
+
+        Args:
+            name (str): Metric name in Prometheus naming style
+            documentation (str): One-line description for the HELP line
+            labels (tuple): Label names; use labels() to pick a label set
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._default = None if self.label_names else self._new_child()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Get the value for one set of label values
+
+        Args:
+            *values: One value per label name, in order
+
+        Returns:
+            The child metric for those values
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self):
+        if self._default is not None:
+            return [((), self._default)]
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self):
+        """Get the metric in the Prometheus text exposition format"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in self._samples():
+            lines.append(f'{self.name}{_label_text(self.label_names, values)} '
+                         f'{_format_value(child.value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    @property
+    def value(self):
+        return self._default.value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    @property
+    def value(self):
+        return self._default.value
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        Create and register the histogram
+
+        Args:
+            name (str): Metric name in Prometheus naming style
+            documentation (str): One-line description for the HELP line
+            labels (tuple): Label names; use labels() to pick a label set
+            buckets (tuple): Sorted upper bounds of the buckets
+        """
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def mean(self):
+        return self._default.mean()
+
+    def quantile(self, q):
+        return self._default.quantile(q)
+
+    @property
+    def count(self):
+        return self._default.count
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in self._samples():
+            with child._lock:
+                counts = list(child.counts)
+                total, count = child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_label_text(self.label_names, values, le)} {cumulative}')
+            labels = _label_text(self.label_names, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+def render():
+    """
+    Export every registered metric
+
+    Returns:
+        str: All metrics in the Prometheus text exposition format (0.0.4)
+    """
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
@@ -0,0 +1,293 @@
+import os
+import json
+import logging
+import threading
+
+from background_store import BackgroundStore
+from config_store import get_data_path
+from thumbnails import preview_key
+
+logger = logging.getLogger(__name__)
+
+MOTION_VERSION = 1
+# Width of the grayscale frames that are compared; motion is coarse, not detailed
+ANALYSIS_WIDTH = 160
+# Frames compared per second of video; others are skipped without conversion
+SAMPLES_PER_SECOND = 15
+# Pixel changes up to this many grey levels are treated as sensor noise
+NOISE_LEVEL = 6
+# Smoothing window of the energy signal before thresholding, in seconds
+SMOOTHING = 0.5
+# Gaps shorter than this join two segments; shorter segments are dropped (seconds)
+MIN_GAP = 1.0
+MIN_SEGMENT = 0.5
+# Energies below this never start a segment, so still footage has none
+MIN_HIGH_THRESHOLD = 0.01
+# Sampled frames above which the analysis is spread over worker processes
+PARALLEL_MIN_SAMPLES = 3000
+BATCH_SIZE = 64
+
+
+def _gray(batch):
+    """Convert a stack of BGR frames to int16 luma with integer weights"""
+    import numpy as np
+    weights = np.array([29, 150, 77], np.uint16)
+    return ((batch.astype(np.uint16) @ weights) >> 8).astype(np.int16)
+
+
+def _difference_energy(previous, current):
+    """Mean absolute change above the noise level, between 0 and 1"""
+    import numpy as np
+    diff = np.abs(current - previous)
+    diff[diff <= NOISE_LEVEL] = 0
+    return diff.mean(axis=(-2, -1)) / 255.0
+
+
+def batch_motion_energy(frame_numbers, batch):
+    """
+    Motion energy between consecutive frames of a batch
+
+    Runs in the workers of VideoPlayer.map_frames, so only the energies
+    and the first and last grayscale frames are sent back; the caller joins
+    batches with them.
+
+    Args:
+        frame_numbers (numpy.ndarray): Frame number of each frame
+        batch (numpy.ndarray): BGR frames of shape (n, height, width, 3)
+
+    Returns:
+        tuple: (frame numbers, energies of frames 1..n-1 against their
+               predecessor, first grayscale frame, last grayscale frame)
+    """
+    gray = _gray(batch)
+    return frame_numbers, _difference_energy(gray[:-1], gray[1:]), gray[0], gray[-1]
+
+
+def motion_signal(video_path, workers=None):
+    """
+    Compute the motion energy of sampled frames of a video
+
+    Frames are decoded at ANALYSIS_WIDTH (from a proxy if one exists),
+    converted to grayscale and differenced in batches with NumPy. Long
+    videos are sharded across processes by VideoPlayer.map_frames.
+
+    Args:
+        video_path (str): Path to the video file
+        workers (int, optional): Worker processes; defaults to all but one core
+
+    Returns:
+        tuple or None: (energy array, sampled frame numbers, fps, frame
+                       count), or None if the video cannot be opened
+    """
+    # Loaded on first use so the web server starts without OpenCV
+    import cv2
+    import numpy as np
+    from video_player import VideoPlayer
+
+    player = VideoPlayer()
+    if not player.load_video(video_path) or not player.fps or not player.frame_count:
+        player.release()
+        return None
+    try:
+        width = player.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        scale = min(ANALYSIS_WIDTH / width, 1.0) if width else 1.0
+        stride = max(int(round(player.fps / SAMPLES_PER_SECOND)), 1)
+        workers = workers or max((os.cpu_count() or 1) - 1, 1)
+        if workers > 1 and player.frame_count // stride >= PARALLEL_MIN_SAMPLES:
+            results = player.map_frames(batch_motion_energy, stride=stride, batch_size=BATCH_SIZE,
+                                        scale=scale, workers=workers)
+        else:
+            results = (batch_motion_energy(*batch) for batch in
+                       player.iter_frames(stride=stride, batch_size=BATCH_SIZE, scale=scale))
+
+        frames, energies = [], []
+        previous = None
+        for frame_numbers, energy, first, last in results:
+            # The first frame of a batch is compared with the last of the one before
+            joined = previous is not None and previous[0] == frame_numbers[0] - stride
+            frames.append(frame_numbers)
+            energies.append([_difference_energy(previous[1], first) if joined else 0.0])
+            energies.append(energy)
+            previous = (frame_numbers[-1], last)
+        if not frames:
+            return None
+        return np.concatenate(energies), np.concatenate(frames), player.fps, player.frame_count
+    finally:
+        player.release()
+
+
+def detect_segments(energy, frames, fps, high=None, low=None):
+    """
+    Find active segments in a motion energy signal with hysteresis
+
+    A segment starts when the smoothed energy rises above the high
+    threshold and lasts until it falls below the low one, so noise around
+    a single threshold does not split it. Without explicit thresholds they
+    are placed between the typical (median) and busy (95th percentile)
+    energy of the video.
+
+    Args:
+        energy (numpy.ndarray): Motion energy of each sampled frame
+        frames (numpy.ndarray): Frame number of each sample
+        fps (float): Frame rate of the video
+        high (float, optional): Energy that starts a segment
+        low (float, optional): Energy below which a segment ends
+
+    Returns:
+        tuple: (list of (start frame, end frame) pairs, high, low)
+    """
+    import numpy as np
+    if len(energy) < 2:
+        return [], high or MIN_HIGH_THRESHOLD, low or MIN_HIGH_THRESHOLD
+    sample_rate = fps * len(frames) / max(frames[-1] - frames[0] + 1, 1)
+    window = max(int(round(SMOOTHING * sample_rate)), 1)
+    smoothed = np.convolve(energy, np.ones(window) / window, mode='same')
+
+    baseline = float(np.median(smoothed))
+    busy = float(np.percentile(smoothed, 95))
+    if high is None:
+        high = max(baseline + 0.5 * (busy - baseline), MIN_HIGH_THRESHOLD)
+    if low is None:
+        low = max(baseline + 0.25 * (busy - baseline), high / 2)
+
+    # 1 above high, 0 below low, -1 in between; the in-between samples keep
+    # the state of the last sample that crossed a threshold
+    crossing = np.where(smoothed >= high, 1, np.where(smoothed < low, 0, -1))
+    positions = np.where(crossing >= 0, np.arange(len(crossing)), -1)
+    last_crossing = np.maximum.accumulate(positions)
+    active = np.where(last_crossing >= 0, crossing[np.maximum(last_crossing, 0)], 0)
+
+    edges = np.diff(np.concatenate(([0], active, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    segments = []
+    for start, end in zip(starts, ends):
+        start_frame, end_frame = int(frames[start]), int(frames[end - 1])
+        if segments and (start_frame - segments[-1][1]) / fps < MIN_GAP:
+            segments[-1] = (segments[-1][0], end_frame)
+        else:
+            segments.append((start_frame, end_frame))
+    segments = [(start, end) for start, end in segments if (end - start) / fps >= MIN_SEGMENT]
+    return segments, high, low
+
+
+def analyse_motion(video_path, workers=None):
+    """
+    Compute the motion timeline of a video
+
+    Returns:
+        dict or None: fps, frame count, first sampled frame and sample
+                      stride, energy per sample, thresholds and segments,
+                      or None if the video cannot be read
+    """
+    signal = motion_signal(video_path, workers)
+    if signal is None:
+        return None
+    energy, frames, fps, frame_count = signal
+    segments, high, low = detect_segments(energy, frames, fps)
+    return {
+        'version': MOTION_VERSION,
+        'fps': fps,
+        'frame_count': frame_count,
+        'sample_start': int(frames[0]),
+        'sample_stride': int(frames[1] - frames[0]) if len(frames) > 1 else 1,
+        'energy': [round(float(value), 5) for value in energy],
+        'high': high,
+        'low': low,
+        'segments': [
+            {'start': start, 'end': end, 'start_time': start / fps, 'end_time': end / fps}
+            for start, end in segments
+        ]
+    }
+
+
+def heat_strip(timeline, bins):
+    """
+    Reduce a timeline to a fixed number of bins for drawing
+
+    Each sample stands for the frames up to the next sample, and each bin
+    holds the peak energy of the samples covering it relative to the high
+    threshold, capped at 1, so bins that reach into a segment read as hot.
+    Bins narrower than the sample stride thus repeat a sample instead of
+    being left empty.
+
+    Args:
+        timeline (dict): Result of analyse_motion
+        bins (int): Number of bins along the video
+
+    Returns:
+        list: Heat between 0 and 1 per bin
+    """
+    energy = timeline['energy']
+    start, stride = timeline['sample_start'], timeline['sample_stride']
+    frame_count = max(timeline['frame_count'], 1)
+    heat = [0.0] * bins
+    for sample, value in enumerate(energy):
+        frame = start + sample * stride
+        first = min(frame * bins // frame_count, bins - 1)
+        # Last bin starting before the next sample's frame
+        last = min(max(-(-(frame + stride) * bins // frame_count) - 1, first), bins - 1)
+        for position in range(first, last + 1):
+            if value > heat[position]:
+                heat[position] = value
+    high = timeline['high'] or 1.0
+    return [round(min(value / high, 1.0), 3) for value in heat]
+
+
+def next_segment(timeline, frame_index):
+    """
+    Get the first active segment starting after a frame
+
+    Returns:
+        dict or None: The segment, or None if there is no later one
+    """
+    return next((segment for segment in timeline['segments'] if segment['start'] > frame_index), None)
+
+
+class MotionStore(BackgroundStore):
+    """On-disk cache of motion timelines computed in the background"""
+
+    version = MOTION_VERSION
+    description = 'motion timeline'
+
+    def __init__(self, cache_dir, workers=1):
+        """
+        Initialize the store
+
+        Args:
+            cache_dir (str): Directory holding one JSON file per video
+            workers (int): Number of videos analysed at the same time; each
+                           analysis already uses several processes
+        """
+        super().__init__(cache_dir, workers, 'motion')
+
+    def path_for(self, video_path):
+        """Get the cache file of a video's timeline"""
+        return os.path.join(self.cache_dir, f'{preview_key(video_path)}.json')
+
+    def entry_path(self, video_path):
+        return self.path_for(video_path)
+
+    def build(self, video_path, tmp_path):
+        timeline = analyse_motion(video_path)
+        if timeline is not None:
+            with open(tmp_path, 'w') as f:
+                json.dump(timeline, f)
+        return timeline
+
+    def summary(self, video_path, timeline):
+        return f'Found {len(timeline["segments"])} active segments in {video_path}'
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_motion_store():
+    """Get the motion store shared by the Flask and Qt front ends"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MotionStore(get_data_path('motion'))
+        return _store
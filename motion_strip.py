@@ -0,0 +1,56 @@
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor
+
+from motion import heat_strip
+
+# Colour of the most active parts of the strip; quieter parts fade towards the background
+HEAT_COLOR = (255, 87, 34)
+
+
+class MotionStrip(QWidget):
+    """Heat strip of a video's motion energy, drawn under the progress slider"""
+
+    frame_clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(8)
+        self.setCursor(Qt.PointingHandCursor)
+        self.timeline = None
+        self._heat = []
+
+    def set_timeline(self, timeline):
+        """
+        Show a motion timeline, or clear the strip
+
+        Args:
+            timeline (dict or None): Result of motion.analyse_motion
+        """
+        self.timeline = timeline
+        self._heat = []
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._heat = []
+
+    def paintEvent(self, event):
+        """Draw one column per pixel, shaded by the peak energy under it"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(221, 221, 221))
+        if not self.timeline or self.width() <= 0:
+            return
+        if len(self._heat) != self.width():
+            self._heat = heat_strip(self.timeline, self.width())
+        for x, value in enumerate(self._heat):
+            if value > 0:
+                painter.fillRect(x, 0, 1, self.height(), QColor(*HEAT_COLOR, int(value * 255)))
+
+    def mousePressEvent(self, event):
+        """Request a seek to the frame under the mouse"""
+        if self.timeline and event.button() == Qt.LeftButton and self.width() > 0:
+            fraction = min(max(event.pos().x() / self.width(), 0.0), 1.0)
+            last_frame = max(self.timeline['frame_count'] - 1, 0)
+            self.frame_clicked.emit(int(round(fraction * last_frame)))
+        super().mousePressEvent(event)
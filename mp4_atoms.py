@@ -0,0 +1,192 @@
+import struct
+
+# Boxes that only contain other boxes
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'udta'}
+
+
+def iter_boxes(f, start, end):
+    """
+    Iterate over the boxes between two offsets of an MP4 file
+
+    Args:
+        f (file): File opened in binary mode
+        start (int): Offset of the first box
+        end (int): Offset just past the last box
+
+    Yields:
+        tuple: (box type, offset of the box, header size, total box size)
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            largesize = f.read(8)
+            if len(largesize) < 8:
+                return
+            size = struct.unpack('>Q', largesize)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset, header_size, size
+        offset += size
+
+
+def make_box(box_type, payload):
+    """Build a box, using a 64-bit size only when it does not fit 32 bits"""
+    size = 8 + len(payload)
+    if size <= 0xFFFFFFFF:
+        return struct.pack('>I4s', size, box_type) + payload
+    return struct.pack('>I4sQ', 1, box_type, size + 8) + payload
+
+
+def iter_buffer_boxes(data):
+    """Iterate over the (type, header size, size, offset) of the boxes in a buffer"""
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size or offset + size > len(data):
+            raise ValueError(f'Truncated {box_type!r} box')
+        yield box_type, header_size, size, offset
+        offset += size
+
+
+def find_box(f, start, end, box_type):
+    """
+    Find the first box of a type between two offsets
+
+    Returns:
+        tuple or None: (offset, header size, size) of the box
+    """
+    for found_type, offset, header_size, size in iter_boxes(f, start, end):
+        if found_type == box_type:
+            return offset, header_size, size
+    return None
+
+
+def _read_box_payload(f, box):
+    """Read the payload of a (offset, header size, size) box"""
+    offset, header_size, size = box
+    f.seek(offset + header_size)
+    return f.read(size - header_size)
+
+
+def _video_stbl(f, moov):
+    """Locate the sample table of the first video track inside moov"""
+    moov_start = moov[0] + moov[1]
+    moov_end = moov[0] + moov[2]
+    for box_type, offset, header_size, size in iter_boxes(f, moov_start, moov_end):
+        if box_type != b'trak':
+            continue
+        mdia = find_box(f, offset + header_size, offset + size, b'mdia')
+        if not mdia:
+            continue
+        mdia_start, mdia_end = mdia[0] + mdia[1], mdia[0] + mdia[2]
+        hdlr = find_box(f, mdia_start, mdia_end, b'hdlr')
+        # hdlr payload: version/flags (4), pre_defined (4), handler_type (4)
+        if not hdlr or _read_box_payload(f, hdlr)[8:12] != b'vide':
+            continue
+        minf = find_box(f, mdia_start, mdia_end, b'minf')
+        if not minf:
+            continue
+        return find_box(f, minf[0] + minf[1], minf[0] + minf[2], b'stbl')
+    return None
+
+
+def read_video_sync_samples(path):
+    """
+    Read the keyframe (sync sample) table of the first video track
+
+    Args:
+        path (str): Path to the MP4 file
+
+    Returns:
+        tuple or None: (sorted list of 0-based keyframe sample indices,
+                       total sample count), or None if the file could not be
+                       parsed as an MP4 with a video track
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        moov = find_box(f, 0, file_size, b'moov')
+        if not moov:
+            return None
+        stbl = _video_stbl(f, moov)
+        if not stbl:
+            return None
+        stbl_start, stbl_end = stbl[0] + stbl[1], stbl[0] + stbl[2]
+
+        stsz = find_box(f, stbl_start, stbl_end, b'stsz')
+        if not stsz:
+            return None
+        # stsz payload: version/flags (4), sample_size (4), sample_count (4)
+        sample_count = struct.unpack('>I', _read_box_payload(f, stsz)[8:12])[0]
+
+        stss = find_box(f, stbl_start, stbl_end, b'stss')
+        if not stss:
+            # Without a sync sample table every sample is a keyframe
+            return list(range(sample_count)), sample_count
+
+        payload = _read_box_payload(f, stss)
+        entry_count = struct.unpack('>I', payload[4:8])[0]
+        entries = struct.unpack(f'>{entry_count}I', payload[8:8 + 4 * entry_count])
+        return sorted(sample - 1 for sample in entries), sample_count
+
+
+def read_top_level_boxes(path):
+    """
+    List the top-level boxes of an MP4 file
+
+    Args:
+        path (str): Path to the MP4 file
+
+    Returns:
+        list: (box type, offset, total size) of each box, in file order
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        return [(box_type.decode('latin-1'), offset, size)
+                for box_type, offset, _, size in iter_boxes(f, 0, file_size)]
+
+
+def read_video_codec(path):
+    """
+    Read the sample entry type (e.g. 'avc1', 'hvc1') of the first video track
+
+    Args:
+        path (str): Path to the MP4 file
+
+    Returns:
+        str or None: Four-character codec code, or None if not found
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        moov = find_box(f, 0, file_size, b'moov')
+        if not moov:
+            return None
+        stbl = _video_stbl(f, moov)
+        if not stbl:
+            return None
+        stsd = find_box(f, stbl[0] + stbl[1], stbl[0] + stbl[2], b'stsd')
+        if not stsd:
+            return None
+        # stsd payload: version/flags (4), entry_count (4), then sample entries
+        # starting with size (4) and type (4)
+        payload = _read_box_payload(f, stsd)
+        if len(payload) < 16:
+            return None
+        return payload[12:16].decode('latin-1')
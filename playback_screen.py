@@ -1,11 +1,31 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                           QLabel, QPushButton, QComboBox, QSlider, QMessageBox)
-from PyQt5.QtCore import Qt, QTimer, pyqtSlot
+                           QLabel, QPushButton, QComboBox, QSlider, QMessageBox, QStyle)
+from PyQt5.QtCore import Qt, QTimer, QEvent, QPoint, pyqtSlot
 from PyQt5.QtGui import QImage, QPixmap, QFont
 import cv2
+import os
+import math
+import time
 import numpy as np
 
+import metrics
 from video_config import VideoConfig
+from config_store import resolve_video_path
+from frame_pipeline import DecodeWorker, decode_seconds, convert_seconds
+from presentation_clock import PresentationClock
+from keyframe_index import load_index_async
+from thumbnails import get_preview_store, tile_position
+from frame_cache import FrameCache, read_frame_cached
+from video_surface import VideoSurface
+from media_probe import get_media_index
+from proxies import get_proxy_store
+from motion import get_motion_store, next_segment
+from motion_strip import MotionStrip
+
+frames_presented = metrics.Counter('player_frames_presented_total', 'Frames shown during playback')
+frames_dropped = metrics.Counter('player_frames_dropped_total', 'Decoded frames skipped because they were overdue')
+late_ticks = metrics.Counter('player_late_ticks_total', 'Playback ticks with no decoded frame ready')
+seek_seconds = metrics.Histogram('player_seek_seconds', 'Time to fetch and show the frame at a new position')
 
 class PlaybackScreen(QMainWindow):
     """Screen for playing videos with slow motion functionality"""
@@ -19,8 +39,46 @@ class PlaybackScreen(QMainWindow):
         # Video playback variables
         self.video_path = None
         self.cap = None
+        self.decoder = None
+        self.keyframe_index = None
+        self.pending_seek = None
+        self.preview_store = get_preview_store()
+        self.media_index = get_media_index()
+        # Playback decodes the smallest proxy that fills the surface; paused
+        # frames always come from the original
+        self.proxy_store = get_proxy_store()
+        self.decode_path = None
+        # Motion timeline of the current video, analysed in the background
+        self.motion_store = get_motion_store()
+        self.motion_timeline = None
+        self.motion_future = None
+        self.preview_manifest = None
+        self.preview_sheets = {}
+        self.clock = None
+        self.current_frame_index = 0
+        # Revisited frames (stepping, A/B loops, scrubbing) come from memory
+        self.frame_cache = FrameCache()
+        self.decoder_needs_seek = False
+        self.loop_a = None
+        self.loop_b = None
+        self.presented_frames = 0
+        self.late_frames = 0
+        self.skipped_frames = 0
         self.timer = QTimer()
+        # Each tick is scheduled from the presentation clock, not a fixed interval
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
         self.timer.timeout.connect(self.update_frame)
+        # Refreshes the metrics overlay while it is shown
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.update_metrics_overlay)
+        # Checks for the motion timeline until its analysis has finished
+        self.motion_timer = QTimer()
+        self.motion_timer.timeout.connect(self.poll_motion_timeline)
+        # Slider drags are coalesced so only the latest target is decoded
+        self.seek_timer = QTimer()
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.timeout.connect(self.apply_pending_seek)
         self.playback_speed = 1.0  # Normal speed
         self.is_playing = False
         
@@ -57,15 +115,20 @@ class PlaybackScreen(QMainWindow):
         main_layout.addLayout(selection_layout)
         
         # Video display area
-        self.video_label = QLabel()
-        self.video_label.setAlignment(Qt.AlignCenter)
-        self.video_label.setMinimumSize(800, 450)  # 16:9 aspect ratio
-        self.video_label.setStyleSheet("background-color: black;")
-        self.video_label.setText("No video selected")
-        self.video_label.setFont(QFont("Arial", 14))
-        self.video_label.setAlignment(Qt.AlignCenter)
+        self.video_surface = VideoSurface()
+        self.video_surface.setMinimumSize(800, 450)  # 16:9 aspect ratio
+        self.video_surface.setText("No video selected")
+        self.video_surface.setFont(QFont("Arial", 14))
+        
+        main_layout.addWidget(self.video_surface)
         
-        main_layout.addWidget(self.video_label)
+        # Metrics overlay in the top-left corner of the video
+        self.metrics_overlay = QLabel(self.video_surface)
+        self.metrics_overlay.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: white; padding: 6px; font-family: monospace;"
+        )
+        self.metrics_overlay.move(8, 8)
+        self.metrics_overlay.hide()
         
         # Playback controls
         controls_layout = QHBoxLayout()
@@ -83,7 +146,7 @@ class PlaybackScreen(QMainWindow):
         
         self.speed_slider = QSlider(Qt.Horizontal)
         self.speed_slider.setMinimum(10)  # 0.1x speed
-        self.speed_slider.setMaximum(100)  # 1.0x speed
+        self.speed_slider.setMaximum(200)  # 2.0x speed
         self.speed_slider.setValue(100)  # Default to normal speed
         self.speed_slider.setTickPosition(QSlider.TicksBelow)
         self.speed_slider.setTickInterval(10)
@@ -105,21 +168,95 @@ class PlaybackScreen(QMainWindow):
         self.progress_slider = QSlider(Qt.Horizontal)
         self.progress_slider.setEnabled(False)
         self.progress_slider.sliderMoved.connect(self.set_position)
+        self.progress_slider.sliderMoved.connect(self.show_preview_for_frame)
+        self.progress_slider.sliderReleased.connect(self.hide_preview)
+        # Hovering over the slider shows a thumbnail of that position
+        self.progress_slider.setMouseTracking(True)
+        self.progress_slider.installEventFilter(self)
+        
+        self.preview_popup = QLabel(self, Qt.ToolTip)
+        self.preview_popup.setAlignment(Qt.AlignCenter)
+        self.preview_popup.setStyleSheet("background-color: black; color: white;")
         
         self.time_label = QLabel("00:00 / 00:00")
         
-        progress_layout.addWidget(self.progress_slider)
+        self.frame_stats_label = QLabel("")
+        
+        # Motion heat strip under the slider; clicking it seeks there
+        self.motion_strip = MotionStrip()
+        self.motion_strip.frame_clicked.connect(self.seek_to)
+        slider_column = QVBoxLayout()
+        slider_column.setSpacing(0)
+        slider_column.addWidget(self.progress_slider)
+        slider_column.addWidget(self.motion_strip)
+        
+        progress_layout.addLayout(slider_column)
         progress_layout.addWidget(self.time_label)
+        progress_layout.addWidget(self.frame_stats_label)
         
         main_layout.addLayout(progress_layout)
         
+        # Frame stepping and A/B loop controls
+        analysis_layout = QHBoxLayout()
+        
+        self.step_back_button = QPushButton("◀ Frame")
+        self.step_back_button.clicked.connect(lambda: self.step_frame(-1))
+        self.step_back_button.setEnabled(False)
+        
+        self.step_forward_button = QPushButton("Frame ▶")
+        self.step_forward_button.clicked.connect(lambda: self.step_frame(1))
+        self.step_forward_button.setEnabled(False)
+        
+        self.set_a_button = QPushButton("Set A")
+        self.set_a_button.clicked.connect(lambda: self.set_loop_point('a'))
+        self.set_a_button.setEnabled(False)
+        
+        self.set_b_button = QPushButton("Set B")
+        self.set_b_button.clicked.connect(lambda: self.set_loop_point('b'))
+        self.set_b_button.setEnabled(False)
+        
+        self.loop_button = QPushButton("Loop A-B")
+        self.loop_button.setCheckable(True)
+        self.loop_button.toggled.connect(self.toggle_loop)
+        self.loop_button.setEnabled(False)
+        
+        self.loop_label = QLabel("A: --  B: --")
+        
+        self.next_action_button = QPushButton("Next Action ▶")
+        self.next_action_button.setToolTip("Jump to the start of the next active segment")
+        self.next_action_button.clicked.connect(self.jump_to_next_action)
+        self.next_action_button.setEnabled(False)
+        
+        analysis_layout.addWidget(self.step_back_button)
+        analysis_layout.addWidget(self.step_forward_button)
+        analysis_layout.addWidget(self.set_a_button)
+        analysis_layout.addWidget(self.set_b_button)
+        analysis_layout.addWidget(self.loop_button)
+        analysis_layout.addWidget(self.loop_label)
+        analysis_layout.addWidget(self.next_action_button)
+        analysis_layout.addStretch()
+        
+        main_layout.addLayout(analysis_layout)
+        
         # Back to config button
         button_layout = QHBoxLayout()
         
+        grid_button = QPushButton("Grid View")
+        grid_button.clicked.connect(self.open_grid_view)
+        
         back_button = QPushButton("Back to Configuration")
         back_button.clicked.connect(self.go_back_to_config)
         
+        self.metrics_button = QPushButton("Metrics")
+        self.metrics_button.setCheckable(True)
+        self.metrics_button.toggled.connect(self.toggle_metrics_overlay)
+        if not metrics.enabled():
+            self.metrics_button.setEnabled(False)
+            self.metrics_button.setToolTip("Metrics collection is turned off (METRICS=0)")
+        
+        button_layout.addWidget(self.metrics_button)
         button_layout.addStretch()
+        button_layout.addWidget(grid_button)
         button_layout.addWidget(back_button)
         
         main_layout.addLayout(button_layout)
@@ -137,7 +274,20 @@ class PlaybackScreen(QMainWindow):
             return
         
         for video in valid_videos:
-            self.video_combo.addItem(f"{video['name']}", video["path"])
+            # Durations and playability come from the probe index, without
+            # opening the files; unprobed videos are probed in the background
+            video_path = resolve_video_path(video["path"])
+            info = self.media_index.get(video_path)
+            if info is None:
+                self.media_index.ensure(video_path)
+                self.video_combo.addItem(f"{video['name']}", video["path"])
+            elif not info["decodable"]:
+                self.video_combo.addItem(f"{video['name']} - cannot be played", video["path"])
+                self.video_combo.model().item(self.video_combo.count() - 1).setEnabled(False)
+            else:
+                self.video_combo.addItem(
+                    f"{video['name']} ({self.format_time(info['duration'])})", video["path"]
+                )
     
     def video_selected(self, index):
         """Handle video selection from combo box"""
@@ -146,9 +296,21 @@ class PlaybackScreen(QMainWindow):
         
         # Stop any currently playing video
         self.stop_video()
+        self.stop_decoder()
+        if self.cap:
+            self.cap.release()
+            self.cap = None
         
         # Get the selected video path from combo box data
-        self.video_path = self.video_combo.currentData()
+        self.video_path = resolve_video_path(self.video_combo.currentData())
+        
+        # Files known to be undecodable are not opened
+        info = self.media_index.get(self.video_path) if self.video_path else None
+        if info is not None and not info["decodable"]:
+            self.video_surface.setText("This video cannot be played")
+            self.play_button.setEnabled(False)
+            self.video_path = None
+            return
         
         # Open the video file
         if self.video_path:
@@ -176,12 +338,42 @@ class PlaybackScreen(QMainWindow):
                 # Update UI
                 self.play_button.setEnabled(True)
                 self.stop_button.setEnabled(True)
+                self.step_back_button.setEnabled(True)
+                self.step_forward_button.setEnabled(True)
+                self.set_a_button.setEnabled(True)
+                self.set_b_button.setEnabled(True)
+                self.clear_loop()
+                
+                # Cache frames at the size they are shown at
+                self.configure_frame_cache()
                 
                 # Show first frame
                 ret, frame = self.cap.read()
                 if ret:
+                    self.frame_cache.put((self.video_path, 0), frame)
                     self.display_frame(frame)
                 
+                # Keyframe index for cheap seeks, built once in the background
+                self.keyframe_index = None
+                video_path = self.video_path
+                load_index_async(video_path, lambda index: self.keyframe_index_loaded(video_path, index))
+                
+                # Decode the following frames ahead of the playhead
+                self.start_decoder(1)
+                self.clock = PresentationClock(self.fps, self.playback_speed)
+                
+                # Scrub thumbnails and proxies, generated in the background if not cached
+                self.preview_manifest = None
+                self.preview_sheets = {}
+                self.preview_store.ensure(self.video_path)
+                self.proxy_store.ensure(self.video_path)
+                self.load_motion_timeline()
+                
+                self.current_frame_index = 0
+                self.presented_frames = 0
+                self.late_frames = 0
+                self.skipped_frames = 0
+                
                 # Update time label
                 total_time = self.frame_count / self.fps
                 self.time_label.setText(f"00:00 / {self.format_time(total_time)}")
@@ -201,23 +393,40 @@ class PlaybackScreen(QMainWindow):
         if self.is_playing:
             # Pause video
             self.timer.stop()
+            self.clock.stop()
             self.play_button.setText("Play")
             self.is_playing = False
+            if self.decode_path != self.video_path:
+                # Replace the proxy frame on screen with the full-resolution one
+                self.show_frame_at(self.current_frame_index)
         else:
-            # Play video
-            # Set timer interval based on playback speed
-            interval = int(1000 / (self.fps * self.playback_speed))
-            self.timer.start(interval)
+            # Play video: the frame after the one on screen is due now
+            start = self.current_frame_index + 1
+            if self.loop_active() and not self.loop_a <= start <= self.loop_b:
+                start = self.loop_a
+                self.decoder_needs_seek = True
+            if self.decoder and self.playback_source() != self.decode_path:
+                # A proxy finished building or the surface was resized
+                self.start_decoder(start)
+            elif self.decoder_needs_seek and self.decoder:
+                # Frame stepping moved the playhead without moving the decoder
+                self.decoder.seek(start)
+                self.decoder_needs_seek = False
+            self.clock.start(start)
             self.play_button.setText("Pause")
             self.is_playing = True
+            self.timer.start(0)
     
     def stop_video(self):
         """Stop video playback and reset to beginning"""
         if self.timer.isActive():
             self.timer.stop()
+        if self.clock:
+            self.clock.stop()
         
         self.is_playing = False
         self.play_button.setText("Play")
+        self.current_frame_index = 0
         
         # Reset position
         if self.cap:
@@ -225,31 +434,77 @@ class PlaybackScreen(QMainWindow):
             ret, frame = self.cap.read()
             if ret:
                 self.display_frame(frame)
+            if self.decoder:
+                self.decoder.seek(1)
+                self.decoder_needs_seek = False
             
             self.progress_slider.setValue(0)
             self.time_label.setText(f"00:00 / {self.format_time(self.frame_count / self.fps)}")
     
     def update_frame(self):
-        """Update video frame during playback"""
-        if not self.cap:
+        """Present the next decoded frame during playback"""
+        if not self.cap or not self.decoder:
             return
         
-        # Read the next frame
-        ret, frame = self.cap.read()
-        
-        if not ret:
-            # End of video
-            self.timer.stop()
-            self.play_button.setText("Play")
-            self.is_playing = False
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Rewind
+        target = self.clock.frame_at()
+        if self.loop_active():
+            if target > self.loop_b:
+                self.restart_loop()
+                return
+            # Frames seen on a previous pass of the loop are not decoded again
+            cached = self.frame_cache.get((self.decode_path, target))
+            if cached is not None:
+                if target != self.current_frame_index:
+                    self.present_frame(target, cached)
+                self.schedule_next_frame(target + 1)
+                return
+        
+        # Take the newest buffered frame that is already due, skipping any
+        # older ones so playback stays in sync with the clock
+        item = None
+        while True:
+            head = self.decoder.buffer.peek()
+            if head is None or head[0] > target:
+                break
+            if item is not None:
+                self.skipped_frames += 1
+                frames_dropped.inc()
+            item = self.decoder.buffer.get()
+        
+        if item is None:
+            if self.decoder.at_end():
+                # End of video
+                self.clock.stop()
+                self.play_button.setText("Play")
+                self.is_playing = False
+                self.current_frame_index = 0
+                self.decoder.seek(0)  # Rewind
+                return
+            if head is None:
+                # The decoder has not caught up with the clock
+                self.late_frames += 1
+                late_ticks.inc()
+            # Otherwise the frame on screen is still current: keep showing it
+            self.schedule_next_frame(head[0] if head else target + 1)
             return
         
-        # Display the frame
+        # Display the frame and keep it for later revisits
+        frame_index, frame = item
+        self.frame_cache.put((self.decode_path, frame_index), frame)
+        self.present_frame(frame_index, frame)
+        self.schedule_next_frame(frame_index + 1)
+    
+    def present_frame(self, frame_index, frame):
+        """Show a frame during playback and update the progress display"""
         self.display_frame(frame)
+        self.clock.frame_presented()
+        self.current_frame_index = frame_index
+        self.presented_frames += 1
+        frames_presented.inc()
+        self.update_frame_stats()
         
         # Update progress
-        current_frame = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        current_frame = frame_index + 1
         self.progress_slider.setValue(current_frame)
         
         # Update time label
@@ -258,62 +513,406 @@ class PlaybackScreen(QMainWindow):
         self.time_label.setText(f"{self.format_time(current_time)} / {self.format_time(total_time)}")
     
     def display_frame(self, frame):
-        """Convert OpenCV frame to QPixmap and display it"""
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Calculate scaled dimensions (maintaining aspect ratio)
-        h, w, ch = rgb_frame.shape
-        label_w = self.video_label.width()
-        label_h = self.video_label.height()
-        
-        # Choose the scaling factor that fits both dimensions
-        scale_w = label_w / w
-        scale_h = label_h / h
-        scale = min(scale_w, scale_h)
-        
-        new_w = int(w * scale)
-        new_h = int(h * scale)
-        
-        # Resize the frame
-        rgb_frame = cv2.resize(rgb_frame, (new_w, new_h))
-        
-        # Create QImage from the frame
-        bytes_per_line = ch * new_w
-        q_img = QImage(rgb_frame.data, new_w, new_h, bytes_per_line, QImage.Format_RGB888)
-        
-        # Convert to QPixmap and display
-        pixmap = QPixmap.fromImage(q_img)
-        self.video_label.setPixmap(pixmap)
+        """Show an OpenCV frame on the video surface"""
+        # The BGR frame is drawn as a Format_BGR888 image; only frames larger
+        # than the surface are scaled on the CPU, into a reused buffer
+        self.video_surface.set_frame(frame)
+    
+    def schedule_next_frame(self, frame_index):
+        """Arm the timer for when a frame is due on the presentation clock"""
+        if not self.is_playing:
+            return
+        delay = self.clock.seconds_until(frame_index)
+        # Wake at least every 50 ms so a stalled decoder is noticed
+        self.timer.start(math.ceil(min(delay, 0.05) * 1000))
+    
+    def frame_stats(self):
+        """
+        Get playback frame counters
+        
+        Returns:
+            dict: Presented, late, skipped, decoded, dropped and buffered frame
+                  counts, plus the target and achieved frame rates
+        """
+        stats = {
+            'presented': self.presented_frames,
+            'late': self.late_frames,
+            'skipped': self.skipped_frames,
+            'target_fps': self.clock.target_fps if self.clock else 0.0,
+            'achieved_fps': self.clock.achieved_fps if self.clock else 0.0
+        }
+        if self.decoder:
+            stats.update(self.decoder.stats())
+        stats['source'] = self.source_label()
+        display_stats = self.video_surface.stats()
+        stats['display_ms'] = display_stats['display_ms']
+        stats['display_saved_bytes'] = display_stats['saved_bytes_per_frame']
+        cache_stats = self.frame_cache.stats()
+        stats['cache_hits'] = cache_stats['hits']
+        stats['cache_misses'] = cache_stats['misses']
+        return stats
+    
+    def update_frame_stats(self):
+        """Show the frame counters next to the progress bar"""
+        stats = self.frame_stats()
+        self.frame_stats_label.setText(
+            f"Source: {stats['source']}  "
+            f"FPS: {stats['achieved_fps']:.1f}/{stats['target_fps']:.1f}  "
+            f"Late: {stats['late']}  Skipped: {stats['skipped']}  "
+            f"Dropped: {stats.get('dropped', 0)}  Buffer: {stats.get('buffered', 0)}  "
+            f"Display: {stats['display_ms']:.2f} ms "
+            f"({stats['display_saved_bytes'] / (1024 * 1024):.1f} MB/frame saved)"
+        )
+    
+    def toggle_metrics_overlay(self, checked):
+        """Show or hide the metrics overlay on the video"""
+        if checked:
+            self.update_metrics_overlay()
+            self.metrics_overlay.show()
+            self.metrics_overlay.raise_()
+            self.metrics_timer.start(500)
+        else:
+            self.metrics_timer.stop()
+            self.metrics_overlay.hide()
+    
+    def update_metrics_overlay(self):
+        """Show the player metrics collected in this process"""
+        def timing(histogram):
+            return (f"{histogram.mean() * 1000:6.2f} ms avg  {histogram.quantile(0.95) * 1000:6.2f} ms p95  "
+                    f"({histogram.count})")
+        
+        self.metrics_overlay.setText(
+            f"Decode   {timing(decode_seconds)}\n"
+            f"Convert  {timing(convert_seconds)}\n"
+            f"Seek     {timing(seek_seconds)}\n"
+            f"Frames   {frames_presented.value:.0f} presented  {frames_dropped.value:.0f} dropped  "
+            f"{late_ticks.value:.0f} late ticks"
+        )
+        self.metrics_overlay.adjustSize()
     
     def speed_changed(self, value):
         """Handle playback speed slider change"""
-        # Convert slider value to playback speed (0.1x to 1.0x)
+        # Convert slider value to playback speed (0.1x to 2.0x)
         self.playback_speed = value / 100.0
         self.speed_value_label.setText(f"{self.playback_speed:.1f}x")
         
-        # Update timer interval if video is playing
-        if self.is_playing and self.cap:
-            self.timer.stop()
-            interval = int(1000 / (self.fps * self.playback_speed))
-            self.timer.start(interval)
+        # Re-anchor the clock so the playhead continues from where it is
+        if self.clock:
+            self.clock.set_speed(self.playback_speed)
+        if self.decoder:
+            # Above 1.0x only every n-th frame can be shown; skip decoding the rest
+            self.decoder.set_stride(math.ceil(self.playback_speed))
+        if self.is_playing:
+            self.timer.start(0)
+    
+    def keyframe_index_loaded(self, video_path, index):
+        """Store the keyframe index built in the background (any thread)"""
+        if video_path != self.video_path:
+            return
+        self.keyframe_index = index
+        if self.decoder and self.decode_path == video_path:
+            self.decoder.keyframe_index = index
+    
+    def proxy_index_loaded(self, decode_path, index):
+        """Store the keyframe index of the proxy being decoded (any thread)"""
+        if self.decoder and decode_path == self.decode_path:
+            self.decoder.keyframe_index = index
+    
+    def playback_source(self):
+        """Get the file to decode during playback: a proxy that fills the surface, or the original"""
+        display_height = self.video_surface.height() * self.video_surface.devicePixelRatioF()
+        return self.proxy_store.select(self.video_path, display_height)
+    
+    def source_label(self):
+        """Describe the rendition being decoded, e.g. '480p' or 'original'"""
+        if not self.decode_path or self.decode_path == self.video_path:
+            return "original"
+        return f"{os.path.splitext(os.path.basename(self.decode_path))[0]}p"
+    
+    def start_decoder(self, start):
+        """
+        Start decoding ahead from a frame, from the rendition suited to the surface
+        
+        Proxies have the same frames as the original, so frame numbers are
+        shared; only the keyframe index differs.
+        
+        Args:
+            start (int): First frame to decode
+        """
+        self.stop_decoder()
+        self.decode_path = self.playback_source()
+        self.decoder = DecodeWorker(self.decode_path)
+        self.decoder.set_stride(math.ceil(self.playback_speed))
+        if self.decode_path == self.video_path:
+            self.decoder.keyframe_index = self.keyframe_index
+        else:
+            decode_path = self.decode_path
+            load_index_async(decode_path, lambda index: self.proxy_index_loaded(decode_path, index))
+        self.decoder.start()
+        self.decoder.seek(start)
+        self.decoder_needs_seek = False
+    
+    def resizeEvent(self, event):
+        """Switch between proxy and original when the surface size changes during playback"""
+        super().resizeEvent(event)
+        if self.is_playing and self.decoder and self.playback_source() != self.decode_path:
+            self.start_decoder(self.current_frame_index + 1)
+    
+    def eventFilter(self, obj, event):
+        """Show scrub previews while the mouse hovers over the progress slider"""
+        if obj is self.progress_slider and self.progress_slider.isEnabled():
+            if event.type() == QEvent.MouseMove and not self.progress_slider.isSliderDown():
+                frame_index = QStyle.sliderValueFromPosition(
+                    self.progress_slider.minimum(),
+                    self.progress_slider.maximum(),
+                    event.pos().x(),
+                    self.progress_slider.width()
+                )
+                self.show_preview(frame_index, event.pos().x())
+            elif event.type() == QEvent.Leave:
+                self.hide_preview()
+        return super().eventFilter(obj, event)
+    
+    def preview_pixmap(self, seconds):
+        """
+        Get the cached thumbnail closest to a playback time
+        
+        Args:
+            seconds (float): Playback time
+        
+        Returns:
+            QPixmap or None: The thumbnail, or None if previews are not ready
+        """
+        if self.preview_manifest is None and self.video_path:
+            self.preview_manifest = self.preview_store.get(self.video_path)
+        manifest = self.preview_manifest
+        if not manifest or manifest['count'] == 0:
+            return None
+        
+        sheet, x, y = tile_position(manifest, seconds)
+        image = self.preview_sheets.get(sheet)
+        if image is None:
+            image = QImage(self.preview_store.sheet_path(self.video_path, sheet))
+            if image.isNull():
+                return None
+            self.preview_sheets[sheet] = image
+        return QPixmap.fromImage(image.copy(x, y, manifest['tile_width'], manifest['tile_height']))
+    
+    def show_preview(self, frame_index, x):
+        """Show the thumbnail of a frame above a horizontal slider position"""
+        if not self.cap or not self.fps:
+            return
+        seconds = frame_index / self.fps
+        pixmap = self.preview_pixmap(seconds)
+        if pixmap is None:
+            self.preview_popup.setText(self.format_time(seconds))
+        else:
+            self.preview_popup.setPixmap(pixmap)
+        self.preview_popup.adjustSize()
+        
+        position = self.progress_slider.mapToGlobal(QPoint(
+            x - self.preview_popup.width() // 2,
+            -self.preview_popup.height() - 4
+        ))
+        self.preview_popup.move(position)
+        self.preview_popup.show()
+    
+    def show_preview_for_frame(self, frame_index):
+        """Show the thumbnail of the frame the slider handle is dragged to"""
+        x = QStyle.sliderPositionFromValue(
+            self.progress_slider.minimum(),
+            self.progress_slider.maximum(),
+            frame_index,
+            self.progress_slider.width()
+        )
+        self.show_preview(frame_index, x)
+    
+    def hide_preview(self):
+        """Hide the scrub preview"""
+        self.preview_popup.hide()
     
     def set_position(self, position):
         """Set video position when user moves the progress slider"""
         if self.cap:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
-            
             # Update the time label
             current_time = position / self.fps
             total_time = self.frame_count / self.fps
             self.time_label.setText(f"{self.format_time(current_time)} / {self.format_time(total_time)}")
             
-            # Show the frame at the new position
-            ret, frame = self.cap.read()
-            if ret:
-                self.display_frame(frame)
-                # Move back one frame since read() advances the frame
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            # Decode only the latest target once pending slider events are handled
+            self.pending_seek = position
+            if not self.seek_timer.isActive():
+                self.seek_timer.start(0)
+    
+    def apply_pending_seek(self):
+        """Show the frame at the most recent slider position"""
+        position, self.pending_seek = self.pending_seek, None
+        if position is None or not self.cap:
+            return
+        
+        # Show the frame at the new position
+        ret = self.show_frame_at(position)
+        
+        # Continue decoding ahead from the new position
+        if self.decoder:
+            self.decoder.seek(position + 1 if ret else position)
+            self.decoder_needs_seek = False
+        if self.is_playing:
+            self.clock.start(position + 1)
+    
+    def show_frame_at(self, frame_index):
+        """
+        Show a frame while paused or scrubbing, from the frame cache if possible
+        
+        Args:
+            frame_index (int): Frame to show
+        
+        Returns:
+            bool: True if the frame could be shown
+        """
+        started = time.perf_counter()
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        frame, _ = read_frame_cached(
+            self.cap, position, frame_index, self.video_path,
+            self.frame_cache, self.keyframe_index
+        )
+        if frame is not None:
+            self.display_frame(frame)
+            seek_seconds.observe(time.perf_counter() - started)
+        self.current_frame_index = frame_index
+        return frame is not None
+    
+    def configure_frame_cache(self):
+        """Size the frame cache's slots to the video scaled to the display"""
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if not width or not height:
+            return
+        scale = min(self.video_surface.width() / width, self.video_surface.height() / height)
+        self.frame_cache.configure(width * scale, height * scale)
+    
+    def step_frame(self, delta):
+        """
+        Pause and move the playhead by a number of frames
+        
+        Args:
+            delta (int): Frames to move, negative to step back
+        """
+        if not self.cap:
+            return
+        if self.is_playing:
+            self.toggle_play()
+        
+        target = min(max(self.current_frame_index + delta, 0), self.frame_count - 1)
+        if target == self.current_frame_index:
+            return
+        self.show_frame_at(target)
+        # The decoder is repositioned only when playback resumes
+        self.decoder_needs_seek = True
+        
+        self.progress_slider.setValue(target)
+        current_time = target / self.fps
+        total_time = self.frame_count / self.fps
+        self.time_label.setText(f"{self.format_time(current_time)} / {self.format_time(total_time)}")
+    
+    def set_loop_point(self, point):
+        """
+        Mark the frame on screen as the start ('a') or end ('b') of the loop
+        
+        Args:
+            point (str): 'a' or 'b'
+        """
+        if point == 'a':
+            self.loop_a = self.current_frame_index
+        else:
+            self.loop_b = self.current_frame_index
+        if self.loop_a is not None and self.loop_b is not None and self.loop_a > self.loop_b:
+            self.loop_a, self.loop_b = self.loop_b, self.loop_a
+        
+        a = '--' if self.loop_a is None else self.loop_a
+        b = '--' if self.loop_b is None else self.loop_b
+        self.loop_label.setText(f"A: {a}  B: {b}")
+        self.loop_button.setEnabled(self.loop_a is not None and self.loop_b is not None)
+    
+    def clear_loop(self):
+        """Remove the A/B loop points"""
+        self.loop_a = None
+        self.loop_b = None
+        self.loop_button.setChecked(False)
+        self.loop_button.setEnabled(False)
+        self.loop_label.setText("A: --  B: --")
+    
+    def loop_active(self):
+        """Check whether playback is confined to the A/B loop"""
+        return self.loop_button.isChecked() and self.loop_a is not None and self.loop_b is not None
+    
+    def toggle_loop(self, checked):
+        """Jump into the loop when it is enabled with the playhead outside it"""
+        if (checked and self.is_playing and self.loop_active()
+                and not self.loop_a <= self.current_frame_index <= self.loop_b):
+            self.restart_loop()
+    
+    def restart_loop(self):
+        """Move the playhead back to the start of the A/B loop"""
+        # Cached frames are shown directly; the decoder resumes at the first gap
+        resume = next(
+            (i for i in range(self.loop_a, self.loop_b + 1)
+             if (self.decode_path, i) not in self.frame_cache),
+            self.loop_b + 1
+        )
+        if self.decoder:
+            self.decoder.seek(resume)
+            self.decoder_needs_seek = False
+        self.clock.start(self.loop_a)
+        self.timer.start(0)
+    
+    def load_motion_timeline(self):
+        """Show the cached motion timeline, or start analysing the video and poll for it"""
+        self.motion_timeline = None
+        self.motion_strip.set_timeline(None)
+        self.next_action_button.setEnabled(False)
+        self.motion_future = self.motion_store.ensure(self.video_path)
+        self.poll_motion_timeline()
+        if self.motion_timeline is None:
+            self.motion_timer.start(1000)
+    
+    def poll_motion_timeline(self):
+        """Pick up the motion timeline once the background analysis has written it"""
+        timeline = self.motion_store.get(self.video_path) if self.video_path else None
+        if timeline is None and self.motion_future is not None and not self.motion_future.done():
+            return
+        # Either available now or the analysis failed; stop polling in both cases
+        self.motion_timer.stop()
+        self.motion_timeline = timeline
+        self.motion_strip.set_timeline(timeline)
+        self.next_action_button.setEnabled(bool(timeline and timeline['segments']))
+    
+    def jump_to_next_action(self):
+        """Move the playhead to the start of the next active segment"""
+        if not self.motion_timeline:
+            return
+        segment = next_segment(self.motion_timeline, self.current_frame_index)
+        if segment is not None:
+            self.seek_to(segment['start'])
+    
+    def seek_to(self, frame_index):
+        """
+        Move the playhead to a frame, keeping playback running if it is
+        
+        Args:
+            frame_index (int): Target frame
+        """
+        if not self.cap:
+            return
+        frame_index = min(max(frame_index, 0), self.frame_count - 1)
+        self.progress_slider.setValue(frame_index)
+        self.set_position(frame_index)
+    
+    def stop_decoder(self):
+        """Stop the background decoder of the current video"""
+        if self.decoder:
+            self.decoder.stop()
+            self.decoder = None
     
     def format_time(self, seconds):
         """Format seconds as MM:SS"""
@@ -321,12 +920,29 @@ class PlaybackScreen(QMainWindow):
         seconds = int(seconds % 60)
         return f"{minutes:02d}:{seconds:02d}"
     
+    def open_grid_view(self):
+        """Open the synchronized multi-angle grid"""
+        # Stop video playback and release video resources
+        self.stop_video()
+        self.stop_decoder()
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+        
+        # Import here to avoid circular imports
+        from grid_screen import GridPlaybackScreen
+        
+        self.grid_screen = GridPlaybackScreen()
+        self.grid_screen.show()
+        self.close()
+    
     def go_back_to_config(self):
         """Return to the configuration screen"""
         # Stop video playback
         self.stop_video()
         
         # Release video resources
+        self.stop_decoder()
         if self.cap:
             self.cap.release()
             self.cap = None
@@ -344,7 +960,10 @@ class PlaybackScreen(QMainWindow):
         # Stop video playback and release resources
         if self.timer.isActive():
             self.timer.stop()
+        self.metrics_timer.stop()
+        self.motion_timer.stop()
         
+        self.stop_decoder()
         if self.cap:
             self.cap.release()
         
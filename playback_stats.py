@@ -0,0 +1,193 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+EVENT_TYPES = ('play', 'pause', 'seek', 'speed', 'ended')
+
+# Playback sessions idle for longer than this are forgotten on startup
+SESSION_MAX_AGE = 24 * 3600
+# Most playing time credited between two events of a session when the
+# length of the video is unknown, e.g. after a lost pause
+MAX_ELAPSED = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    video TEXT NOT NULL,
+    session TEXT NOT NULL,
+    event TEXT NOT NULL,
+    position REAL,
+    speed REAL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY,
+    video TEXT NOT NULL,
+    playing INTEGER NOT NULL DEFAULT 0,
+    played INTEGER NOT NULL DEFAULT 0,
+    speed REAL NOT NULL DEFAULT 1.0,
+    last_ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS video_stats (
+    video TEXT PRIMARY KEY,
+    name TEXT,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_played REAL,
+    total_duration REAL NOT NULL DEFAULT 0,
+    speed_seconds REAL NOT NULL DEFAULT 0,
+    last_speed REAL NOT NULL DEFAULT 1.0
+);
+"""
+
+
+class PlaybackStatsStore:
+    """Append-only playback event log with incrementally maintained aggregates"""
+
+    def __init__(self, db_path):
+        """
+        Open (and create if needed) the event store
+
+        Args:
+            db_path (str): Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        # Databases created before sessions tracked whether they had played
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(sessions)')]
+        if 'played' not in columns:
+            conn.execute('ALTER TABLE sessions ADD COLUMN played INTEGER NOT NULL DEFAULT 0')
+            # Their plays were already counted when they were created
+            conn.execute('UPDATE sessions SET played = 1')
+        conn.execute('DELETE FROM sessions WHERE last_ts < ?', (time.time() - SESSION_MAX_AGE,))
+        conn.commit()
+
+    def _connection(self):
+        """Get the SQLite connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def record(self, video, session, event, position=None, speed=None, name=None, ts=None,
+               duration=None):
+        """
+        Append a playback event and fold it into the per-video aggregates
+
+        Watched time is accumulated between consecutive events of a session
+        while it is playing, weighted by the playback speed in effect, and
+        credited to the video the session started with. One interval never
+        counts for more than playing the whole video, so a session whose
+        pause was lost cannot add hours. A session counts as one play at its
+        first 'play' event, even if seeks or speed changes (e.g. a restored
+        position) came before it.
+
+        Args:
+            video (str): Path of the video the event belongs to
+            session (str): Identifier of the viewing session
+            event (str): One of EVENT_TYPES
+            position (float, optional): Playhead position in seconds
+            speed (float, optional): Playback speed after the event
+            name (str, optional): Display name of the video
+            ts (float, optional): Event time as a UNIX timestamp
+            duration (float, optional): Length of the video in seconds;
+                                        MAX_ELAPSED of playing time is the
+                                        limit when it is unknown
+
+        Raises:
+            ValueError: If the event type is unknown
+        """
+        if event not in EVENT_TYPES:
+            raise ValueError(f'Unknown playback event: {event}')
+        ts = time.time() if ts is None else ts
+
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT INTO events (ts, video, session, event, position, speed) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (ts, video, session, event, position, speed)
+                )
+                conn.execute(
+                    'INSERT OR IGNORE INTO video_stats (video, name) VALUES (?, ?)',
+                    (video, name)
+                )
+                if name:
+                    conn.execute('UPDATE video_stats SET name = ? WHERE video = ?', (name, video))
+
+                row = conn.execute(
+                    'SELECT video, playing, played, speed, last_ts FROM sessions WHERE session = ?',
+                    (session,)
+                ).fetchone()
+                session_video, playing, played, current_speed, last_ts = (
+                    row if row else (video, 0, 0, speed or 1.0, ts)
+                )
+
+                if playing:
+                    limit = duration / current_speed if duration else MAX_ELAPSED
+                    elapsed = min(max(ts - last_ts, 0.0), limit)
+                    conn.execute(
+                        'UPDATE video_stats SET total_duration = total_duration + ?, '
+                        'speed_seconds = speed_seconds + ? WHERE video = ?',
+                        (elapsed, elapsed * current_speed, session_video)
+                    )
+
+                if event == 'play':
+                    if not played:
+                        conn.execute(
+                            'UPDATE video_stats SET play_count = play_count + 1 WHERE video = ?',
+                            (video,)
+                        )
+                        played = 1
+                    conn.execute('UPDATE video_stats SET last_played = ? WHERE video = ?', (ts, video))
+                    playing = 1
+                elif event in ('pause', 'ended'):
+                    playing = 0
+
+                if speed:
+                    current_speed = speed
+                    conn.execute('UPDATE video_stats SET last_speed = ? WHERE video = ?', (speed, video))
+
+                conn.execute(
+                    'INSERT OR REPLACE INTO sessions (session, video, playing, played, speed, last_ts) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (session, session_video, playing, played, current_speed, ts)
+                )
+
+    def get_stats(self):
+        """
+        Get the aggregated statistics of every video with recorded events
+
+        Returns:
+            dict: Mapping of video path to a dictionary with name, play_count,
+                  last_played (ISO 8601 or None), total_duration and avg_speed
+        """
+        rows = self._connection().execute(
+            'SELECT video, name, play_count, last_played, total_duration, '
+            'speed_seconds, last_speed FROM video_stats'
+        ).fetchall()
+
+        stats = {}
+        for video, name, play_count, last_played, total, speed_seconds, last_speed in rows:
+            stats[video] = {
+                'name': name or os.path.basename(video),
+                'play_count': play_count,
+                'last_played': (datetime.fromtimestamp(last_played, timezone.utc).isoformat()
+                                if last_played else None),
+                'total_duration': round(total, 1),
+                'avg_speed': round(speed_seconds / total, 2) if total > 0 else last_speed
+            }
+        return stats
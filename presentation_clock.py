@@ -0,0 +1,107 @@
+import math
+import time
+from collections import deque
+
+# Number of presented frames used to measure the achieved frame rate
+FPS_WINDOW = 30
+
+
+class PresentationClock:
+    """Monotonic clock that maps elapsed wall time to the frame due on screen"""
+
+    def __init__(self, fps, speed=1.0):
+        """
+        Initialize the clock
+
+        Args:
+            fps (float): Native frame rate of the video
+            speed (float): Playback speed multiplier
+        """
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.speed = speed
+        self.running = False
+        self._base_frame = 0
+        self._base_time = 0.0
+        self._presented = deque(maxlen=FPS_WINDOW)
+
+    @property
+    def rate(self):
+        """Frames of video that elapse per second of wall time"""
+        return self.fps * self.speed
+
+    def start(self, frame_index):
+        """
+        Start (or restart) the clock with a frame due immediately
+
+        Args:
+            frame_index (int): Frame that should be on screen now
+        """
+        self._base_frame = frame_index
+        self._base_time = time.monotonic()
+        self._presented.clear()
+        self.running = True
+
+    def stop(self):
+        """Stop the clock"""
+        self.running = False
+
+    def set_speed(self, speed):
+        """
+        Change the playback speed without jumping the playhead
+
+        Args:
+            speed (float): New playback speed multiplier
+        """
+        if self.running:
+            self._base_frame = self.frame_at()
+            self._base_time = time.monotonic()
+            self._presented.clear()
+        self.speed = speed
+
+    def frame_at(self, now=None):
+        """
+        Get the frame that should be on screen
+
+        Args:
+            now (float, optional): time.monotonic() value to evaluate at
+
+        Returns:
+            int: Frame index due at that time
+        """
+        if not self.running:
+            return self._base_frame
+        now = time.monotonic() if now is None else now
+        return self._base_frame + int(math.floor((now - self._base_time) * self.rate))
+
+    def seconds_until(self, frame_index, now=None):
+        """
+        Get the wall time left before a frame is due
+
+        Args:
+            frame_index (int): Frame index to wait for
+            now (float, optional): time.monotonic() value to measure from
+
+        Returns:
+            float: Seconds until the frame is due, never negative
+        """
+        now = time.monotonic() if now is None else now
+        due = self._base_time + (frame_index - self._base_frame) / self.rate
+        return max(due - now, 0.0)
+
+    def frame_presented(self, now=None):
+        """Record that a frame reached the screen"""
+        self._presented.append(time.monotonic() if now is None else now)
+
+    @property
+    def target_fps(self):
+        """Frames per second the display should show at the current speed"""
+        # Above 1.0x only every ceil(speed)-th frame is decoded and shown
+        return self.rate / max(math.ceil(self.speed), 1)
+
+    @property
+    def achieved_fps(self):
+        """Frames per second actually presented over the recent window"""
+        if len(self._presented) < 2:
+            return 0.0
+        elapsed = self._presented[-1] - self._presented[0]
+        return (len(self._presented) - 1) / elapsed if elapsed > 0 else 0.0
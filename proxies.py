@@ -0,0 +1,231 @@
+import os
+import json
+import shutil
+import logging
+import threading
+import subprocess
+
+from background_store import BackgroundStore
+from config_store import get_data_path
+from thumbnails import preview_key
+from faststart import needs_faststart, remux_faststart
+
+logger = logging.getLogger(__name__)
+
+PROXY_VERSION = 1
+# Heights of the low-resolution renditions built for each video
+PROXY_HEIGHTS = (480, 720)
+# Codecs of proxies that browsers can play; mp4v is only for the Qt player
+BROWSER_CODECS = ('avc1', 'h264')
+
+
+def proxy_size(width, height, proxy_height):
+    """Get the even-sized dimensions of a rendition with the source's aspect ratio"""
+    proxy_width = max(int(round(width * proxy_height / height / 2)) * 2, 2)
+    return proxy_width, proxy_height
+
+
+def _transcode_ffmpeg(ffmpeg, video_path, output_path, proxy_height, fps):
+    """Encode a rendition with an external ffmpeg, keeping every frame"""
+    subprocess.run([
+        ffmpeg, '-nostdin', '-y', '-v', 'error',
+        '-i', video_path,
+        '-map', '0:v:0', '-an',
+        '-vf', f'scale=-2:{proxy_height}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p',
+        # One keyframe per second keeps seeks in the proxy cheap
+        '-g', str(max(int(round(fps)), 1)),
+        # Frame N of the proxy must be frame N of the original
+        '-vsync', 'passthrough',
+        '-movflags', '+faststart',
+        output_path
+    ], check=True, capture_output=True, timeout=3600)
+    return 'avc1'
+
+
+def _transcode_opencv(video_path, output_path, size, fps):
+    """Encode a rendition with OpenCV's VideoWriter, preferring H.264"""
+    # Loaded on first use so the web server starts without OpenCV
+    import cv2
+    writer = None
+    codec = None
+    for codec in ('avc1', 'mp4v'):
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            break
+        writer.release()
+        writer = None
+    if writer is None:
+        raise RuntimeError('No MP4 encoder is available')
+
+    cap = cv2.VideoCapture(video_path)
+    resized = None
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            resized = cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+            writer.write(resized)
+    finally:
+        cap.release()
+        writer.release()
+
+    if needs_faststart(output_path):
+        # VideoWriter puts the moov box at the end
+        tmp_path = f'{output_path}.faststart'
+        remux_faststart(output_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    return codec
+
+
+def generate_proxies(video_path, output_dir, heights=PROXY_HEIGHTS):
+    """
+    Encode low-resolution renditions of a video
+
+    Renditions at or above the source height are skipped. ffmpeg is used
+    when it is on the PATH; otherwise frames are resized and re-encoded with
+    OpenCV, which may only produce mp4v files browsers cannot play.
+
+    Args:
+        video_path (str): Path to the video file
+        output_dir (str): Directory receiving <height>.mp4 and manifest.json
+        heights (tuple): Rendition heights in pixels
+
+    Returns:
+        dict or None: The manifest, or None if the video could not be read
+    """
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return None
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+    if not width or not height:
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    ffmpeg = shutil.which('ffmpeg')
+    renditions = []
+    for proxy_height in sorted(heights):
+        if proxy_height >= height:
+            continue
+        size = proxy_size(width, height, proxy_height)
+        output_path = os.path.join(output_dir, f'{proxy_height}.mp4')
+        codec = None
+        if ffmpeg:
+            try:
+                codec = _transcode_ffmpeg(ffmpeg, video_path, output_path, proxy_height, fps)
+            except (subprocess.SubprocessError, OSError) as e:
+                logger.warning(f'ffmpeg could not encode a {proxy_height}p proxy, using OpenCV: {e}')
+        if codec is None:
+            codec = _transcode_opencv(video_path, output_path, size, fps)
+        renditions.append({
+            'height': proxy_height,
+            'width': size[0],
+            'codec': codec,
+            'browser': codec in BROWSER_CODECS,
+            'file': f'{proxy_height}.mp4'
+        })
+
+    manifest = {
+        'version': PROXY_VERSION,
+        'source_width': width,
+        'source_height': height,
+        'renditions': renditions
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def select_rendition(manifest, display_height, browser=False):
+    """
+    Pick the smallest rendition that still fills a display height
+
+    Args:
+        manifest (dict or None): Proxy manifest of the video
+        display_height (float): Height the video is shown at, in device pixels
+        browser (bool): Only consider renditions browsers can play
+
+    Returns:
+        dict or None: The rendition, or None if the original should be used
+    """
+    if not manifest:
+        return None
+    for rendition in manifest['renditions']:
+        if browser and not rendition['browser']:
+            continue
+        if rendition['height'] >= display_height:
+            return rendition
+    return None
+
+
+class ProxyStore(BackgroundStore):
+    """On-disk cache of proxy renditions generated by a worker pool"""
+
+    version = PROXY_VERSION
+    description = 'proxies'
+
+    def __init__(self, cache_dir, workers=1):
+        """
+        Initialize the store
+
+        Args:
+            cache_dir (str): Directory holding one sub-directory per video
+            workers (int): Number of videos transcoded in parallel
+        """
+        super().__init__(cache_dir, workers, 'proxies')
+
+    def directory_for(self, video_path):
+        """Get the cache directory of a video's renditions"""
+        return os.path.join(self.cache_dir, preview_key(video_path))
+
+    def entry_path(self, video_path):
+        return self.directory_for(video_path)
+
+    def result_path(self, video_path):
+        return os.path.join(self.directory_for(video_path), 'manifest.json')
+
+    def rendition_path(self, video_path, rendition):
+        """Get the file of one rendition of a video"""
+        return os.path.join(self.directory_for(video_path), rendition['file'])
+
+    def select(self, video_path, display_height):
+        """
+        Get the file to decode for a video shown at some height
+
+        Args:
+            video_path (str): Path to the original video
+            display_height (float): Height the video is shown at, in pixels
+
+        Returns:
+            str: A proxy rendition, or the original if none is small enough
+                 or the renditions are not built yet
+        """
+        rendition = select_rendition(self.get(video_path), display_height)
+        return video_path if rendition is None else self.rendition_path(video_path, rendition)
+
+    def build(self, video_path, tmp_path):
+        return generate_proxies(video_path, tmp_path)
+
+    def summary(self, video_path, manifest):
+        heights = ', '.join(f'{r["height"]}p ({r["codec"]})' for r in manifest['renditions'])
+        return f'Generated proxies for {video_path}: {heights or "none needed"}'
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_proxy_store():
+    """Get the proxy store shared by the Flask and Qt front ends"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProxyStore(get_data_path('proxies'))
+        return _store
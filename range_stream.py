@@ -0,0 +1,300 @@
+import io
+import os
+import mmap
+import uuid
+from flask import Response
+from werkzeug.http import http_date, parse_date
+from werkzeug.wsgi import ClosingIterator
+
+# Size of each slice handed to the WSGI server while streaming a range
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# Upper bound on the number of ranges honoured in a single request
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when none of the requested byte ranges overlap the file"""
+
+
+def parse_range_header(range_header, file_size):
+    """
+    Parse an HTTP Range header into a list of byte spans
+
+    Handles ``first-last``, open ended ``first-`` and suffix ``-N`` specs.
+    Overlapping or adjacent spans are merged.
+
+    Args:
+        range_header (str): Value of the Range header
+        file_size (int): Size of the resource in bytes
+
+    Returns:
+        list or None: Sorted list of (start, end) tuples with inclusive ends,
+                      or None if the header is malformed and must be ignored
+
+    Raises:
+        RangeNotSatisfiable: If no requested range overlaps the file
+    """
+    if not range_header:
+        return None
+
+    unit, _, specs = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs.strip():
+        return None
+
+    ranges = []
+    for spec in specs.split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, dash, last = spec.partition('-')
+        first, last = first.strip(), last.strip()
+        if not dash or not (first.isdigit() or last.isdigit()):
+            return None
+        if (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+
+        if not first:
+            # Suffix range: the final N bytes of the file
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            start = max(file_size - suffix, 0)
+            end = file_size - 1
+        else:
+            start = int(first)
+            end = file_size - 1
+            if last:
+                if int(last) < start:
+                    return None
+                end = min(int(last), end)
+
+        if start < file_size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable(range_header)
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > MAX_RANGES:
+        # Too fragmented to be worth honouring; fall back to the full body
+        return None
+
+    return merged
+
+
+def if_range_matches(if_range, etag=None, last_modified=None):
+    """
+    Evaluate an If-Range precondition
+
+    Args:
+        if_range (str): Value of the If-Range header
+        etag (str, optional): Current strong entity tag, without quotes
+        last_modified (float, optional): Modification time as a UNIX timestamp
+
+    Returns:
+        bool: True if the Range header should be honoured
+    """
+    if not if_range:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        # Weak validators are never usable with If-Range
+        return False
+    if if_range.startswith('"'):
+        return etag is not None and if_range == f'"{etag}"'
+
+    date = parse_date(if_range)
+    if date is None or last_modified is None:
+        return False
+    return int(date.timestamp()) == int(last_modified)
+
+
+def iter_file_range(path, start, length, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a byte span of a file as bounded mmap-backed slices
+
+    Args:
+        path (str): Path to the file
+        start (int): Offset of the first byte
+        length (int): Number of bytes to yield
+        chunk_size (int): Maximum size of each yielded slice
+
+    Yields:
+        bytes: Consecutive slices of the requested span
+    """
+    if length <= 0:
+        return
+
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            end = min(start + length, len(mm))
+            position = start
+            while position < end:
+                next_position = min(position + chunk_size, end)
+                yield mm[position:next_position]
+                position = next_position
+
+
+def _multipart_parts(ranges, file_size, mimetype, boundary):
+    """Build the part header for every range of a multipart/byteranges body"""
+    parts = []
+    for start, end in ranges:
+        header = (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {mimetype}\r\n'
+            f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n'
+        ).encode('latin-1')
+        parts.append((header, start, end))
+    return parts
+
+
+def iter_multipart_ranges(path, parts, boundary, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a multipart/byteranges body for several spans of a file
+
+    Args:
+        path (str): Path to the file
+        parts (list): (header, start, end) tuples from _multipart_parts
+        boundary (str): Multipart boundary string
+        chunk_size (int): Maximum size of each yielded file slice
+
+    Yields:
+        bytes: Part headers and file slices in order
+    """
+    for header, start, end in parts:
+        yield header
+        yield from iter_file_range(path, start, end - start + 1, chunk_size)
+    yield f'\r\n--{boundary}--\r\n'.encode('latin-1')
+
+
+class _NotifyingFile(io.BufferedReader):
+    """File handed to wsgi.file_wrapper that runs a callback once it is closed"""
+
+    def __init__(self, path, on_close):
+        super().__init__(io.FileIO(path, 'rb'))
+        self._on_close = on_close
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+def make_range_response(req, path, mimetype, headers=None, etag=None, weak_etag=False,
+                        chunk_size=DEFAULT_CHUNK_SIZE, on_close=None):
+    """
+    Build a streaming response for a file honouring Range and If-Range
+
+    The requested bytes are never read into memory as a whole. Spans that run
+    to the end of the file are handed to the server's ``wsgi.file_wrapper``
+    when it provides one (so servers that support it can use sendfile);
+    everything else is streamed as mmap-backed slices of ``chunk_size``.
+
+    Args:
+        req (flask.Request): The current request
+        path (str): Path to the file to serve
+        mimetype (str): Content type of the file
+        headers (dict, optional): Extra headers to send with the response
+        etag (str, optional): Entity tag of the file, without quotes
+        weak_etag (bool): Whether etag is a weak validator, which is sent
+                          as such and never satisfies If-Range
+        chunk_size (int): Maximum size of each streamed slice
+        on_close (callable, optional): Called once when the server is done
+                                       with the response, whether the body
+                                       was sent in full or aborted
+
+    Returns:
+        flask.Response: A 200, 206 or 416 response
+    """
+    headers = dict(headers or {})
+    stat = os.stat(path)
+    file_size = stat.st_size
+    headers['Accept-Ranges'] = 'bytes'
+    headers['Last-Modified'] = http_date(stat.st_mtime)
+    if etag:
+        headers['ETag'] = f'W/"{etag}"' if weak_etag else f'"{etag}"'
+
+    ranges = None
+    range_header = req.headers.get('Range')
+    strong_etag = None if weak_etag else etag
+    if range_header and if_range_matches(req.headers.get('If-Range'), strong_etag, stat.st_mtime):
+        try:
+            ranges = parse_range_header(range_header, file_size)
+        except RangeNotSatisfiable:
+            headers['Content-Range'] = f'bytes */{file_size}'
+            response = Response(status=416, headers=headers)
+            if on_close is not None:
+                response.call_on_close(on_close)
+            return response
+
+    send_body = req.method != 'HEAD'
+
+    if ranges is None:
+        status = 200
+        start, length = 0, file_size
+    elif len(ranges) == 1:
+        status = 206
+        start, end = ranges[0]
+        length = end - start + 1
+        headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+    else:
+        boundary = uuid.uuid4().hex
+        parts = _multipart_parts(ranges, file_size, mimetype, boundary)
+        length = sum(len(header) + end - start + 1 for header, start, end in parts)
+        length += len(f'\r\n--{boundary}--\r\n')
+        headers['Content-Length'] = str(length)
+        body = iter_multipart_ranges(path, parts, boundary, chunk_size) if send_body else ()
+        if on_close is not None:
+            body = ClosingIterator(body, on_close)
+        return Response(
+            body,
+            206,
+            mimetype=f'multipart/byteranges; boundary={boundary}',
+            direct_passthrough=True,
+            headers=headers
+        )
+
+    headers['Content-Length'] = str(length)
+
+    if not send_body:
+        body = ()
+    else:
+        file_wrapper = req.environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and length > 0 and start + length == file_size:
+            # Wrapping the body would hide it from the server, so the file
+            # reports its own close instead
+            f = open(path, 'rb') if on_close is None else _NotifyingFile(path, on_close)
+            f.seek(start)
+            return Response(
+                file_wrapper(f, chunk_size),
+                status,
+                mimetype=mimetype,
+                direct_passthrough=True,
+                headers=headers
+            )
+        body = iter_file_range(path, start, length, chunk_size)
+    if on_close is not None:
+        body = ClosingIterator(body, on_close)
+
+    return Response(
+        body,
+        status,
+        mimetype=mimetype,
+        direct_passthrough=True,
+        headers=headers
+    )
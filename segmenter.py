@@ -0,0 +1,448 @@
+import os
+import math
+import struct
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from mp4_atoms import find_box, iter_buffer_boxes, make_box
+
+logger = logging.getLogger(__name__)
+
+# Segments are cut at the first keyframe at least this many seconds in
+TARGET_SEGMENT_DURATION = 4.0
+# Parsed sample tables kept in memory, most recently used first
+INDEX_CACHE_SIZE = 32
+
+# trun sample flags: sync samples depend on nothing, others are non-sync
+SYNC_SAMPLE_FLAGS = 0x02000000
+NON_SYNC_SAMPLE_FLAGS = 0x01010000
+# trun carries data offset, duration, size, flags and composition offset
+TRUN_FLAGS = 0x000001 | 0x000100 | 0x000200 | 0x000400 | 0x000800
+# tfhd: sample data offsets are relative to the start of the moof box
+TFHD_DEFAULT_BASE_IS_MOOF = 0x020000
+
+
+def full_box(box_type, version, flags, payload):
+    """Build a box that starts with a version and flags field"""
+    return make_box(box_type, struct.pack('>I', (version << 24) | flags) + payload)
+
+
+def _children(data):
+    """Map each box type in a buffer to the payload of its first box"""
+    boxes = {}
+    for box_type, header_size, size, offset in iter_buffer_boxes(data):
+        boxes.setdefault(box_type, data[offset + header_size:offset + size])
+    return boxes
+
+
+def _table(body, count_offset, columns, dtype='>u4'):
+    """Read a table of big-endian integers that follows an entry count"""
+    count = struct.unpack_from('>I', body, count_offset)[0]
+    values = np.frombuffer(body, dtype=dtype, count=count * columns, offset=count_offset + 4)
+    return values.astype(np.int64).reshape(count, columns)
+
+
+def _sample_entry(stsd):
+    """Get the type and child boxes of the first sample entry in an stsd payload"""
+    # stsd: version/flags (4), entry_count (4), then sample entry boxes
+    for box_type, header_size, size, offset in iter_buffer_boxes(stsd[8:]):
+        return box_type, stsd[8 + offset + header_size:8 + offset + size]
+    return None, b''
+
+
+def codec_string(handler, stsd):
+    """
+    Build the RFC 6381 codecs parameter of a track, as used by MSE and HLS
+
+    Args:
+        handler (bytes): Track handler type, e.g. b'vide' or b'soun'
+        stsd (bytes): Payload of the track's stsd box
+
+    Returns:
+        str or None: e.g. 'avc1.64001f' or 'mp4a.40.2', or None if unknown
+    """
+    entry_type, entry = _sample_entry(stsd)
+    if entry_type is None:
+        return None
+    name = entry_type.decode('latin-1')
+    if handler == b'vide':
+        # VisualSampleEntry fields take 78 bytes before the child boxes
+        children = _children(entry[78:])
+    elif handler == b'soun':
+        # AudioSampleEntry is 28 bytes; QuickTime versions 1 and 2 are longer
+        version = struct.unpack_from('>H', entry, 8)[0] if len(entry) >= 10 else 0
+        children = _children(entry[{1: 44, 2: 64}.get(version, 28):])
+    else:
+        return name
+
+    if name in ('avc1', 'avc3') and b'avcC' in children:
+        profile, compatibility, level = children[b'avcC'][1:4]
+        return f'{name}.{profile:02x}{compatibility:02x}{level:02x}'
+    if name in ('hvc1', 'hev1') and b'hvcC' in children:
+        config = children[b'hvcC']
+        space = ('', 'A', 'B', 'C')[config[1] >> 6]
+        tier = 'H' if config[1] & 0x20 else 'L'
+        profile = config[1] & 0x1F
+        compatibility = int('{:032b}'.format(struct.unpack_from('>I', config, 2)[0])[::-1], 2)
+        constraints = bytearray(config[6:12]).rstrip(b'\x00')
+        parts = [f'{name}.{space}{profile}', f'{compatibility:x}', f'{tier}{config[12]}']
+        parts += [f'{byte:x}' for byte in constraints]
+        return '.'.join(parts)
+    if name == 'vp09' and b'vpcC' in children:
+        # vpcC: version/flags (4), profile, level, bit depth (high 4 bits)
+        config = children[b'vpcC']
+        return f'vp09.{config[4]:02d}.{config[5]:02d}.{config[6] >> 4:02d}'
+    if name == 'av01' and b'av1C' in children:
+        config = children[b'av1C']
+        profile, level = config[1] >> 5, config[1] & 0x1F
+        tier = 'H' if config[2] & 0x80 else 'M'
+        depth = 12 if config[2] & 0x40 and config[2] & 0x20 else 10 if config[2] & 0x40 else 8
+        return f'av01.{profile}.{level:02d}{tier}.{depth:02d}'
+    if name in ('mp4a', 'mp4v') and b'esds' in children:
+        return _esds_codec(name, children[b'esds'])
+    return name
+
+
+def _esds_codec(name, esds):
+    """Build an mp4a/mp4v codecs parameter from an esds payload"""
+    # esds: version/flags (4), then nested descriptors (tag, size, body)
+    data = esds[4:]
+    position = 0
+    object_type = None
+    while position < len(data):
+        tag = data[position]
+        position += 1
+        size = 0
+        for _ in range(4):
+            byte = data[position]
+            position += 1
+            size = (size << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                break
+        if tag == 0x03:
+            # ES_Descriptor: ES_ID (2), flags (1) and optional fields
+            flags = data[position + 2]
+            position += 3 + (2 if flags & 0x80 else 0) + (2 if flags & 0x20 else 0)
+            if flags & 0x40:
+                position += 1 + data[position]
+        elif tag == 0x04:
+            # DecoderConfigDescriptor: objectTypeIndication, then 12 bytes
+            object_type = data[position]
+            position += 13
+        elif tag == 0x05:
+            if object_type == 0x40 and size:
+                return f'{name}.40.{data[position] >> 3}'
+            break
+        else:
+            position += size
+    return f'{name}.{object_type:02x}' if object_type is not None else name
+
+
+def _read_samples(stbl):
+    """
+    Expand the sample tables of a track into per-sample arrays
+
+    Returns:
+        dict: Arrays of file offset, size, decode time, duration, composition
+              offset and sync flag of every sample
+    """
+    stsz = stbl[b'stsz']
+    sample_size, count = struct.unpack_from('>II', stsz, 4)
+    if sample_size:
+        sizes = np.full(count, sample_size, dtype=np.int64)
+    else:
+        sizes = np.frombuffer(stsz, dtype='>u4', count=count, offset=12).astype(np.int64)
+
+    stts = _table(stbl[b'stts'], 4, 2)
+    durations = np.repeat(stts[:, 1], stts[:, 0])[:count]
+    dts = np.concatenate(([0], np.cumsum(durations)[:-1])) if count else durations
+
+    if b'ctts' in stbl:
+        ctts = _table(stbl[b'ctts'], 4, 2, dtype='>i4')
+        composition = np.repeat(ctts[:, 1], ctts[:, 0])[:count]
+    else:
+        composition = np.zeros(count, dtype=np.int64)
+
+    if b'stss' in stbl:
+        sync = np.zeros(count, dtype=bool)
+        sync[_table(stbl[b'stss'], 4, 1)[:, 0] - 1] = True
+    else:
+        sync = np.ones(count, dtype=bool)
+
+    if b'stco' in stbl:
+        chunk_offsets = _table(stbl[b'stco'], 4, 1)[:, 0]
+    else:
+        chunk_offsets = _table(stbl[b'co64'], 4, 1, dtype='>u8')[:, 0]
+    stsc = _table(stbl[b'stsc'], 4, 3)
+    first_chunks = stsc[:, 0] - 1
+    runs = np.diff(np.append(first_chunks, len(chunk_offsets)))
+    per_chunk = np.repeat(stsc[:, 1], runs)
+    sample_chunk = np.repeat(np.arange(len(per_chunk)), per_chunk)[:count]
+    # Offset of each sample = its chunk's offset + sizes of the samples
+    # before it in the same chunk
+    before = np.cumsum(sizes) - sizes
+    chunk_first = (np.cumsum(per_chunk) - per_chunk)[sample_chunk]
+    offsets = chunk_offsets[sample_chunk] + before - before[chunk_first]
+
+    return {
+        'offsets': offsets,
+        'sizes': sizes,
+        'dts': dts,
+        'durations': durations,
+        'composition': composition,
+        'sync': sync
+    }
+
+
+def _strip_sample_tables(data, inside=(b'mdia', b'minf')):
+    """Rebuild a trak payload with empty sample tables, as fragmented files need"""
+    parts = []
+    for box_type, header_size, size, offset in iter_buffer_boxes(data):
+        body = data[offset + header_size:offset + size]
+        if box_type == b'stbl':
+            tables = [
+                make_box(b'stsd', _children(body)[b'stsd']),
+                full_box(b'stts', 0, 0, struct.pack('>I', 0)),
+                full_box(b'stsc', 0, 0, struct.pack('>I', 0)),
+                full_box(b'stsz', 0, 0, struct.pack('>II', 0, 0)),
+                full_box(b'stco', 0, 0, struct.pack('>I', 0))
+            ]
+            parts.append(make_box(b'stbl', b''.join(tables)))
+        elif box_type in inside:
+            parts.append(make_box(box_type, _strip_sample_tables(body, inside)))
+        else:
+            parts.append(data[offset:offset + size])
+    return b''.join(parts)
+
+
+def build_stream_index(path, target_duration=TARGET_SEGMENT_DURATION):
+    """
+    Plan the keyframe-aligned segments of an MP4 file
+
+    Segments start at a keyframe of the first video track and last at least
+    the target duration; samples of other tracks are assigned by decode time.
+
+    Args:
+        path (str): Path to a non-fragmented MP4 file
+        target_duration (float): Minimum segment length in seconds
+
+    Returns:
+        dict: Init segment, tracks, segment plan, codecs and duration
+
+    Raises:
+        ValueError: If the file has no usable tracks
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        moov = find_box(f, 0, f.tell(), b'moov')
+        if moov is None:
+            raise ValueError('The file has no moov box')
+        f.seek(moov[0] + moov[1])
+        moov_payload = f.read(moov[2] - moov[1])
+
+    moov_boxes = _children(moov_payload)
+    if b'mvex' in moov_boxes:
+        raise ValueError('The file is already fragmented')
+    tracks = []
+    traks = []
+    for box_type, header_size, size, offset in iter_buffer_boxes(moov_payload):
+        if box_type != b'trak':
+            continue
+        trak = moov_payload[offset + header_size:offset + size]
+        try:
+            children = _children(trak)
+            mdia = _children(children[b'mdia'])
+            stbl = _children(_children(mdia[b'minf'])[b'stbl'])
+            tkhd, mdhd = children[b'tkhd'], mdia[b'mdhd']
+            # Track ID and timescale sit after 32- or 64-bit timestamps
+            track_id = struct.unpack_from('>I', tkhd, 20 if tkhd[0] == 1 else 12)[0]
+            timescale = struct.unpack_from('>I', mdhd, 20 if mdhd[0] == 1 else 12)[0]
+            handler = mdia[b'hdlr'][8:12]
+            if handler not in (b'vide', b'soun') or not timescale:
+                continue
+            samples = _read_samples(stbl)
+        except (KeyError, IndexError, struct.error) as e:
+            raise ValueError(f'Unsupported track layout: {e!r}')
+        if not len(samples['sizes']):
+            continue
+        tracks.append({
+            'id': track_id,
+            'handler': handler,
+            'timescale': timescale,
+            'codec': codec_string(handler, stbl[b'stsd']),
+            'samples': samples
+        })
+        traks.append(make_box(b'trak', _strip_sample_tables(trak)))
+    if not tracks:
+        raise ValueError('The file has no audio or video samples')
+
+    main = next((track for track in tracks if track['handler'] == b'vide'), tracks[0])
+    samples = main['samples']
+    keyframes = np.flatnonzero(samples['sync'])
+    starts = [0]
+    for keyframe in keyframes:
+        if (samples['dts'][keyframe] - samples['dts'][starts[-1]]) >= target_duration * main['timescale']:
+            starts.append(int(keyframe))
+    end = float(samples['dts'][-1] + samples['durations'][-1]) / main['timescale']
+    times = [0.0] + [float(samples['dts'][start]) / main['timescale'] for start in starts[1:]]
+    bounds = times[1:] + [end]
+
+    # First sample of every segment in every track
+    firsts = []
+    for track in tracks:
+        if track is main:
+            firsts.append(starts + [len(samples['sizes'])])
+        else:
+            seconds = track['samples']['dts'] / track['timescale']
+            firsts.append([0] + list(np.searchsorted(seconds, times[1:])) + [len(seconds)])
+    segments = [
+        {
+            'start': start,
+            'duration': stop - start,
+            'ranges': [(int(first[i]), int(first[i + 1])) for first in firsts]
+        }
+        for i, (start, stop) in enumerate(zip(times, bounds))
+    ]
+
+    ftyp = make_box(b'ftyp', b'iso6' + struct.pack('>I', 0) + b'iso6isommp41')
+    mvex = make_box(b'mvex', b''.join(
+        full_box(b'trex', 0, 0, struct.pack('>IIIII', track['id'], 1, 0, 0, 0)) for track in tracks
+    ))
+    init = ftyp + make_box(b'moov', make_box(b'mvhd', moov_boxes[b'mvhd']) + b''.join(traks) + mvex)
+
+    codecs = [track['codec'] for track in tracks]
+    return {
+        'init': init,
+        'tracks': tracks,
+        'segments': segments,
+        'duration': end,
+        'codecs': ','.join(codecs) if all(codecs) else None
+    }
+
+
+def _read_runs(f, offsets, sizes):
+    """Read samples, merging those that are contiguous in the file into one read"""
+    if not len(offsets):
+        return b''
+    breaks = np.flatnonzero(offsets[1:] != offsets[:-1] + sizes[:-1]) + 1
+    parts = []
+    for run in np.split(np.arange(len(offsets)), breaks):
+        f.seek(int(offsets[run[0]]))
+        parts.append(f.read(int(offsets[run[-1]] + sizes[run[-1]] - offsets[run[0]])))
+    return b''.join(parts)
+
+
+def build_segment(path, index, number):
+    """
+    Cut one media segment (moof + mdat) out of an MP4 file
+
+    Each segment starts with a keyframe, so it can be fetched and decoded
+    on its own after the init segment.
+
+    Args:
+        path (str): Path to the MP4 file the index was built from
+        index (dict): Result of build_stream_index
+        number (int): 0-based segment number
+
+    Returns:
+        bytes: The segment
+    """
+    segment = index['segments'][number]
+    parts = []
+    with open(path, 'rb') as f:
+        for track, (first, last) in zip(index['tracks'], segment['ranges']):
+            if last > first:
+                samples = track['samples']
+                parts.append((track, first, last, _read_runs(
+                    f, samples['offsets'][first:last], samples['sizes'][first:last])))
+
+    def moof(data_offsets):
+        trafs = []
+        for (track, first, last, _), data_offset in zip(parts, data_offsets):
+            samples = track['samples']
+            entries = np.empty((last - first, 4), dtype='>u4')
+            entries[:, 0] = samples['durations'][first:last]
+            entries[:, 1] = samples['sizes'][first:last]
+            entries[:, 2] = np.where(samples['sync'][first:last], SYNC_SAMPLE_FLAGS, NON_SYNC_SAMPLE_FLAGS)
+            entries[:, 3] = samples['composition'][first:last] & 0xFFFFFFFF
+            trafs.append(make_box(b'traf', b''.join([
+                full_box(b'tfhd', 0, TFHD_DEFAULT_BASE_IS_MOOF, struct.pack('>I', track['id'])),
+                full_box(b'tfdt', 1, 0, struct.pack('>Q', int(samples['dts'][first]))),
+                full_box(b'trun', 1, TRUN_FLAGS,
+                         struct.pack('>Ii', last - first, data_offset) + entries.tobytes())
+            ])))
+        return make_box(b'moof', full_box(b'mfhd', 0, 0, struct.pack('>I', number + 1)) + b''.join(trafs))
+
+    # Data offsets point into the mdat, so they depend on the moof size,
+    # which does not depend on their values
+    moof_size = len(moof([0] * len(parts)))
+    data_offsets = []
+    position = moof_size + 8
+    for _, _, _, data in parts:
+        data_offsets.append(position)
+        position += len(data)
+    mdat = make_box(b'mdat', b''.join(data for _, _, _, data in parts))
+    return moof(data_offsets) + mdat
+
+
+def build_playlist(index, init_uri='init.mp4', segment_uri='segment_{}.m4s'):
+    """
+    Write an HLS media playlist for fragmented MP4 segments
+
+    Args:
+        index (dict): Result of build_stream_index
+        init_uri (str): URI of the init segment
+        segment_uri (str): URI template formatted with the segment number
+
+    Returns:
+        str: The playlist
+    """
+    target = max(math.ceil(segment['duration']) for segment in index['segments'])
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:7',
+        f'#EXT-X-TARGETDURATION:{target}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        '#EXT-X-INDEPENDENT-SEGMENTS',
+        f'#EXT-X-MAP:URI="{init_uri}"'
+    ]
+    for number, segment in enumerate(index['segments']):
+        lines.append(f'#EXTINF:{segment["duration"]:.3f},')
+        lines.append(segment_uri.format(number))
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_stream_index(path):
+    """
+    Get the segment plan of a file, parsing its sample tables at most once
+
+    Args:
+        path (str): Path to the MP4 file
+
+    Returns:
+        dict: Result of build_stream_index for the current file contents
+    """
+    stat = os.stat(path)
+    key = os.path.normcase(os.path.abspath(path))
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] == version:
+            _indexes.move_to_end(key)
+            return cached[1]
+    index = build_stream_index(path)
+    logger.info(f'Planned {len(index["segments"])} segments for {path}')
+    with _indexes_lock:
+        _indexes[key] = (version, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,237 @@
+import time
+import queue
+import signal
+import socket
+import logging
+import threading
+from werkzeug.serving import BaseWSGIServer, ThreadedWSGIServer
+
+logger = logging.getLogger(__name__)
+
+# Available serving modes:
+#   threaded - one thread per connection (the Werkzeug threaded server)
+#   pool     - fixed worker pool with a bounded request queue, waitress style
+SERVER_MODES = ('threaded', 'pool')
+DEFAULT_MODE = 'pool'
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_DEPTH = 32
+# Seconds server_close() waits for in-flight requests; long range or
+# segment streams still open after that are cut off when the process exits
+SHUTDOWN_TIMEOUT = 5.0
+
+_QUEUE_FULL_RESPONSE = (
+    b'HTTP/1.1 503 Service Unavailable\r\n'
+    b'Content-Length: 0\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n\r\n'
+)
+
+
+class PoolWSGIServer(BaseWSGIServer):
+    """WSGI server that hands connections to a fixed pool of worker threads"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, workers=DEFAULT_WORKERS,
+                 queue_depth=DEFAULT_QUEUE_DEPTH, handler=None, fd=None):
+        """
+        Initialize the server
+
+        Args:
+            host (str): Interface to bind to
+            port (int): Port to listen on
+            app (callable): WSGI application
+            workers (int): Number of worker threads
+            queue_depth (int): Connections allowed to wait for a free worker
+            handler (type, optional): Request handler class
+            fd (int, optional): Already bound listening socket to use
+        """
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        # (socket, address) of accepted connections; None stops a worker
+        self._requests = queue.Queue()
+        # Daemon threads, so a client that keeps a stream open cannot keep
+        # the process alive once the server is closed
+        self._workers = [
+            threading.Thread(target=self._work, name=f'wsgi-worker_{index}', daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self._workers:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        """Queue a connection for a worker, rejecting it when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f'Request queue full, rejecting {client_address[0]}')
+            try:
+                request.sendall(_QUEUE_FULL_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        """Worker thread: serve queued connections until told to stop"""
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            self._process_request_worker(*item)
+
+    def _process_request_worker(self, request, client_address):
+        """Serve one connection on a worker thread"""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        """
+        Stop accepting connections and give in-flight requests a bounded time
+
+        Connections still waiting for a worker are closed unanswered. Requests
+        that have not finished after SHUTDOWN_TIMEOUT seconds are left to
+        their daemon threads and cut off when the process exits.
+        """
+        super().server_close()
+        # Werkzeug also closes its throwaway socket when handed an already
+        # bound one, before the pool exists
+        if not hasattr(self, '_workers'):
+            return
+        while True:
+            try:
+                item = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+                self._slots.release()
+        for _ in self._workers:
+            self._requests.put(None)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for thread in self._workers:
+            thread.join(max(deadline - time.monotonic(), 0))
+        busy = sum(thread.is_alive() for thread in self._workers)
+        if busy:
+            logger.warning(f'{busy} requests still running after {SHUTDOWN_TIMEOUT:.0f}s; '
+                           f'they are cut off on exit')
+
+
+def bind_socket(host='127.0.0.1', port=5000, backlog=128):
+    """
+    Bind and listen on a TCP socket before the application is loaded
+
+    Connections made from then on wait in the listen backlog until the
+    server created with the socket's file descriptor starts accepting.
+
+    Args:
+        host (str): Interface to bind to
+        port (int): Port to listen on
+        backlog (int): Connections the kernel queues before refusing more
+
+    Returns:
+        socket.socket: The listening socket
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+            # Windows lets other processes bind the same port otherwise
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def create_server(app, host='127.0.0.1', port=5000, mode=DEFAULT_MODE,
+                  workers=DEFAULT_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH, fd=None):
+    """
+    Create a WSGI server for the application
+
+    Args:
+        app (callable): WSGI application
+        host (str): Interface to bind to
+        port (int): Port to listen on
+        mode (str): One of SERVER_MODES
+        workers (int): Worker threads for the pool mode
+        queue_depth (int): Maximum queued connections for the pool mode
+        fd (int, optional): Already bound listening socket to use
+
+    Returns:
+        BaseWSGIServer: The server, bound and listening
+    """
+    if mode not in SERVER_MODES:
+        raise ValueError(f'Unknown server mode: {mode}')
+
+    # Werkzeug's handler closes the connection after every response, so
+    # each request needs its own connection and worker slot
+    if mode == 'pool':
+        return PoolWSGIServer(host, port, app, workers=workers,
+                              queue_depth=queue_depth, fd=fd)
+    return ThreadedWSGIServer(host, port, app, fd=fd)
+
+
+def serve_app(app, host='127.0.0.1', port=5000, on_ready=None,
+              install_signal_handlers=False, **options):
+    """
+    Run the application until the server is shut down
+
+    This is the single bootstrap used by both the desktop shell and the
+    standalone web server.
+
+    Args:
+        app (callable): WSGI application
+        host (str): Interface to bind to
+        port (int): Port to listen on
+        on_ready (callable, optional): Called with the server once it listens
+        install_signal_handlers (bool): Shut down gracefully on SIGINT/SIGTERM
+        **options: Further arguments for create_server
+    """
+    server = create_server(app, host, port, **options)
+    logger.info(f'Serving on http://{host}:{server.port} '
+                f'({options.get("mode", DEFAULT_MODE)} mode)')
+
+    if install_signal_handlers:
+        def request_shutdown(signum, frame):
+            logger.info(f'Received signal {signum}, shutting down')
+            # shutdown() blocks until serve_forever returns, so it must not
+            # run on the thread that is serving
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGINT, request_shutdown)
+        signal.signal(signal.SIGTERM, request_shutdown)
+
+    if on_ready:
+        on_ready(server)
+
+    # Werkzeug closes the server (and with it the worker pool) on exit, waiting
+    # at most SHUTDOWN_TIMEOUT for open streams
+    server.serve_forever()
+    logger.info('Server stopped')
+
+
+def add_server_arguments(parser):
+    """
+    Add the serving options to an argparse parser
+
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend
+    """
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to bind to')
+    parser.add_argument('--port', type=int, default=5000, help='Port to listen on')
+    parser.add_argument('--server', dest='mode', choices=SERVER_MODES,
+                        default=DEFAULT_MODE, help='Serving mode')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='Worker threads in pool mode')
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help='Connections allowed to wait for a worker in pool mode')
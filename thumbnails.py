@@ -0,0 +1,199 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from background_store import BackgroundStore
+from config_store import get_data_path
+from http_cache import IMMUTABLE_NAME
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_VERSION = 1
+DEFAULT_INTERVAL = 1.0
+DEFAULT_TILE_WIDTH = 160
+SHEET_COLUMNS = 10
+SHEET_ROWS = 10
+JPEG_QUALITY = 70
+
+
+def preview_key(video_path):
+    """
+    Get the cache key of a video's previews
+
+    Uploads are keyed by their UUID; other files by a hash of their path,
+    size and modification time.
+
+    Args:
+        video_path (str): Path to the video file
+
+    Returns:
+        str: Directory name used for the video's previews
+    """
+    name = os.path.basename(video_path)
+    if IMMUTABLE_NAME.match(name):
+        return os.path.splitext(name)[0]
+    stat = os.stat(video_path)
+    source = f'{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}'
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def generate_previews(video_path, output_dir, interval=DEFAULT_INTERVAL,
+                      tile_width=DEFAULT_TILE_WIDTH):
+    """
+    Decode a video once and pack downscaled thumbnails into JPEG sprite sheets
+
+    Frames between thumbnails are only grabbed, never converted, so the cost
+    is one demux/decode pass plus a resize per thumbnail.
+
+    Args:
+        video_path (str): Path to the video file
+        output_dir (str): Directory receiving the sheets and manifest.json
+        interval (float): Seconds between thumbnails
+        tile_width (int): Width of each thumbnail in pixels
+
+    Returns:
+        dict or None: The manifest, or None if the video could not be read
+    """
+    # Loaded on first use so the web server starts without OpenCV
+    import cv2
+    import numpy as np
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if not width or not height:
+            return None
+        tile_height = max(int(round(tile_width * height / width)), 1)
+        step = max(fps * interval, 1.0)
+        per_sheet = SHEET_COLUMNS * SHEET_ROWS
+
+        os.makedirs(output_dir, exist_ok=True)
+        sheet = np.zeros((tile_height * SHEET_ROWS, tile_width * SHEET_COLUMNS, 3), np.uint8)
+        sheets = 0
+        count = 0
+        frame_index = 0
+        next_sample = 0.0
+
+        def flush(tiles):
+            used_rows = (tiles + SHEET_COLUMNS - 1) // SHEET_COLUMNS
+            image = sheet[:used_rows * tile_height]
+            ok, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            if ok:
+                with open(os.path.join(output_dir, f'{sheets}.jpg'), 'wb') as f:
+                    f.write(data.tobytes())
+            sheet[:] = 0
+
+        while cap.grab():
+            if frame_index >= next_sample:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                tile = count % per_sheet
+                row, column = divmod(tile, SHEET_COLUMNS)
+                cv2.resize(
+                    frame,
+                    (tile_width, tile_height),
+                    dst=sheet[row * tile_height:(row + 1) * tile_height,
+                              column * tile_width:(column + 1) * tile_width],
+                    interpolation=cv2.INTER_AREA
+                )
+                count += 1
+                next_sample += step
+                if count % per_sheet == 0:
+                    flush(per_sheet)
+                    sheets += 1
+            frame_index += 1
+
+        if count % per_sheet:
+            flush(count % per_sheet)
+            sheets += 1
+    finally:
+        cap.release()
+
+    manifest = {
+        'version': PREVIEW_VERSION,
+        'interval': interval,
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'columns': SHEET_COLUMNS,
+        'rows': SHEET_ROWS,
+        'count': count,
+        'sheets': sheets
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def tile_position(manifest, seconds):
+    """
+    Locate the thumbnail closest to a playback time
+
+    Args:
+        manifest (dict): Preview manifest
+        seconds (float): Playback time
+
+    Returns:
+        tuple: (sheet number, x, y) of the tile's top-left corner
+    """
+    index = int(seconds / manifest['interval'] + 0.5)
+    index = min(max(index, 0), manifest['count'] - 1)
+    sheet, tile = divmod(index, manifest['columns'] * manifest['rows'])
+    row, column = divmod(tile, manifest['columns'])
+    return sheet, column * manifest['tile_width'], row * manifest['tile_height']
+
+
+class PreviewStore(BackgroundStore):
+    """On-disk cache of preview sprite sheets generated by a worker pool"""
+
+    version = PREVIEW_VERSION
+    description = 'previews'
+
+    def __init__(self, cache_dir, workers=2):
+        """
+        Initialize the store
+
+        Args:
+            cache_dir (str): Directory holding one sub-directory per video
+            workers (int): Number of videos processed in parallel
+        """
+        super().__init__(cache_dir, workers, 'previews')
+
+    def directory_for(self, video_path):
+        """Get the cache directory of a video's previews"""
+        return os.path.join(self.cache_dir, preview_key(video_path))
+
+    def entry_path(self, video_path):
+        return self.directory_for(video_path)
+
+    def result_path(self, video_path):
+        return os.path.join(self.directory_for(video_path), 'manifest.json')
+
+    def sheet_path(self, video_path, sheet):
+        """Get the path of one sprite sheet of a video"""
+        return os.path.join(self.directory_for(video_path), f'{int(sheet)}.jpg')
+
+    def build(self, video_path, tmp_path):
+        return generate_previews(video_path, tmp_path)
+
+    def summary(self, video_path, manifest):
+        return f'Generated {manifest["count"]} previews for {video_path}'
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_preview_store():
+    """Get the preview store shared by the Flask and Qt front ends"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PreviewStore(get_data_path('previews'))
+        return _store
@@ -0,0 +1,303 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed upload names: the SHA-256 of the file and the .mp4 extension
+BLOB_NAME = re.compile(r'^([0-9a-f]{64})\.mp4$')
+# Unreferenced blobs are kept this long so uploads can be saved to the config
+DEFAULT_GRACE_PERIOD = 24 * 3600
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def blob_name(digest):
+    """Get the upload file name of a content hash"""
+    return f'{digest}.mp4'
+
+
+def hash_file(path, digest=None, start=0, end=None):
+    """
+    Feed part of a file into a SHA-256 hash
+
+    Args:
+        path (str): Path to the file
+        digest (hashlib object, optional): Hash to continue; a new one if omitted
+        start (int): First byte to hash
+        end (int, optional): Byte after the last one to hash, default EOF
+
+    Returns:
+        hashlib object: The updated hash
+    """
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            size = COPY_BUFFER_SIZE if remaining is None else min(COPY_BUFFER_SIZE, remaining)
+            data = f.read(size)
+            if not data:
+                break
+            digest.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+    return digest
+
+
+class ContentStore:
+    """Upload directory where files are stored once under their content hash"""
+
+    def __init__(self, upload_dir, grace_period=DEFAULT_GRACE_PERIOD):
+        """
+        Initialize the store
+
+        Args:
+            upload_dir (str): Directory holding the uploaded files
+            grace_period (float): Seconds an unreferenced blob survives
+        """
+        self.upload_dir = upload_dir
+        self.grace_period = grace_period
+        self.index_path = os.path.join(upload_dir, '.blob_index.json')
+        self._lock = threading.Lock()
+        # Content hash of a replaced blob -> hash of the blob replacing it
+        self._aliases = {}
+        self._blobs = self._load()
+
+    def _load(self):
+        """Read the persisted reference index, ignoring a missing or corrupt file"""
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            blobs = index.get('blobs', {})
+            aliases = index.get('aliases', {})
+            self._aliases = aliases if isinstance(aliases, dict) else {}
+            return blobs if isinstance(blobs, dict) else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self):
+        """Atomically write the reference index to disk"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'blobs': self._blobs, 'aliases': self._aliases}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def path_for(self, digest):
+        """Get the path of the blob with a content hash"""
+        return os.path.join(self.upload_dir, blob_name(digest))
+
+    def resolve(self, digest):
+        """Follow replacements of a content hash to the current blob's hash"""
+        seen = set()
+        while digest in self._aliases and digest not in seen:
+            seen.add(digest)
+            digest = self._aliases[digest]
+        return digest
+
+    def canonical_path(self, path):
+        """
+        Map a configured /uploads/ path of a replaced blob to its replacement
+
+        Args:
+            path (str): Video path as stored in the configuration
+
+        Returns:
+            str: The path of the current blob, or the path unchanged
+        """
+        match = BLOB_NAME.match(os.path.basename(path or ''))
+        if not match or not path.startswith('/uploads/'):
+            return path
+        with self._lock:
+            return f'/uploads/{blob_name(self.resolve(match.group(1)))}'
+
+    def add_file(self, path, digest):
+        """
+        Move a fully written file into the store, dropping it if a copy exists
+
+        Args:
+            path (str): Temporary file in the upload directory
+            digest (str): Hex SHA-256 of the file
+
+        Returns:
+            tuple: (blob path, True if the content was already stored)
+        """
+        with self._lock:
+            # Content that was remuxed since is served by its replacement
+            digest = self.resolve(digest)
+            blob_path = self.path_for(digest)
+            duplicate = os.path.exists(blob_path)
+            if duplicate:
+                os.remove(path)
+            else:
+                os.replace(path, blob_path)
+            entry = self._blobs.setdefault(digest, {'refs': [], 'unreferenced_since': None})
+            entry['size'] = os.path.getsize(blob_path)
+            if not entry['refs']:
+                # A fresh upload is not in the config yet; start its grace period
+                entry['unreferenced_since'] = time.time()
+            self._save()
+        if duplicate:
+            logger.info(f'Upload deduplicated to existing blob {digest}')
+        return blob_path, duplicate
+
+    def add_stream(self, stream):
+        """
+        Store a stream, hashing it while it is written to disk
+
+        Args:
+            stream (file): Readable binary stream
+
+        Returns:
+            tuple: (blob path, True if the content was already stored)
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        tmp_path = os.path.join(self.upload_dir, f'.{uuid.uuid4()}.mp4.part')
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    data = stream.read(COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    f.write(data)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.add_file(tmp_path, digest.hexdigest())
+
+    def replace(self, digest, path, new_digest):
+        """
+        Store a rewritten version of a blob and record it as its replacement
+
+        The old blob stays until garbage collection, so clients in the middle
+        of streaming it are not switched to different bytes.
+
+        Args:
+            digest (str): Hex SHA-256 of the blob being replaced
+            path (str): Fully written file in the upload directory
+            new_digest (str): Hex SHA-256 of that file
+
+        Returns:
+            str: Path of the replacement blob
+        """
+        blob_path, _ = self.add_file(path, new_digest)
+        with self._lock:
+            if digest != new_digest:
+                self._aliases[digest] = new_digest
+                self._save()
+        return blob_path
+
+    def update_references(self, videos):
+        """
+        Rebuild the blob reference counts from configured videos
+
+        Args:
+            videos (list): Video entries with 'name' and 'path'
+
+        Returns:
+            dict: Reference count of every known blob
+        """
+        refs = {}
+        for slot, video in enumerate(videos):
+            match = BLOB_NAME.match(os.path.basename(video.get('path') or ''))
+            if match:
+                refs.setdefault(match.group(1), []).append(slot)
+
+        now = time.time()
+        with self._lock:
+            for digest in list(refs):
+                current = self.resolve(digest)
+                if current != digest:
+                    refs.setdefault(current, []).extend(refs.pop(digest))
+            for digest in refs:
+                if digest not in self._blobs and os.path.exists(self.path_for(digest)):
+                    self._blobs[digest] = {'size': os.path.getsize(self.path_for(digest))}
+            for digest, entry in self._blobs.items():
+                entry['refs'] = refs.get(digest, [])
+                if entry['refs']:
+                    entry['unreferenced_since'] = None
+                elif not entry.get('unreferenced_since'):
+                    entry['unreferenced_since'] = now
+            self._save()
+            return {digest: len(entry['refs']) for digest, entry in self._blobs.items()}
+
+    def collect_garbage(self, videos, on_remove=None):
+        """
+        Delete blobs no configured video has referenced for the grace period
+
+        Blob files missing from the index are adopted as unreferenced, so they
+        are collected one grace period after they are first seen.
+
+        Args:
+            videos (list): Video entries with 'name' and 'path'
+            on_remove (callable, optional): Called with each removed blob path
+                                            to clean up derived files
+
+        Returns:
+            list: Paths of the removed blobs
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                names = os.listdir(self.upload_dir)
+            except OSError:
+                names = []
+            for name in names:
+                match = BLOB_NAME.match(name)
+                if match and match.group(1) not in self._blobs:
+                    self._blobs[match.group(1)] = {
+                        'size': os.path.getsize(os.path.join(self.upload_dir, name)),
+                        'refs': [],
+                        'unreferenced_since': now
+                    }
+        self.update_references(videos)
+
+        now = time.time()
+        removed = []
+        with self._lock:
+            for digest, entry in list(self._blobs.items()):
+                since = entry.get('unreferenced_since')
+                if entry['refs'] or since is None or now - since < self.grace_period:
+                    continue
+                path = self.path_for(digest)
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f'Could not remove blob {digest}: {e}')
+                    continue
+                del self._blobs[digest]
+                removed.append(path)
+            if removed:
+                # Replacements that were collected too cannot be redirected to
+                gone = {digest for digest in self._aliases.values() if digest not in self._blobs}
+                self._aliases = {old: new for old, new in self._aliases.items() if new not in gone}
+                self._save()
+
+        for path in removed:
+            logger.info(f'Removed unreferenced upload {os.path.basename(path)}')
+            if on_remove:
+                on_remove(path)
+        return removed
+
+    def stats(self):
+        """
+        Get storage counters
+
+        Returns:
+            dict: Number of blobs, bytes stored and bytes saved by sharing
+                  blobs between config entries
+        """
+        with self._lock:
+            stored = sum(entry.get('size', 0) for entry in self._blobs.values())
+            shared = sum(entry.get('size', 0) * (len(entry.get('refs', [])) - 1)
+                         for entry in self._blobs.values() if len(entry.get('refs', [])) > 1)
+            return {'blobs': len(self._blobs), 'stored_bytes': stored, 'saved_bytes': shared}
@@ -1,10 +1,10 @@
-import os
-import json
+from config_store import get_config_store, default_config_path
 
 class VideoConfig:
     """Class to handle saving and loading video configurations"""
     
-    CONFIG_FILE = "video_config.json"
+    # Shared with the web front end so both read one source of truth
+    CONFIG_FILE = default_config_path()
     
     @staticmethod
     def save_videos(videos):
@@ -14,8 +14,7 @@ class VideoConfig:
         Args:
             videos (list): List of dictionaries containing video name and path
         """
-        with open(VideoConfig.CONFIG_FILE, 'w') as f:
-            json.dump(videos, f, indent=4)
+        get_config_store(VideoConfig.CONFIG_FILE).save(videos)
     
     @staticmethod
     def load_videos():
@@ -26,13 +25,9 @@ class VideoConfig:
             list: List of dictionaries containing video name and path
                   Returns empty list if file doesn't exist
         """
-        if not os.path.exists(VideoConfig.CONFIG_FILE):
-            # Return empty configurations for 12 videos
-            return [{"name": "", "path": ""} for _ in range(12)]
+        # Copies of the cached snapshot; an empty snapshot pads to 12 empty slots
+        videos = [dict(video) for video in get_config_store(VideoConfig.CONFIG_FILE).snapshot()]
         
-        with open(VideoConfig.CONFIG_FILE, 'r') as f:
-            videos = json.load(f)
-            
         # Ensure we always have exactly 12 videos
         if len(videos) < 12:
             videos.extend([{"name": "", "path": ""} for _ in range(12 - len(videos))])
@@ -2,21 +2,29 @@ import cv2
 import time
 import numpy as np
 
+from keyframe_index import KeyframeIndex, load_index_async, fast_seek
+from frame_cache import read_frame_cached
+from frame_batches import DEFAULT_BATCH_SIZE, clamp_roi, output_size, iter_batches, map_batches
+from proxies import get_proxy_store, select_rendition
+
 class VideoPlayer:
     """Class for video playback operations using OpenCV"""
     
-    def __init__(self, video_path=None):
+    def __init__(self, video_path=None, frame_cache=None):
         """
         Initialize the video player
         
         Args:
             video_path (str, optional): Path to the video file
+            frame_cache (FrameCache, optional): Cache used by get_frame_at
         """
         self.video_path = video_path
+        self.frame_cache = frame_cache
         self.cap = None
         self.frame_count = 0
         self.fps = 0
         self.current_frame = 0
+        self.keyframe_index = None
         
         if video_path:
             self.load_video(video_path)
@@ -46,8 +54,17 @@ class VideoPlayer:
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.current_frame = 0
         
+        # Build (or load) the keyframe index in the background for fast seeks
+        self.keyframe_index = None
+        load_index_async(video_path, lambda index: self._set_keyframe_index(video_path, index))
+        
         return True
     
+    def _set_keyframe_index(self, video_path, index):
+        """Store a keyframe index if it belongs to the loaded video"""
+        if video_path == self.video_path:
+            self.keyframe_index = index
+    
     def get_frame(self):
         """
         Get the current frame
@@ -66,6 +83,33 @@ class VideoPlayer:
         else:
             return None
     
+    def get_frame_at(self, frame_number):
+        """
+        Get a frame by index, serving revisited frames from the frame cache
+        
+        With a frame cache the returned frame is at the cache's resolution and
+        must be copied if it is kept, as its memory is reused on eviction.
+        
+        Args:
+            frame_number (int): The frame number to get
+            
+        Returns:
+            numpy.ndarray or None: The frame, or None if no frame or error
+        """
+        if not self.cap or not self.cap.isOpened() or not 0 <= frame_number < self.frame_count:
+            return None
+        
+        if self.frame_cache is None:
+            if not self.seek(frame_number):
+                return None
+            return self.get_frame()
+        
+        frame, self.current_frame = read_frame_cached(
+            self.cap, self.current_frame, frame_number, self.video_path,
+            self.frame_cache, self.keyframe_index
+        )
+        return frame
+    
     def seek(self, frame_number):
         """
         Seek to a specific frame
@@ -79,10 +123,109 @@ class VideoPlayer:
         if not self.cap or frame_number >= self.frame_count:
             return False
         
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        # Decode forward within the current GOP, otherwise jump to the keyframe
+        fast_seek(self.cap, self.current_frame, frame_number, self.keyframe_index)
         self.current_frame = frame_number
         return True
     
+    def _batch_plan(self, start, stop, stride, roi, scale, use_proxies):
+        """
+        Work out which file to decode and how to crop and scale its frames
+
+        Frames are decoded from the smallest proxy rendition that still has
+        the detail of the scaled region, with the region mapped into the
+        proxy's pixels; the output size is the same whichever file is used.
+
+        Returns:
+            tuple: (decode path, stop, roi, output size, keyframe index)
+        """
+        if stride < 1 or start < 0:
+            raise ValueError('start must be >= 0 and stride >= 1')
+        if not 0 < scale <= 1:
+            raise ValueError('scale must be in (0, 1]')
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        roi = clamp_roi(roi, width, height)
+        size = output_size(roi, scale)
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+
+        decode_path = self.video_path
+        index = self.keyframe_index
+        if use_proxies and scale < 1:
+            store = get_proxy_store()
+            manifest = store.get(self.video_path)
+            # Height a rendition needs so that the scaled region is not upscaled
+            rendition = select_rendition(manifest, size[1] * height / roi[3])
+            if rendition is not None:
+                decode_path = store.rendition_path(self.video_path, rendition)
+                ratio_x = rendition['width'] / manifest['source_width']
+                ratio_y = rendition['height'] / manifest['source_height']
+                roi = clamp_roi((round(roi[0] * ratio_x), round(roi[1] * ratio_y),
+                                 round(roi[2] * ratio_x), round(roi[3] * ratio_y)),
+                                rendition['width'], rendition['height'])
+                index = None
+        if index is None:
+            index = KeyframeIndex.load_or_build(decode_path)
+        return decode_path, stop, roi, size, index
+
+    def iter_frames(self, start=0, stop=None, stride=1, batch_size=DEFAULT_BATCH_SIZE,
+                    roi=None, scale=1.0, use_proxies=True):
+        """
+        Stream frames in stacked batches for analysis
+
+        Decoding uses its own capture, so playback position is unaffected.
+        Skipped frames are never converted, and with scale < 1 a proxy
+        rendition is decoded instead of the original when one is available.
+
+        Args:
+            start (int): First frame
+            stop (int, optional): Frame after the last one; defaults to the end
+            stride (int): Distance between returned frames
+            batch_size (int): Frames per batch
+            roi (tuple, optional): (x, y, width, height) region in source pixels
+            scale (float): Scale factor applied to the region, at most 1
+            use_proxies (bool): Decode from proxy renditions where possible
+
+        Yields:
+            tuple: (frame numbers as an int64 array, uint8 BGR array of shape
+                   (n, height, width, 3))
+        """
+        if not self.cap or not self.cap.isOpened():
+            return
+        decode_path, stop, roi, size, index = self._batch_plan(start, stop, stride, roi, scale, use_proxies)
+        yield from iter_batches(decode_path, start, stop, stride, batch_size, roi, size, index)
+
+    def map_frames(self, func, start=0, stop=None, stride=1, batch_size=DEFAULT_BATCH_SIZE,
+                   roi=None, scale=1.0, use_proxies=True, workers=None):
+        """
+        Apply a function to batches of frames decoded on all cores
+
+        The video is sharded at keyframes across worker processes and the
+        results are returned in frame order. func receives the same
+        (frame numbers, batch) pairs iter_frames yields and must be a
+        module-level function; returning small results instead of frames
+        keeps the transfer between processes cheap.
+
+        Args:
+            func (callable or None): Called in the workers for each batch;
+                                     None returns the batches themselves
+            start (int): First frame
+            stop (int, optional): Frame after the last one; defaults to the end
+            stride (int): Distance between returned frames
+            batch_size (int): Frames per batch
+            roi (tuple, optional): (x, y, width, height) region in source pixels
+            scale (float): Scale factor applied to the region, at most 1
+            use_proxies (bool): Decode from proxy renditions where possible
+            workers (int, optional): Worker processes; defaults to the CPU count
+
+        Yields:
+            The result of func for each batch, in frame order
+        """
+        if not self.cap or not self.cap.isOpened():
+            return
+        decode_path, stop, roi, size, index = self._batch_plan(start, stop, stride, roi, scale, use_proxies)
+        yield from map_batches(decode_path, func, start, stop, stride, batch_size, roi, size, index, workers)
+
     def get_total_duration(self):
         """
         Get the total duration of the video in seconds
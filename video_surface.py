@@ -0,0 +1,122 @@
+import time
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter, QColor
+
+from display_buffer import DisplayBuffer
+from frame_pipeline import convert_seconds
+
+
+class VideoSurface(QWidget):
+    """Widget that paints BGR frames directly instead of swapping label pixmaps"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Every pixel is painted by paintEvent, so Qt need not clear first
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setAttribute(Qt.WA_NoSystemBackground)
+        self.text = ""
+        self.image = None
+        self.frame = None
+        self.source_size = None
+        self.target_rect = QRect()
+        self.display_buffer = DisplayBuffer()
+        self.frames = 0
+        self.scaled_frames = 0
+        self.paint_seconds = 0.0
+        self.saved_bytes = 0
+
+    def setText(self, text):
+        """Show a message instead of a frame"""
+        self.text = text
+        self.image = None
+        self.frame = None
+        self.source_size = None
+        self.update()
+
+    def _fit(self, width, height):
+        """Compute the centred rectangle a source of this size is drawn into"""
+        scale = min(self.width() / width, self.height() / height)
+        new_w = max(int(width * scale), 1)
+        new_h = max(int(height * scale), 1)
+        return QRect((self.width() - new_w) // 2, (self.height() - new_h) // 2, new_w, new_h)
+
+    def set_frame(self, frame):
+        """
+        Show a BGR frame
+
+        Frames larger than the widget are downscaled with OpenCV into a reused
+        buffer; others are wrapped without copying and scaled by the painter.
+        The frame must stay unchanged until it has been painted.
+
+        Args:
+            frame (numpy.ndarray): BGR frame with contiguous rows
+        """
+        height, width = frame.shape[:2]
+        if (width, height) != self.source_size:
+            self.source_size = (width, height)
+            self.target_rect = self._fit(width, height)
+            self.display_buffer.resize(self.width(), self.height())
+            # Repaint the borders once; later frames only touch the video area
+            self.update()
+
+        if width > self.target_rect.width() or height > self.target_rect.height():
+            start = time.perf_counter()
+            self.image = self.display_buffer.render(frame)
+            self.frame = None
+            self.scaled_frames += 1
+            elapsed = time.perf_counter() - start
+            self.paint_seconds += elapsed
+            convert_seconds.observe(elapsed)
+        else:
+            self.frame = frame
+            self.image = QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+
+        self.text = ""
+        self.frames += 1
+        # The former path allocated an RGB copy, a resized copy and a pixmap
+        self.saved_bytes += frame.nbytes + 2 * self.target_rect.width() * self.target_rect.height() * 3
+        self.update(self.target_rect)
+
+    def resizeEvent(self, event):
+        """Refit the video area to the new widget size"""
+        self.display_buffer.resize(event.size().width(), event.size().height())
+        if self.source_size:
+            self.target_rect = self._fit(*self.source_size)
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        """Draw the current frame, letting the painter scale it without smoothing"""
+        start = time.perf_counter()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, False)
+        if self.image is None:
+            painter.fillRect(self.rect(), Qt.black)
+            if self.text:
+                painter.setPen(QColor(Qt.white))
+                painter.setFont(self.font())
+                painter.drawText(self.rect(), Qt.AlignCenter, self.text)
+        else:
+            if not self.target_rect.contains(event.rect()):
+                painter.fillRect(event.rect(), Qt.black)
+            painter.drawImage(self.target_rect, self.image)
+        painter.end()
+        self.paint_seconds += time.perf_counter() - start
+
+    def stats(self):
+        """
+        Get display timings
+
+        Returns:
+            dict: Shown frames, frames downscaled with OpenCV, buffer
+                  reallocations, average scale and paint time per frame in
+                  milliseconds and bytes of allocation avoided per frame
+        """
+        frames = max(self.frames, 1)
+        return {
+            'frames': self.frames,
+            'scaled_frames': self.scaled_frames,
+            'rebuilds': self.display_buffer.rebuilds,
+            'display_ms': self.paint_seconds * 1000 / frames,
+            'saved_bytes_per_frame': self.saved_bytes // frames
+        }
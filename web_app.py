@@ -1,126 +1,176 @@
-from flask import Flask, render_template, send_from_directory, jsonify, request, Response
+from flask import Flask, render_template, send_from_directory, send_file, jsonify, request, Response, url_for, redirect, g
 import os
 import sys
 import json
-import uuid
+import math
+import time
+import shutil
+import threading
 import logging
-import re
 import mimetypes
-from logging.handlers import RotatingFileHandler
-from werkzeug.utils import secure_filename
-
-# Configure root logger to show all messages in console
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
-logger = logging.getLogger(__name__)
+from werkzeug.utils import secure_filename, safe_join
 
-def ensure_dir(file_path):
-    """Make sure the directory for a file exists"""
-    directory = os.path.dirname(file_path)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory)
+import metrics
+from log_setup import setup_logging
+from range_stream import make_range_response, DEFAULT_CHUNK_SIZE
+from http_cache import (ETagIndex, cache_control_for, is_not_modified, not_modified_headers,
+                        IMMUTABLE_CACHE_CONTROL)
+from playback_stats import PlaybackStatsStore
+from config_store import get_config_store, get_data_path, resolve_video_path
+from thumbnails import get_preview_store
+from chunked_upload import ChunkedUploadManager, UploadError, UploadTooLarge, DEFAULT_MAX_UPLOAD_SIZE
+from upload_store import ContentStore, BLOB_NAME, blob_name
+from keyframe_index import index_path_for
+from media_probe import get_media_index
+from faststart import get_faststart_queue
+from proxies import get_proxy_store
+from motion import get_motion_store, heat_strip
+from segmenter import get_stream_index, build_segment, build_playlist
 
-def setup_file_logging(log_path):
-    """Set up file logging with proper directory creation"""
-    try:
-        ensure_dir(log_path)
-        handler = RotatingFileHandler(log_path, maxBytes=10240, backupCount=3)
-        handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        ))
-        handler.setLevel(logging.DEBUG)
-        logging.getLogger().addHandler(handler)
-        logger.info(f"File logging setup successfully at: {log_path}")
-    except Exception as e:
-        logger.error(f"Failed to setup file logging: {e}")
+if getattr(sys, 'frozen', False):
+    # Running in PyInstaller bundle
+    base_dir = sys._MEIPASS
+    log_dir = os.path.dirname(sys.executable)
+else:
+    # Running in normal Python environment
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    log_dir = base_dir
+
+logger = logging.getLogger(__name__)
 
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
-    try:
-        if getattr(sys, 'frozen', False):
-            # Running in PyInstaller bundle
-            base_path = sys._MEIPASS
-            log_path = os.path.dirname(sys.executable)
-            print(f"Running from frozen application. Base path: {base_path}")
-        else:
-            # Running in normal Python environment
-            base_path = os.path.abspath(os.path.dirname(__file__))
-            log_path = base_path
-            print(f"Running from Python environment. Base path: {base_path}")
-        
-        # Set up logging
-        log_file = os.path.join(log_path, 'flask_app.log')
-        setup_file_logging(log_file)
-        
-        full_path = os.path.join(base_path, relative_path)
-        print(f"Resource path for {relative_path}: {full_path}")
-        return full_path
-    except Exception as e:
-        print(f"Error getting resource path: {e}")
-        logger.error(f"Error getting resource path: {e}")
-        return relative_path
+    return os.path.join(base_dir, relative_path)
 
-print("Starting Flask application setup...")
 # Initialize Flask with correct template and static folders
 template_dir = get_resource_path('templates')
 static_dir = get_resource_path('static')
 
-print(f"Template directory: {template_dir}")
-print(f"Static directory: {static_dir}")
-
 app = Flask(__name__,
            template_folder=template_dir,
            static_folder=static_dir)
 
+# Size of the slices streamed for video byte-range responses
+app.config['RANGE_CHUNK_SIZE'] = int(os.environ.get('RANGE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+
+# Largest chunked upload accepted, in bytes; its file is allocated up front
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE))
+
+# Uploads with the moov box at the end are remuxed in the background so the
+# browser can start playing without fetching the tail of the file
+app.config['FASTSTART_UPLOADS'] = os.environ.get('FASTSTART_UPLOADS', '1') != '0'
+
+# Stores are created by init_app() rather than at import, because spawned
+# frame analysis workers re-import the script that started the server
+etag_index = None
+stats_store = None
+preview_store = None
+proxy_store = None
+motion_store = None
+chunked_uploads = None
+media_index = None
+content_store = None
+faststart_queue = None
+config_store = None
+
+# Exported at /metrics; collection is turned off with METRICS=0
+request_duration = metrics.Histogram(
+    'http_request_duration_seconds', 'Time until the response headers are ready, per route',
+    labels=('route', 'method')
+)
+requests_total = metrics.Counter(
+    'http_requests_total', 'Requests answered, per route and status', labels=('route', 'method', 'status')
+)
+upload_bytes_served = metrics.Counter('upload_bytes_served_total', 'Bytes of uploaded videos sent, counted as each response starts')
+active_range_streams = metrics.Gauge('upload_range_streams_active', 'Upload responses currently being sent')
+upload_bytes_received = metrics.Counter(
+    'video_upload_bytes_received_total', 'Bytes of uploaded videos received', labels=('mode',)
+)
+upload_throughput = metrics.Histogram(
+    'video_upload_throughput_bytes_per_second', 'Receive and store rate of whole-file uploads',
+    buckets=(1e6, 5e6, 10e6, 25e6, 50e6, 100e6, 250e6, 500e6, 1e9)
+)
+
+def config_slots():
+    """Get the saved configuration padded to the 12 slots of the config page"""
+    videos = list(config_store.snapshot())[:12]
+    return videos + [{'name': '', 'path': ''} for _ in range(12 - len(videos))]
+
+def load_configured_videos():
+    """Load the configured videos that have both a name and a path"""
+    # Served from the in-memory snapshot; the file is only re-read when it changes
+    videos = config_store.snapshot()
+    
+    # Filter out empty entries
+    return [video for video in videos if video.get('name') and video.get('path')]
+
+def format_duration(seconds):
+    """Format seconds as M:SS, or H:MM:SS for long videos"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+def with_metadata(video):
+    """
+    Add the probed duration and status to a configured video
+    
+    Videos that have not been probed yet are queued for probing.
+    
+    Returns:
+        dict: The video with 'status' ('ok', 'broken', 'pending' or
+              'unknown' for remote URLs) and 'duration' (text or None)
+    """
+    video = dict(video)
+    video['path'] = content_store.canonical_path(video['path'])
+    video_path = resolve_video_path(video['path'])
+    video['status'] = 'unknown'
+    video['duration'] = None
+    if video['path'].startswith(('http://', 'https://')) or not os.path.isfile(video_path):
+        return video
+    
+    info = media_index.get(video_path)
+    if info is None and media_index.failure(video_path) is not None:
+        video['status'] = 'broken'
+    elif info is None:
+        media_index.ensure(video_path)
+        video['status'] = 'pending'
+    elif not info['decodable']:
+        video['status'] = 'broken'
+    else:
+        video['status'] = 'ok'
+        video['duration'] = format_duration(info['duration'])
+    return video
+
 @app.route('/')
 def index():
-    app.logger.info('Accessing root route')
+    app.logger.debug('Accessing root route')
     try:
-        template_list = os.listdir(template_dir)
-        app.logger.info(f'Available templates: {template_list}')
-        return render_template('config.html', videos=[{'name': '', 'path': ''} for _ in range(12)])
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug(f'Available templates: {os.listdir(template_dir)}')
+        return render_template('config.html', videos=config_slots())
     except Exception as e:
         app.logger.error(f'Error rendering template: {e}')
         return f'Error: {str(e)}', 500
 
 @app.route('/config')
 def config():
-    app.logger.info('Accessing config route')
+    app.logger.debug('Accessing config route')
     try:
-        template_list = os.listdir(template_dir)
-        app.logger.info(f'Available templates: {template_list}')
-        return render_template('config.html', videos=[{'name': '', 'path': ''} for _ in range(12)])
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug(f'Available templates: {os.listdir(template_dir)}')
+        return render_template('config.html', videos=config_slots())
     except Exception as e:
         app.logger.error(f'Error rendering template: {e}')
         return f'Error: {str(e)}', 500
 
 @app.route('/playback')
 def playback():
-    app.logger.info('Accessing playback route')
+    app.logger.debug('Accessing playback route')
     try:
-        # Load video configurations from video_config.json
-        videos = []
-        config_file = os.path.join(static_dir, 'video_config.json')
+        # The path in config is already in the correct format (/uploads/...)
+        valid_videos = [with_metadata(video) for video in load_configured_videos()]
         
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r') as f:
-                    videos = json.load(f)
-                app.logger.info(f'Loaded {len(videos)} videos from config')
-            except Exception as e:
-                app.logger.error(f'Error loading video config: {e}')
-        
-        # Filter out empty entries
-        valid_videos = []
-        for video in videos:
-            if video.get('name') and video.get('path'):
-                # The path in config is already in the correct format (/uploads/...)
-                valid_videos.append(video)
-        
-        app.logger.info(f'Found {len(valid_videos)} valid videos')
+        app.logger.debug(f'Found {len(valid_videos)} valid videos')
         return render_template('playback.html', videos=valid_videos)
     except Exception as e:
         app.logger.error(f'Error rendering template: {e}')
@@ -128,13 +178,114 @@ def playback():
 
 @app.route('/stats')
 def stats():
-    app.logger.info('Accessing stats route')
+    app.logger.debug('Accessing stats route')
     try:
         return render_template('stats.html')
     except Exception as e:
         app.logger.error(f'Error rendering template: {e}')
         return f'Error: {str(e)}', 500
 
+def tracked_video_name(video):
+    """
+    Get the display name of a video whose playback may be recorded
+    
+    Only configured videos and existing uploads are tracked, so clients
+    cannot add arbitrary entries to the statistics.
+    
+    Args:
+        video (str): Video path as sent by the player
+    
+    Returns:
+        str or None: The configured name, the upload's file name, or None
+                     if the path is neither
+    """
+    for configured in load_configured_videos():
+        if configured['path'] == video:
+            return configured['name']
+    if video.startswith('/uploads/') and find_upload(video[len('/uploads/'):]):
+        return os.path.basename(video)
+    return None
+
+def playback_number(value, field):
+    """
+    Validate a number reported by the player
+
+    Args:
+        value: Value from the event payload, or None
+        field (str): Name of the field, for the error message
+
+    Returns:
+        float or None: The value, or None if it was not sent
+
+    Raises:
+        ValueError: If the value is not a finite, non-negative number
+    """
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f'{field} must be a finite, non-negative number')
+    return number
+
+@app.route('/api/videos/events', methods=['POST'])
+def record_playback_event():
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        video = data.get('video')
+        session_id = data.get('session')
+        event = data.get('event')
+        if not video or not session_id or not event:
+            return jsonify({'error': 'video, session and event are required'}), 400
+        name = tracked_video_name(str(video))
+        if name is None:
+            return jsonify({'error': 'Unknown video'}), 404
+        
+        position = playback_number(data.get('position'), 'position')
+        speed = playback_number(data.get('speed'), 'speed')
+        info = media_index.get(resolve_video_path(video))
+        stats_store.record(
+            video,
+            str(session_id),
+            event,
+            position=position,
+            speed=speed or None,
+            name=name,
+            duration=info['duration'] if info else None
+        )
+        return jsonify({'success': True}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f'Error recording playback event: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/stats')
+def video_stats():
+    try:
+        stats = stats_store.get_stats()
+        
+        # Configured videos first, in slot order, then anything else with history
+        result = []
+        for video in load_configured_videos():
+            entry = stats.pop(video['path'], None) or {
+                'play_count': 0,
+                'last_played': None,
+                'total_duration': 0,
+                'avg_speed': None
+            }
+            entry['name'] = video['name']
+            result.append(entry)
+        # Entries recorded before events were validated may name anything
+        result.extend(entry for video, entry in stats.items() if tracked_video_name(video))
+        
+        return jsonify(result), 200
+    except Exception as e:
+        app.logger.error(f'Error loading video stats: {e}')
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
@@ -148,124 +299,460 @@ def upload_file():
         if not file.filename.endswith('.mp4'):
             return jsonify({'error': 'Only MP4 files are allowed'}), 400
         
-        # Generate a unique filename
-        filename = str(uuid.uuid4()) + '.mp4'
-        upload_folder = os.path.join(static_dir, 'uploads')
+        # Store the file under the hash computed while writing it
+        started = time.perf_counter()
+        file_path, duplicate = content_store.add_stream(file.stream)
+        if metrics.enabled():
+            size = os.path.getsize(file_path)
+            upload_bytes_received.labels('form').inc(size)
+            upload_throughput.observe(size / max(time.perf_counter() - started, 1e-6))
+        register_upload(file_path)
         
-        # Ensure upload directory exists
-        os.makedirs(upload_folder, exist_ok=True)
+        # Return the relative path that can be used in video src
+        relative_path = f'/uploads/{os.path.basename(file_path)}'
+        return jsonify({'path': relative_path, 'duplicate': duplicate}), 200
         
-        # Save the file
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
+    except Exception as e:
+        app.logger.error(f'Upload error: {e}')
+        return jsonify({'error': str(e)}), 500
+
+def register_upload(file_path):
+    """Index a newly stored upload and start generating its previews"""
+    # The name is the content hash, which doubles as a strong validator
+    etag_index.put(file_path, etag=os.path.splitext(os.path.basename(file_path))[0][:32])
+    if app.config['FASTSTART_UPLOADS'] and faststart_queue.ensure(file_path, publish_faststart):
+        # Probing and previews are done for the remuxed file instead
+        return
+    media_index.ensure(file_path)
+    preview_store.ensure(file_path)
+    proxy_store.ensure(file_path)
+    motion_store.ensure(file_path)
+
+def publish_faststart(video_path, remuxed_path, digest):
+    """
+    Swap a remuxed upload in for the original
+    
+    The remuxed file becomes a new blob and configured videos are pointed at
+    it; the original is collected once nothing references it.
+    
+    Returns:
+        str: Path of the new blob
+    """
+    old_digest = BLOB_NAME.match(os.path.basename(video_path)).group(1)
+    new_path = content_store.replace(old_digest, remuxed_path, digest)
+    old_url = f'/uploads/{os.path.basename(video_path)}'
+    videos = [dict(video) for video in config_store.snapshot()]
+    if any(video.get('path') == old_url for video in videos):
+        for video in videos:
+            if video.get('path') == old_url:
+                video['path'] = f'/uploads/{blob_name(digest)}'
+        config_store.save(videos)
+    register_upload(new_path)
+    return new_path
+
+def remove_derived_files(file_path):
+    """Delete the previews, proxies, motion timeline and keyframe index of a removed upload"""
+    shutil.rmtree(preview_store.directory_for(file_path), ignore_errors=True)
+    shutil.rmtree(proxy_store.directory_for(file_path), ignore_errors=True)
+    media_index.remove(file_path)
+    for path in (index_path_for(file_path), motion_store.path_for(file_path)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def collect_upload_garbage(videos):
+    """Delete blobs dropped from the config and abandoned chunked uploads"""
+    content_store.collect_garbage(videos, on_remove=remove_derived_files)
+    chunked_uploads.expire_sessions()
+
+@app.route('/api/uploads', methods=['POST'])
+def create_chunked_upload():
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        filename = data.get('filename', '')
+        size = data.get('size')
+        if not filename.endswith('.mp4'):
+            return jsonify({'error': 'Only MP4 files are allowed'}), 400
+        if not isinstance(size, int):
+            return jsonify({'error': 'size is required'}), 400
         
-        # Return the relative path that can be used in video src
-        relative_path = f'/uploads/{filename}'
-        return jsonify({'path': relative_path}), 200
+        status = chunked_uploads.create(filename, size)
+        app.logger.info(f'Started chunked upload {status["upload_id"]} of {filename} ({size} bytes)')
+        return jsonify(status), 201
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f'Upload error: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    try:
+        return jsonify(chunked_uploads.status(upload_id)), 200
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    try:
+        offset = request.args.get('offset', type=int)
+        length = request.content_length
+        checksum = request.headers.get('X-Chunk-CRC32')
+        if offset is None:
+            return jsonify({'error': 'offset is required'}), 400
+        if length is None:
+            return jsonify({'error': 'Content-Length is required'}), 411
+        if not checksum:
+            return jsonify({'error': 'X-Chunk-CRC32 is required'}), 400
         
+        # The body is streamed straight into the file, never spooled
+        status = chunked_uploads.write_chunk(
+            upload_id, offset, length, request.stream, int(checksum, 16)
+        )
+        upload_bytes_received.labels('chunked').inc(length)
+        return jsonify(status), 200
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'X-Chunk-CRC32 must be hexadecimal'}), 400
+    except Exception as e:
+        app.logger.error(f'Chunk upload error: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    try:
+        data_path, digest = chunked_uploads.finalize(upload_id)
+        file_path, duplicate = content_store.add_file(data_path, digest)
+        register_upload(file_path)
+        app.logger.info(f'Finished chunked upload {upload_id}')
+        return jsonify({'path': f'/uploads/{os.path.basename(file_path)}', 'duplicate': duplicate}), 200
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         app.logger.error(f'Upload error: {e}')
         return jsonify({'error': str(e)}), 500
 
+def find_upload(filename):
+    """Resolve an upload name to its file path, or None if there is no such upload"""
+    video_path = safe_join(os.path.join(static_dir, 'uploads'), filename)
+    if (video_path is None or os.path.basename(video_path).startswith('.')
+            or not os.path.isfile(video_path)):
+        return None
+    return video_path
+
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
     try:
-        upload_folder = os.path.join(static_dir, 'uploads')
-        video_path = os.path.join(upload_folder, filename)
-        
-        app.logger.info(f'Attempting to serve video: {filename}')
-        app.logger.info(f'Full path: {video_path}')
+        # Called for every range a player fetches, so details are only
+        # formatted when debug logging is on
+        debug = app.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            app.logger.debug(f'Attempting to serve video: {filename}')
         
-        # Check if file exists
-        if not os.path.isfile(video_path):
-            app.logger.error(f'Video file not found: {video_path}')
+        # Check if file exists (dotfiles hold server-side indexes)
+        video_path = find_upload(filename)
+        if video_path is None:
+            # The blob may have been replaced by a faststart copy and collected
+            canonical = content_store.canonical_path(f'/uploads/{filename}')
+            if canonical != f'/uploads/{filename}' and find_upload(os.path.basename(canonical)):
+                return redirect(canonical, code=301)
+            app.logger.error(f'Video file not found: {filename}')
             return 'Video not found', 404
-            
-        # Get file size
-        file_size = os.path.getsize(video_path)
-        app.logger.info(f'Video file size: {file_size} bytes')
         
-        # Handle range requests
+        # Answer revalidation requests without touching the file contents
+        stat = os.stat(video_path)
+        etag, weak = etag_index.get(video_path, stat)
+        cache_control = cache_control_for(filename)
+        if is_not_modified(request, etag, stat.st_mtime):
+            headers = not_modified_headers(etag, stat.st_mtime, cache_control, weak)
+            headers['Access-Control-Allow-Origin'] = '*'
+            return Response(status=304, headers=headers)
+        
         range_header = request.headers.get('Range')
+        if range_header and debug:
+            app.logger.debug(f'Range request: {range_header}')
         
         # Set standard headers
         headers = {
-            'Accept-Ranges': 'bytes',
-            'Content-Type': 'video/mp4',
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, OPTIONS',
-            'Cache-Control': 'no-cache, no-store, must-revalidate',
-            'Pragma': 'no-cache',
-            'Expires': '0'
+            'Cache-Control': cache_control
         }
         
-        if range_header:
-            app.logger.info(f'Range request: {range_header}')
-            byte1, byte2 = 0, None
-            match = re.search(r'(\d+)-(\d*)', range_header)
-            groups = match.groups()
-            
-            if groups[0]:
-                byte1 = int(groups[0])
-            if groups[1]:
-                byte2 = int(groups[1])
-            
-            if byte2 is None:
-                byte2 = file_size - 1
-            length = byte2 - byte1 + 1
-            
-            with open(video_path, 'rb') as f:
-                f.seek(byte1)
-                data = f.read(length)
-            
-            headers.update({
-                'Content-Range': f'bytes {byte1}-{byte2}/{file_size}',
-                'Content-Length': str(length)
-            })
-            
-            return Response(
-                data,
-                206,
-                mimetype='video/mp4',
-                direct_passthrough=True,
-                headers=headers
-            )
+        # Stream the requested byte ranges without buffering them in memory
+        response = make_range_response(
+            request,
+            video_path,
+            'video/mp4',
+            headers=headers,
+            etag=etag,
+            weak_etag=weak,
+            chunk_size=app.config['RANGE_CHUNK_SIZE'],
+            on_close=active_range_streams.dec if metrics.enabled() else None
+        )
+        if metrics.enabled():
+            # Counted from the headers rather than by wrapping the body, which
+            # would keep the server from sending a wsgi.file_wrapper body itself
+            active_range_streams.inc()
+            if request.method != 'HEAD':
+                upload_bytes_served.inc(response.content_length or 0)
+        return response
         
-        # If no range header, serve entire file
-        app.logger.info('Serving complete file')
+    except Exception as e:
+        app.logger.error(f'Error serving upload: {str(e)}')
+        return f'Error: {str(e)}', 500
+
+def generated_result(store, filename):
+    """
+    Get a background store's result for an upload, scheduling it if missing
+
+    Missing results are built lazily, for uploads that predate the stage
+    that builds them after upload.
+
+    Args:
+        store: Store with get(video_path), failure(video_path) and ensure(video_path)
+        filename (str): Upload name
+
+    Returns:
+        tuple: (result, None), or (None, error response) with a 404 for an
+               unknown upload, a 422 if the result could not be built for
+               this version of the file, or a 202 while it is being built
+    """
+    video_path = find_upload(filename)
+    if video_path is None:
+        return None, (jsonify({'error': 'Video not found'}), 404)
+    result = store.get(video_path)
+    if result is None:
+        error = store.failure(video_path)
+        if error is not None:
+            return None, (jsonify({'status': 'failed', 'error': error}), 422)
+        store.ensure(video_path)
+        return None, (jsonify({'status': 'pending'}), 202)
+    return result, None
+
+@app.route('/api/videos/<filename>/metadata')
+def video_metadata(filename):
+    try:
+        info, response = generated_result(media_index, filename)
+        if response is not None:
+            return response
+        return jsonify(info), 200
+    except Exception as e:
+        app.logger.error(f'Error loading metadata: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/previews')
+def preview_manifest(filename):
+    try:
+        manifest, response = generated_result(preview_store, filename)
+        if response is not None:
+            return response
         
-        # Read file in chunks
-        def generate():
-            with open(video_path, 'rb') as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
+        manifest['sheet_urls'] = [
+            url_for('preview_sheet', filename=filename, sheet=sheet)
+            for sheet in range(manifest['sheets'])
+        ]
+        return jsonify(manifest), 200
+    except Exception as e:
+        app.logger.error(f'Error loading previews: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/previews/<int:sheet>.jpg')
+def preview_sheet(filename, sheet):
+    video_path = find_upload(filename)
+    if video_path is None:
+        return 'Video not found', 404
+    sheet_path = preview_store.sheet_path(video_path, sheet)
+    if not os.path.isfile(sheet_path):
+        return 'Preview not found', 404
+    # Sheets of UUID uploads never change
+    max_age = 31536000 if cache_control_for(filename) == IMMUTABLE_CACHE_CONTROL else 0
+    return send_file(sheet_path, mimetype='image/jpeg', max_age=max_age)
+
+@app.route('/api/videos/<filename>/renditions')
+def video_renditions(filename):
+    try:
+        manifest, response = generated_result(proxy_store, filename)
+        if response is not None:
+            return response
         
-        headers['Content-Length'] = str(file_size)
+        # Only renditions the browser can decode are offered
+        renditions = [
+            {
+                'height': rendition['height'],
+                'width': rendition['width'],
+                'url': url_for('proxy_file', filename=filename, height=rendition['height'])
+            }
+            for rendition in manifest['renditions'] if rendition['browser']
+        ]
+        return jsonify({
+            'source_width': manifest['source_width'],
+            'source_height': manifest['source_height'],
+            'renditions': renditions
+        }), 200
+    except Exception as e:
+        app.logger.error(f'Error loading renditions: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/motion')
+def video_motion(filename):
+    try:
+        timeline, response = generated_result(motion_store, filename)
+        if response is not None:
+            return response
         
-        return Response(
-            generate(),
-            200,
-            mimetype='video/mp4',
-            direct_passthrough=True,
-            headers=headers
-        )
+        # The heat strip is binned here so the full signal is not sent
+        bins = min(max(request.args.get('bins', 400, type=int), 1), 4000)
+        return jsonify({
+            'duration': timeline['frame_count'] / timeline['fps'],
+            'segments': [
+                {'start': segment['start_time'], 'end': segment['end_time']}
+                for segment in timeline['segments']
+            ],
+            'heat': heat_strip(timeline, bins)
+        }), 200
+    except Exception as e:
+        app.logger.error(f'Error loading motion timeline: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/proxies/<int:height>.mp4')
+def proxy_file(filename, height):
+    try:
+        video_path = find_upload(filename)
+        manifest = proxy_store.get(video_path) if video_path else None
+        rendition = next((r for r in (manifest or {}).get('renditions', []) if r['height'] == height), None)
+        if rendition is None:
+            return 'Proxy not found', 404
         
+        # Proxies of immutable uploads never change either
+        headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Cache-Control': cache_control_for(filename)
+        }
+        return make_range_response(
+            request,
+            proxy_store.rendition_path(video_path, rendition),
+            'video/mp4',
+            headers=headers,
+            chunk_size=app.config['RANGE_CHUNK_SIZE']
+        )
     except Exception as e:
-        app.logger.error(f'Error serving upload: {str(e)}')
+        app.logger.error(f'Error serving proxy: {e}')
         return f'Error: {str(e)}', 500
 
+def send_stream_part(filename, part, mimetype, build):
+    """
+    Serve one part of an upload's segmented stream
+    
+    Parts are cut from the upload on request and carry an ETag derived from
+    the upload's, so they are cached and revalidated like the file itself.
+    
+    Args:
+        filename (str): Upload name
+        part (str): Name of the part, used in its ETag
+        mimetype (str): Content type of the part
+        build (callable): Called with (video path, segment plan) to get the body
+    
+    Returns:
+        flask.Response: The part, 304, 404 or 415
+    """
+    video_path = find_upload(filename)
+    if video_path is None:
+        return jsonify({'error': 'Video not found'}), 404
+    
+    stat = os.stat(video_path)
+    etag, weak = etag_index.get(video_path, stat)
+    etag = f'{etag}-{part}'
+    cache_control = cache_control_for(filename)
+    headers = not_modified_headers(etag, stat.st_mtime, cache_control, weak)
+    headers['Access-Control-Allow-Origin'] = '*'
+    if is_not_modified(request, etag, stat.st_mtime):
+        return Response(status=304, headers=headers)
+    
+    try:
+        index = get_stream_index(video_path)
+    except ValueError as e:
+        app.logger.warning(f'Cannot segment {filename}: {e}')
+        return jsonify({'error': 'This video cannot be streamed in segments'}), 415
+    return Response(build(video_path, index), mimetype=mimetype, headers=headers)
+
+@app.route('/api/videos/<filename>/stream/index.m3u8')
+def stream_playlist(filename):
+    try:
+        return send_stream_part(filename, 'playlist', 'application/vnd.apple.mpegurl',
+                                lambda video_path, index: build_playlist(index))
+    except Exception as e:
+        app.logger.error(f'Error building playlist: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/stream/manifest.json')
+def stream_manifest(filename):
+    def build(video_path, index):
+        return json.dumps({
+            'mime': f'video/mp4; codecs="{index["codecs"]}"' if index['codecs'] else None,
+            'duration': index['duration'],
+            'playlist': url_for('stream_playlist', filename=filename),
+            'init': url_for('stream_init', filename=filename),
+            'segments': [
+                {
+                    'start': segment['start'],
+                    'duration': segment['duration'],
+                    'url': url_for('stream_segment', filename=filename, number=number)
+                }
+                for number, segment in enumerate(index['segments'])
+            ]
+        })
+    
+    try:
+        return send_stream_part(filename, 'manifest', 'application/json', build)
+    except Exception as e:
+        app.logger.error(f'Error building stream manifest: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/stream/init.mp4')
+def stream_init(filename):
+    try:
+        return send_stream_part(filename, 'init', 'video/mp4', lambda video_path, index: index['init'])
+    except Exception as e:
+        app.logger.error(f'Error building init segment: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/videos/<filename>/stream/segment_<int:number>.m4s')
+def stream_segment(filename, number):
+    def build(video_path, index):
+        if number >= len(index['segments']):
+            raise IndexError(number)
+        return build_segment(video_path, index, number)
+    
+    try:
+        return send_stream_part(filename, f'segment{number}', 'video/iso.segment', build)
+    except IndexError:
+        return jsonify({'error': 'Segment not found'}), 404
+    except Exception as e:
+        app.logger.error(f'Error building segment: {e}')
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/save_config', methods=['POST'])
 def save_config():
     try:
         data = request.get_json()
         videos = data.get('videos', [])
-        config_file = os.path.join(static_dir, 'video_config.json')
-        with open(config_file, 'w') as f:
-            json.dump(videos, f, indent=4)
+        # Pages opened before a faststart remux still send the original paths
+        for video in videos:
+            video['path'] = content_store.canonical_path(video.get('path', ''))
+        config_store.save(videos)
         app.logger.info(f'Saved {len(videos)} videos to config')
+        
+        # Blobs dropped from the config are deleted after a grace period
+        collect_upload_garbage(videos)
         return jsonify({'success': True}), 200
     except Exception as e:
         app.logger.error(f'Error saving config: {e}')
@@ -273,7 +760,29 @@ def save_config():
 
 @app.route('/favicon.ico')
 def favicon():
-    return send_from_directory(static_dir, 'favicon.ico', mimetype='image/x-icon')
+    return send_from_directory(static_dir, 'favicon.ico', mimetype='image/x-icon', max_age=86400)
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled():
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Label by URL rule, not path, so each route is one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_duration.labels(route, request.method).observe(time.perf_counter() - started)
+        requests_total.labels(route, request.method, response.status_code).inc()
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.enabled():
+        return 'Metrics collection is disabled\n', 404, {'Content-Type': 'text/plain; charset=utf-8'}
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8',
+                    headers={'Cache-Control': 'no-store'})
 
 @app.errorhandler(404)
 def not_found_error(error):
@@ -285,5 +794,82 @@ def handle_error(error):
     app.logger.error(f'An error occurred: {error}')
     return jsonify({'error': str(error)}), 500
 
+_initialized = False
+_init_lock = threading.Lock()
+
+def init_app():
+    """
+    Set up logging, open the stores and start background maintenance
+
+    Called once by whatever runs the server (this module's entry point or
+    the desktop shell) rather than at import, so a process that only
+    imports the module opens no files and starts no threads. Later calls
+    do nothing.
+    """
+    global etag_index, stats_store, preview_store, proxy_store, motion_store
+    global chunked_uploads, media_index, content_store, faststart_queue, config_store
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _initialized = True
+
+        # No-op when the desktop shell has set up logging already
+        setup_logging(log_dir)
+        logger.debug(f"Template directory: {template_dir}, static directory: {static_dir}")
+
+        # Strong validators for uploaded videos, hashed once per file in the background
+        etag_index = ETagIndex(os.path.join(static_dir, 'uploads', '.etag_index.json'))
+
+        # Append-only playback event log with per-video aggregates
+        stats_store = PlaybackStatsStore(get_data_path('playback_stats.db'))
+
+        # Scrub preview sprite sheets, generated in the background after upload
+        preview_store = get_preview_store()
+
+        # 480p/720p renditions played instead of the original in small views
+        proxy_store = get_proxy_store()
+
+        # Per-upload motion energy timelines with detected active segments
+        motion_store = get_motion_store()
+
+        # Resumable uploads written chunk by chunk, with sessions kept on disk
+        chunked_uploads = ChunkedUploadManager(os.path.join(static_dir, 'uploads'),
+                                               max_size=app.config['MAX_UPLOAD_SIZE'])
+
+        # Codec, duration, resolution and keyframes of each video, probed in the background
+        media_index = get_media_index()
+
+        # Uploads are stored once under their content hash and shared by config entries
+        content_store = ContentStore(os.path.join(static_dir, 'uploads'))
+
+        faststart_queue = get_faststart_queue()
+
+        # Cached video configuration shared with the Qt front end
+        config_store = get_config_store(os.path.join(static_dir, 'video_config.json'))
+
+    # Remove blobs that stayed unreferenced past the grace period and uploads
+    # abandoned part way, e.g. while the server was not running
+    threading.Thread(
+        target=lambda: collect_upload_garbage(load_configured_videos()),
+        name='upload-gc',
+        daemon=True
+    ).start()
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=False, port=5000)
\ No newline at end of file
+    import argparse
+    from server import add_server_arguments, serve_app
+
+    parser = argparse.ArgumentParser(description='Video player web server')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    init_app()
+    serve_app(
+        app,
+        host=args.host,
+        port=args.port,
+        install_signal_handlers=True,
+        mode=args.mode,
+        workers=args.workers,
+        queue_depth=args.queue_depth
+    )
\ No newline at end of file